@@ -0,0 +1,246 @@
+# backend/ai_providers.py
+import asyncio
+import logging
+import time
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from . import gemini_api, bedrock_api, fake_api, job_dedup, resilience
+
+logger = logging.getLogger(__name__)
+
+# The fake provider (fake_api) answers offline with simulated latency and errors, for benchmarks.
+PROVIDER_APIS = {"google": gemini_api, "aws": bedrock_api, "fake": fake_api}
+PROVIDERS = tuple(PROVIDER_APIS)
+# Providers that stand in for each other under a failover policy; the fake one never does.
+FAILOVER_PROVIDERS = ("google", "aws")
+POLICY_MODES = ("off", "failover", "hedge")
+# Endpoints a failover policy can be configured for: /jobs/analyze, /proposals/generate and bulk analysis.
+POLICY_OPERATIONS = ("analysis", "proposal", "bulk")
+DEFAULT_POLICY = {
+    "mode": "off",  # "failover": secondary after an error or latency_threshold_seconds. "hedge": both at once.
+    "secondary": None,  # Defaults to the provider that is not api_config["provider"].
+    "latency_threshold_seconds": 20.0,
+}
+LATENCY_SMOOTHING = 0.2
+
+_average_latency: Dict[str, float] = {}
+
+
+def provider_api(provider: str):
+    """The module implementing `provider` (get_job_analysis, generate_proposal, ...)."""
+    api = PROVIDER_APIS.get(provider)
+    if api is None:
+        raise ValueError(f"Unsupported AI provider: {provider}")
+    return api
+
+
+def model_id(provider: str, api_config: Dict) -> str:
+    """The model `provider` is called with under `api_config` (its default, or api_config["models"][provider])."""
+    return provider_api(provider).model_id(api_config)
+
+
+async def analyze_job(provider: str, job_data: dict, profile_data: dict, api_config: dict) -> dict:
+    job_data = job_dedup.without_cluster_fields(job_data)
+    return await provider_api(provider).get_job_analysis(job_data, profile_data, api_config)
+
+
+async def score_job(provider: str, job_data: dict, profile_data: dict, api_config: dict) -> dict:
+    job_data = job_dedup.without_cluster_fields(job_data)
+    return await provider_api(provider).get_job_score(job_data, profile_data, api_config)
+
+
+async def analyze_and_propose(provider: str, job_data: dict, profile_data: dict, api_config: dict) -> dict:
+    job_data = job_dedup.without_cluster_fields(job_data)
+    return await provider_api(provider).get_job_analysis_with_proposal(job_data, profile_data, api_config)
+
+
+async def analyze_jobs_packed(provider: str, jobs_data: List[dict], profile_data: dict, api_config: dict) -> List[dict]:
+    jobs_data = [job_dedup.without_cluster_fields(job) for job in jobs_data]
+    return await provider_api(provider).get_bulk_job_analysis(jobs_data, profile_data, api_config)
+
+
+async def generate_proposal(provider: str, job_data: dict, profile_data: dict, analysis_data: dict, api_config: dict) -> str:
+    job_data = job_dedup.without_cluster_fields(job_data)
+    return await provider_api(provider).generate_proposal(job_data, profile_data, analysis_data, api_config)
+
+
+def stream_proposal(provider: str, job_data: dict, profile_data: dict, analysis_data: dict, api_config: dict) -> AsyncIterator[str]:
+    job_data = job_dedup.without_cluster_fields(job_data)
+    return provider_api(provider).stream_proposal(job_data, profile_data, analysis_data, api_config)
+
+
+def resolve_policy(operation: str, api_config: Dict) -> Dict:
+    """
+    Returns the failover policy for an endpoint from api_config["failover_policy"][operation],
+    merged over DEFAULT_POLICY.
+    """
+    policy = dict(DEFAULT_POLICY)
+    overrides = (api_config.get("failover_policy") or {}).get(operation) or {}
+    policy.update({k: v for k, v in overrides.items() if v is not None})
+    if policy["mode"] not in POLICY_MODES:
+        logger.warning(f"Unknown failover mode '{policy['mode']}' for {operation}; failover disabled.")
+        policy["mode"] = "off"
+    primary = api_config.get("provider", "google")
+    if policy["secondary"] is None:
+        policy["secondary"] = next((p for p in FAILOVER_PROVIDERS if p != primary), None)
+    if policy["secondary"] == primary or {primary, policy["secondary"]} - set(FAILOVER_PROVIDERS):
+        policy["mode"] = "off"
+    return policy
+
+
+def _record_latency(provider: str, seconds: float):
+    previous = _average_latency.get(provider)
+    _average_latency[provider] = seconds if previous is None else previous + LATENCY_SMOOTHING * (seconds - previous)
+
+
+def get_latency_stats() -> Dict[str, float]:
+    """Smoothed latency of successful calls per provider, in seconds."""
+    return {provider: round(seconds, 3) for provider, seconds in _average_latency.items()}
+
+
+def _fails_over(error: Exception) -> bool:
+    """
+    Whether a request that failed with `error` moves to the secondary provider. A permanent provider
+    error (a rejected request) would fail there too; transient failures, an open circuit breaker
+    and invalid answers move on.
+    """
+    if isinstance(error, resilience.CircuitOpenError):
+        return True
+    return not isinstance(error, resilience.ProviderError) or error.retryable
+
+
+async def _timed(provider: str, call: Callable[[str], Awaitable], validate: Optional[Callable[[Any], bool]]):
+    started_at = time.monotonic()
+    result = await call(provider)
+    if validate is not None and not validate(result):
+        raise ValueError(f"{provider} returned an invalid response.")
+    _record_latency(provider, time.monotonic() - started_at)
+    return result
+
+
+async def run_with_policy(operation: str, api_config: Dict, call: Callable[[str], Awaitable],
+                          validate: Optional[Callable[[Any], bool]] = None) -> Tuple[Any, Dict]:
+    """
+    Runs `call(provider)` against api_config["provider"] under the operation's failover policy.
+    "failover" moves the request to the secondary provider when the primary fails (unless
+    _fails_over rules it out), or races the
+    secondary against the primary once latency_threshold_seconds has passed; "hedge" sends to both
+    right away. The first valid answer wins and the other request is cancelled.
+
+    Returns (result, provider_meta). latency_saved_seconds is estimated against the primary's
+    smoothed latency, since a cancelled primary never reports its own.
+    """
+    primary = api_config.get("provider", "google")
+    policy = resolve_policy(operation, api_config)
+    mode, secondary = policy["mode"], policy["secondary"]
+    started_at = time.monotonic()
+
+    def meta(provider: str, reason: Optional[str], saved: float = 0.0) -> Dict:
+        return {
+            "provider": provider,
+            "primary_provider": primary,
+            "policy": mode,
+            "failover_reason": reason,
+            "latency_seconds": round(time.monotonic() - started_at, 3),
+            "latency_saved_seconds": round(saved, 3),
+        }
+
+    if mode == "off":
+        return await _timed(primary, call, validate), meta(primary, None)
+
+    tasks: Dict[asyncio.Task, str] = {}
+    launched = set()
+    errors: Dict[str, Exception] = {}
+    reason = None
+
+    def launch(provider: str):
+        launched.add(provider)
+        task = asyncio.create_task(_timed(provider, call, validate))
+        # The losing request may fail after the winner returned; don't log that as unretrieved.
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        tasks[task] = provider
+
+    launch(primary)
+    if mode == "hedge":
+        reason = "hedge"
+        launch(secondary)
+
+    try:
+        while tasks:
+            timeout = None
+            if secondary not in launched:
+                timeout = max(0.0, started_at + float(policy["latency_threshold_seconds"]) - time.monotonic())
+            done, _ = await asyncio.wait(tasks, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            if not done:
+                logger.info(f"{primary} exceeded {policy['latency_threshold_seconds']}s for {operation}; racing {secondary}.")
+                reason = "latency"
+                launch(secondary)
+                continue
+            for task in done:
+                provider = tasks.pop(task)
+                try:
+                    result = task.result()
+                except (ConnectionError, ValueError) as e:
+                    errors[provider] = e
+                    logger.warning(f"{provider} failed for {operation}: {e}")
+                    if secondary not in launched and _fails_over(e):
+                        reason = "error"
+                        launch(secondary)
+                    continue
+                saved = 0.0
+                if provider != primary and primary not in errors:
+                    saved = max(0.0, _average_latency.get(primary, 0.0) - (time.monotonic() - started_at))
+                return result, meta(provider, reason, saved)
+        raise errors.get(primary) or next(iter(errors.values()))
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+async def open_stream_with_policy(operation: str, api_config: Dict,
+                                  open_stream: Callable[[str], AsyncIterator[str]]) -> Tuple[AsyncIterator[str], Dict]:
+    """
+    Streaming counterpart of run_with_policy: waits for the first chunk of `open_stream(provider)`
+    from api_config["provider"] and, unless the policy is "off", moves to the secondary provider if
+    the primary fails with an error _fails_over accepts before producing one. Streams aren't raced ("hedge" behaves like "failover"):
+    the client would receive two interleaved answers.
+
+    Returns (stream, provider_meta); the stream starts with the first chunk, and provider_meta
+    carries time_to_first_token_seconds.
+    """
+    primary = api_config.get("provider", "google")
+    policy = resolve_policy(operation, api_config)
+    started_at = time.monotonic()
+    providers = [primary] if policy["mode"] == "off" else [primary, policy["secondary"]]
+
+    errors: Dict[str, Exception] = {}
+    for provider in providers:
+        stream = open_stream(provider)
+        try:
+            first = await stream.__anext__()
+        except StopAsyncIteration:
+            errors[provider] = ValueError(f"{provider} returned an empty response.")
+        except (ConnectionError, ValueError) as e:
+            errors[provider] = e
+        else:
+            ttft = time.monotonic() - started_at
+
+            async def relay():
+                try:
+                    yield first
+                    async for chunk in stream:
+                        yield chunk
+                finally:
+                    await stream.aclose()
+
+            return relay(), {
+                "provider": provider,
+                "primary_provider": primary,
+                "policy": policy["mode"],
+                "failover_reason": "error" if provider != primary else None,
+                "time_to_first_token_seconds": round(ttft, 3),
+            }
+        logger.warning(f"{provider} failed before streaming any {operation} text: {errors[provider]}")
+        if not _fails_over(errors[provider]):
+            break
+    raise errors[primary]
@@ -0,0 +1,158 @@
+# backend/analysis_cache.py
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import time
+from typing import Awaitable, Callable, Dict, Optional
+
+from . import job_dedup
+
+logger = logging.getLogger(__name__)
+
+CACHE_PATH = os.path.join(os.path.dirname(__file__), "analysis_cache.sqlite3")
+DEFAULT_TTL_SECONDS = 7 * 24 * 60 * 60
+DEFAULT_MAX_ENTRIES = 5000
+
+_connection: Optional[sqlite3.Connection] = None
+_in_flight: Dict[str, asyncio.Future] = {}
+_stats = {"hits": 0, "misses": 0, "coalesced": 0, "expired": 0, "evictions": 0, "errors": 0}
+
+
+def _normalize(value):
+    """Drops null / empty values recursively so equivalent payloads hash identically."""
+    if isinstance(value, dict):
+        normalized = {k: _normalize(v) for k, v in value.items()}
+        return {k: v for k, v in normalized.items() if v not in (None, "", [], {})}
+    if isinstance(value, list):
+        return [_normalize(v) for v in value]
+    if isinstance(value, str):
+        return value.strip()
+    return value
+
+
+def make_key(job_data: dict, profile_data: dict, prompt_template: str, model_id: str,
+             max_description_tokens: Optional[int]) -> str:
+    """
+    Content address of an analysis: hash of the normalized job, profile, prompt text, model ID and
+    the token budget the job description was truncated to.
+    """
+    payload = json.dumps(
+        [_normalize(job_dedup.without_cluster_fields(job_data)), _normalize(profile_data), prompt_template, model_id,
+         max_description_tokens],
+        sort_keys=True,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def _get_connection() -> sqlite3.Connection:
+    global _connection
+    if _connection is None:
+        _connection = sqlite3.connect(CACHE_PATH)
+        _connection.execute(
+            "CREATE TABLE IF NOT EXISTS analyses ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL, last_access REAL NOT NULL)"
+        )
+        _connection.execute("CREATE INDEX IF NOT EXISTS analyses_last_access ON analyses (last_access)")
+        _connection.commit()
+    return _connection
+
+
+def lookup(key: str) -> Optional[dict]:
+    """
+    Returns a cached analysis (counted as a hit) or None. Expired entries are removed on read.
+    """
+    try:
+        conn = _get_connection()
+        row = conn.execute("SELECT value, created_at FROM analyses WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        value, created_at = row
+        now = time.time()
+        if now - created_at > DEFAULT_TTL_SECONDS:
+            conn.execute("DELETE FROM analyses WHERE key = ?", (key,))
+            conn.commit()
+            _stats["expired"] += 1
+            return None
+        conn.execute("UPDATE analyses SET last_access = ? WHERE key = ?", (now, key))
+        conn.commit()
+        _stats["hits"] += 1
+        return json.loads(value)
+    except (sqlite3.Error, json.JSONDecodeError) as e:
+        _stats["errors"] += 1
+        logger.error(f"Analysis cache lookup failed: {e}", exc_info=True)
+        return None
+
+
+def store(key: str, value: dict):
+    """
+    Stores an analysis and evicts the least recently used entries above the size limit.
+    """
+    try:
+        conn = _get_connection()
+        now = time.time()
+        conn.execute(
+            "INSERT OR REPLACE INTO analyses (key, value, created_at, last_access) VALUES (?, ?, ?, ?)",
+            (key, json.dumps(value), now, now),
+        )
+        (count,) = conn.execute("SELECT COUNT(*) FROM analyses").fetchone()
+        if count > DEFAULT_MAX_ENTRIES:
+            excess = count - DEFAULT_MAX_ENTRIES
+            conn.execute(
+                "DELETE FROM analyses WHERE key IN (SELECT key FROM analyses ORDER BY last_access ASC LIMIT ?)",
+                (excess,),
+            )
+            _stats["evictions"] += excess
+        conn.commit()
+    except sqlite3.Error as e:
+        _stats["errors"] += 1
+        logger.error(f"Analysis cache write failed: {e}", exc_info=True)
+
+
+async def get_or_compute(key: str, compute: Callable[[], Awaitable[dict]]) -> dict:
+    """
+    Returns the cached analysis for `key`, or runs `compute` and caches its result.
+    Concurrent calls for the same key share a single in-flight computation.
+    """
+    cached = lookup(key)
+    if cached is not None:
+        return cached
+
+    if key in _in_flight:
+        _stats["coalesced"] += 1
+        return json.loads(await asyncio.shield(_in_flight[key]))
+
+    _stats["misses"] += 1
+    future = asyncio.get_running_loop().create_future()
+    # Mark the exception as retrieved even if no other request was waiting on it.
+    future.add_done_callback(lambda f: f.cancelled() or f.exception())
+    _in_flight[key] = future
+    try:
+        value = await compute()
+        store(key, value)
+        future.set_result(json.dumps(value))
+        return json.loads(future.result())
+    except BaseException as e:
+        future.set_exception(e if isinstance(e, Exception) else ConnectionError("The shared analysis request was cancelled."))
+        raise
+    finally:
+        _in_flight.pop(key, None)
+
+
+def get_stats() -> dict:
+    """Hit/miss counters plus the current number of cached analyses."""
+    try:
+        (entries,) = _get_connection().execute("SELECT COUNT(*) FROM analyses").fetchone()
+    except sqlite3.Error:
+        entries = None
+    lookups = _stats["hits"] + _stats["misses"] + _stats["coalesced"]
+    return {
+        **_stats,
+        "entries": entries,
+        "in_flight": len(_in_flight),
+        "hit_rate": round((_stats["hits"] + _stats["coalesced"]) / lookups, 3) if lookups else 0.0,
+        "llm_calls_saved": _stats["hits"] + _stats["coalesced"],
+    }
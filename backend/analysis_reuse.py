@@ -0,0 +1,216 @@
+# backend/analysis_reuse.py
+import logging
+import math
+from collections import Counter, OrderedDict
+from typing import Dict, List, Optional, Set, Tuple
+
+from . import ai_providers, analysis_cache, job_prefilter, job_ranker, prompts
+
+logger = logging.getLogger(__name__)
+
+# Near-match reuse, configured by api_config["analysis_reuse"]: a job whose text is within `threshold`
+# (TF-IDF cosine of word shingles) of a job already analyzed against the same profile and model gets
+# that analysis instead of an LLM call. Template postings ("Build a Shopify store") differ mostly in the
+# client, so the client's red flags are re-evaluated on the new job rather than copied.
+DEFAULT_REUSE = {
+    "enabled": False,
+    "threshold": 0.9,
+}
+SHINGLE_SIZE = 2  # Word bigrams, on top of the single words.
+MIN_FEATURES = 20  # Postings with fewer distinct features are too short to tell apart; never reused.
+MAX_CANDIDATES = 25  # Postings sharing the most features with a job that get a full similarity check.
+MAX_ENTRIES = 2000  # Analyses indexed per profile and model; the oldest are forgotten first.
+MAX_SCOPES = 8
+# The client-dependent RED FLAGS of the analysis prompts, as job_prefilter evaluates them. A red flag
+# means "automatic rejection, score below 30", so a reused score is capped when the new client has one.
+CLIENT_RULES = ("min_hourly_rate", "require_verified_payment", "require_client_history")
+RED_FLAG_MAX_SCORE = 29
+
+_stats = {"lookups": 0, "reused": 0, "client_mismatch": 0, "indexed": 0, "evicted": 0}
+
+
+def resolve_reuse(api_config: Dict) -> Optional[Dict]:
+    """api_config["analysis_reuse"] merged over DEFAULT_REUSE, or None if reuse is off."""
+    reuse = dict(DEFAULT_REUSE)
+    reuse.update({k: v for k, v in (api_config.get("analysis_reuse") or {}).items() if v is not None})
+    return reuse if reuse["enabled"] else None
+
+
+def features(job: Dict) -> Counter:
+    """Word and word-bigram counts of the job's title, skills and description (stopwords dropped)."""
+    skills = " ".join(skill for skill in job.get('skills') or [] if isinstance(skill, str))
+    words = job_ranker.tokenize(f"{job.get('title') or ''} {skills} {job.get('snippet') or ''}")
+    shingles = [" ".join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)]
+    return Counter(words + shingles)
+
+
+def client_flags(job: Dict) -> List[Dict]:
+    """The job's client red flags under job_prefilter.DEFAULT_RULES, the thresholds the prompts state."""
+    reasons = job_prefilter.evaluate_job(job, job_prefilter.resolve_rules())
+    return [reason for reason in reasons if reason["rule"] in CLIENT_RULES]
+
+
+class _Entry:
+    def __init__(self, job: Dict, counts: Counter, analysis: Dict):
+        self.job_id = job.get('id')
+        self.title = job.get('title')
+        self.counts = counts
+        self.analysis = analysis
+        self.flags: Set[str] = {reason["rule"] for reason in client_flags(job)}
+
+
+class SimilarityIndex:
+    """
+    TF-IDF vectors of analyzed postings with an inverted index from feature to posting. Weights are
+    computed at lookup time, so document frequencies stay exact as postings come and go.
+    """
+
+    def __init__(self, max_entries: int = MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._postings: Dict[str, Set[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _weights(self, counts: Counter) -> Dict[str, float]:
+        total = len(self._entries) + 1
+        return {
+            term: (1 + math.log(count)) * (math.log(total / (1 + len(self._postings.get(term, ())))) + 1)
+            for term, count in counts.items()
+        }
+
+    def find(self, counts: Counter, exclude: Optional[str] = None) -> Optional[Tuple[float, _Entry]]:
+        """The most similar indexed posting other than `exclude` and its cosine similarity, or None."""
+        overlap = Counter(key for term in counts for key in self._postings.get(term, ()) if key != exclude)
+        if not overlap:
+            return None
+        query = self._weights(counts)
+        query_norm = math.sqrt(sum(weight * weight for weight in query.values()))
+        best = None
+        for key, _ in overlap.most_common(MAX_CANDIDATES):
+            entry = self._entries[key]
+            weights = self._weights(entry.counts)
+            norm = math.sqrt(sum(weight * weight for weight in weights.values()))
+            dot = sum(weight * query[term] for term, weight in weights.items() if term in query)
+            score = dot / (norm * query_norm) if norm and query_norm else 0.0
+            if best is None or score > best[0]:
+                best = (score, entry)
+        return best
+
+    def add(self, key: str, entry: _Entry):
+        self._remove(key)
+        self._entries[key] = entry
+        for term in entry.counts:
+            self._postings.setdefault(term, set()).add(key)
+        while len(self._entries) > self.max_entries:
+            self._remove(next(iter(self._entries)))
+            _stats["evicted"] += 1
+
+    def _remove(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for term in entry.counts:
+            keys = self._postings.get(term)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._postings[term]
+
+
+# One index per (profile, model, prompt): an analysis only transfers between jobs it would have been
+# computed the same way for.
+_indexes: "OrderedDict[str, SimilarityIndex]" = OrderedDict()
+
+
+def _scope(profile_data: Dict, provider: str, api_config: Dict, template: str) -> str:
+    return analysis_cache.make_key({}, profile_data, template, ai_providers.model_id(provider, api_config),
+                                   prompts.description_budget(api_config))
+
+
+def _key(job: Dict) -> str:
+    return str(job.get('id') or analysis_cache.make_key(job, {}, "", "", None))
+
+
+def _index(scope: str, create: bool = False) -> Optional[SimilarityIndex]:
+    index = _indexes.get(scope)
+    if index is None and create:
+        index = _indexes[scope] = SimilarityIndex()
+        while len(_indexes) > MAX_SCOPES:
+            _indexes.popitem(last=False)
+    if index is not None:
+        _indexes.move_to_end(scope)
+    return index
+
+
+def remember(job: Dict, profile_data: Dict, analysis: Dict, provider: str, api_config: Dict, template: str):
+    """
+    Indexes a full analysis the model produced for `job` (under `provider`'s model, from the prompt
+    `template`), so similar jobs can reuse it. Reused analyses aren't indexed themselves, so reuse never drifts across chains of
+    near-matches.
+    """
+    counts = features(job)
+    if len(counts) < MIN_FEATURES or not isinstance(analysis.get('suitability_score'), (int, float)):
+        return
+    _index(_scope(profile_data, provider, api_config, template), create=True).add(
+        _key(job), _Entry(job, counts, prompts.project_analysis(analysis))
+    )
+    _stats["indexed"] += 1
+
+
+def find(job: Dict, profile_data: Dict, api_config: Dict, reuse: Dict, template: str,
+         counters: Optional[Dict] = None) -> Optional[Dict]:
+    """
+    Returns an analysis for `job` adapted from the most similar other job analyzed against the same
+    profile, model and prompt `template`, if it is at least reuse["threshold"] similar; None otherwise.
+    Callers check the analysis cache first: the job's own earlier analysis is never returned as reused. The new job's
+    client red flags are recomputed: a flag the source job didn't have caps the score at
+    RED_FLAG_MAX_SCORE and is listed first among the weaknesses. A source whose score was held down
+    by a flag the new job doesn't have isn't reused, since the model's fit score can't be recovered.
+    """
+    counts = features(job)
+    if len(counts) < MIN_FEATURES:
+        return None
+    _stats["lookups"] += 1
+    if counters is not None:
+        counters["reuse_lookups"] = counters.get("reuse_lookups", 0) + 1
+    index = _index(_scope(profile_data, api_config.get("provider", "google"), api_config, template))
+    if index is None:
+        return None
+    match = index.find(counts, exclude=_key(job))
+    if match is None or match[0] < reuse["threshold"]:
+        return None
+    similarity, source = match
+
+    flags = client_flags(job)
+    new_flags = [reason for reason in flags if reason["rule"] not in source.flags]
+    if source.flags - {reason["rule"] for reason in flags}:
+        _stats["client_mismatch"] += 1
+        logger.info(f"Not reusing the analysis of '{source.title}' for '{job.get('title')}': the source client had red flags this one doesn't.")
+        return None
+
+    analysis = dict(source.analysis)
+    if new_flags:
+        analysis['suitability_score'] = min(analysis['suitability_score'], RED_FLAG_MAX_SCORE)
+        analysis['weaknesses'] = [reason["detail"] for reason in new_flags] + list(analysis.get('weaknesses') or [])
+    analysis['reuse'] = {
+        "source_job_id": source.job_id,
+        "source_title": source.title,
+        "similarity": round(similarity, 3),
+        "client_flags": flags,
+    }
+    _stats["reused"] += 1
+    if counters is not None:
+        counters["reused"] = counters.get("reused", 0) + 1
+    logger.info(f"Reusing the analysis of '{source.title}' for '{job.get('title')}' (similarity {similarity:.3f}).")
+    return analysis
+
+
+def get_stats() -> Dict:
+    return {
+        **_stats,
+        "indexed_jobs": sum(len(index) for index in _indexes.values()),
+        "scopes": len(_indexes),
+        "reuse_rate": round(_stats["reused"] / _stats["lookups"], 3) if _stats["lookups"] else 0.0,
+    }
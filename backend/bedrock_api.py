@@ -1,121 +1,327 @@
 
 # backend/bedrock_api.py
-import boto3
-import os
+import asyncio
+import functools
 import json
+import os
 import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator
 from botocore.exceptions import BotoCoreError, ClientError
-from . import prompts
+from . import prompts, analysis_cache, resilience, usage_tracker, client_pool, context_cache, response_parser
 
 logger = logging.getLogger(__name__)
 
-async def get_job_analysis(job_data: dict, profile_data: dict, api_config: dict) -> dict:
+MODEL_ID = "us.amazon.nova-lite-v1:0"
+# Default model of a triage cascade's score-only stage (see triage_cascade).
+TRIAGE_MODEL_ID = "us.amazon.nova-micro-v1:0"
+# boto3 is synchronous; converse calls run on this bounded pool so concurrent requests don't
+# block the event loop (and each other). The rate limiter keeps in-flight calls below this.
+MAX_WORKERS = 32
+
+_executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="bedrock")
+
+# Score-only answers are forced through a tool whose input schema is SCORE_RESPONSE_SCHEMA.
+SCORE_TOOL_NAME = "report_score"
+SCORE_CONVERSE_OPTIONS = {
+    "toolConfig": {
+        "tools": [{"toolSpec": {
+            "name": SCORE_TOOL_NAME,
+            "description": "Reports how well the job fits the freelancer: a score and a one-line summary.",
+            "inputSchema": {"json": prompts.SCORE_RESPONSE_SCHEMA},
+        }}],
+        "toolChoice": {"tool": {"name": SCORE_TOOL_NAME}},
+    },
+    "inferenceConfig": {"maxTokens": prompts.SCORE_MAX_OUTPUT_TOKENS},
+}
+
+async def _converse(client, **kwargs) -> dict:
     """
-    Analyzes a job posting against a freelancer's profile using the AWS Bedrock API.
+    Runs client.converse on the Bedrock thread pool. If the awaiting task is cancelled, the
+    request itself still runs to completion on its thread.
     """
-    logger.info(f"Starting Bedrock analysis for job: {job_data.get('title')}")
-
-    aws_access_key_id = api_config.get("aws_access_key_id")
-    aws_secret_access_key = api_config.get("aws_secret_access_key")
-    aws_region = api_config.get("aws_region", "us-west-2")
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, functools.partial(client.converse, **kwargs))
 
-    client_args = {
-        "service_name": "bedrock-runtime",
-        "region_name": aws_region
-    }
+async def _converse_stream(client, **kwargs) -> AsyncIterator[dict]:
+    """
+    Runs client.converse_stream on the Bedrock thread pool and yields its events as they arrive.
+    If the consumer stops early, the thread closes the stream at its next event.
+    """
+    loop = asyncio.get_running_loop()
+    events: asyncio.Queue = asyncio.Queue()
+    stopped = threading.Event()
+    end = object()
 
-    # If the user provides keys in the UI, use them.
-    # Otherwise, boto3 will search the environment (e.g., ~/.aws/credentials).
-    if aws_access_key_id and aws_secret_access_key:
-        logger.info("Using AWS credentials provided in the UI.")
-        client_args["aws_access_key_id"] = aws_access_key_id
-        client_args["aws_secret_access_key"] = aws_secret_access_key
-    else:
-        logger.info("Using AWS credentials from environment.")
+    def pump():
+        try:
+            stream = client.converse_stream(**kwargs)['stream']
+            try:
+                for event in stream:
+                    if stopped.is_set():
+                        break
+                    loop.call_soon_threadsafe(events.put_nowait, event)
+            finally:
+                stream.close()
+        except Exception as e:
+            loop.call_soon_threadsafe(events.put_nowait, e)
+        finally:
+            loop.call_soon_threadsafe(events.put_nowait, end)
 
+    loop.run_in_executor(_executor, pump)
     try:
-        # Create the Bedrock client per request with user-specific or environment credentials
-        client = boto3.client(**client_args)
+        while True:
+            event = await events.get()
+            if event is end:
+                return
+            if isinstance(event, Exception):
+                raise event
+            yield event
+    finally:
+        stopped.set()
 
-        prompt_text = prompts.JOB_ANALYSIS_PROMPT.format(
-            job_data=json.dumps(job_data, indent=2),
-            profile_data=json.dumps(profile_data, indent=2)
-        )
+def model_id(api_config: dict = None) -> str:
+    """The Bedrock model to call: api_config["models"]["aws"], or MODEL_ID."""
+    return ((api_config or {}).get("models") or {}).get("aws") or MODEL_ID
 
-        # Using the model ID specified by the user.
-        model_id = "us.amazon.nova-lite-v1:0"
-        messages = [{"role": "user", "content": [{"text": prompt_text}]}]
+def analysis_cache_key(job_data: dict, profile_data: dict, prompt_template: str = prompts.JOB_ANALYSIS_PROMPT,
+                       api_config: dict = None) -> str:
+    return analysis_cache.make_key(job_data, profile_data, prompt_template, model_id(api_config),
+                                   prompts.description_budget(api_config))
 
-        # Make the API call
-        response = client.converse(
-            modelId=model_id,
-            messages=messages,
+def _record_usage(response: dict, model: str, prefix: context_cache.CachedPrefix = None):
+    usage = response.get('usage', {})
+    # inputTokens only counts the uncached part of the prompt.
+    cache_read = usage.get('cacheReadInputTokens') or 0
+    cache_write = usage.get('cacheWriteInputTokens') or 0
+    input_tokens = (usage.get('inputTokens') or 0) + cache_read + cache_write
+    usage_tracker.record("aws", model, input_tokens, usage.get('outputTokens'), cache_read)
+    if prefix is not None:
+        prefix.record(cache_read, cache_write)
+
+async def _converse_analysis(client, api_config: dict, prefix_template: str, job_template: str,
+                             converse_options: dict = None, **fields) -> dict:
+    """
+    Sends an analysis prompt (prefix_template + job_template). Within a bulk run that caches
+    context, a cachePoint after the static prefix (instructions + profile) lets Bedrock reuse it.
+    `converse_options` adds converse arguments, e.g. a toolConfig.
+    """
+    converse_options = converse_options or {}
+    budget = prompts.description_budget(api_config)
+    model = model_id(api_config)
+    run_cache = context_cache.current()
+    prefix = run_cache.bedrock_prefix(prefix_template, model) if run_cache else None
+    if prefix is not None:
+        job_fields = {name: value for name, value in fields.items() if name != "profile_data"}
+        content = [
+            {"text": prefix.text},
+            {"cachePoint": {"type": "default"}},
+            {"text": prompts.format_prompt(job_template, budget, **job_fields)},
+        ]
+        try:
+            response = await _converse(client, modelId=model, messages=[{"role": "user", "content": content}], **converse_options)
+            _record_usage(response, model, prefix)
+            return response
+        except ClientError as e:
+            # Models or regions without prompt caching reject cachePoint blocks.
+            if e.response.get('Error', {}).get('Code') != 'ValidationException':
+                raise
+            prefix.fail(e)
+
+    prompt_text = prompts.format_prompt(prefix_template + job_template, budget, **fields)
+    response = await _converse(client, modelId=model, messages=[{"role": "user", "content": [{"text": prompt_text}]}],
+                               **converse_options)
+    _record_usage(response, model)
+    return response
+
+def _tool_input_or_text(response: dict) -> str:
+    """The forced tool call's input as JSON, or the answer's text if the model replied without it."""
+    content = response['output']['message']['content']
+    for block in content:
+        if 'toolUse' in block:
+            return json.dumps(block['toolUse'].get('input'))
+    return "".join(block.get('text', '') for block in content)
+
+async def get_job_analysis(job_data: dict, profile_data: dict, api_config: dict) -> dict:
+    """
+    Analyzes a job posting against a freelancer's profile using the AWS Bedrock API.
+    Results are served from the persistent analysis cache when the same job, profile,
+    prompt and model were analyzed before.
+    """
+    return await analysis_cache.get_or_compute(
+        analysis_cache_key(job_data, profile_data, api_config=api_config),
+        lambda: _request_job_analysis(job_data, profile_data, api_config)
+    )
+
+async def _request_job_analysis(job_data: dict, profile_data: dict, api_config: dict) -> dict:
+    logger.info(f"Starting Bedrock analysis for job: {job_data.get('title')}")
+
+    try:
+        # Pooled client for the UI-provided credentials, or boto3's environment chain (e.g. ~/.aws/credentials).
+        client = client_pool.get_bedrock_client(api_config)
+
+        async def request(reask: bool) -> str:
+            response = await _converse_analysis(
+                client, api_config, prompts.JOB_ANALYSIS_PREFIX,
+                prompts.JOB_ANALYSIS_JOB + (prompts.JSON_REASK_NOTE if reask else ""),
+                job_data=job_data,
+                profile_data=profile_data
+            )
+            return response['output']['message']['content'][0]['text']
+
+        analysis_json = await response_parser.parse_or_reask(
+            request, response_parser.parse_analysis, f"job {job_data.get('title')}"
         )
         
-        analysis_text = response['output']['message']['content'][0]['text']
-        
-        # Clean the response text to remove markdown fences if they exist
-        if analysis_text.strip().startswith("```json"):
-            # Find the first '{' and the last '}' to extract the JSON object
-            start_index = analysis_text.find('{')
-            end_index = analysis_text.rfind('}')
-            if start_index != -1 and end_index != -1:
-                json_str = analysis_text[start_index:end_index+1]
-                analysis_json = json.loads(json_str)
-            else:
-                raise ValueError("Could not find a valid JSON object in the AI response.")
-        else:
-            analysis_json = json.loads(analysis_text)
-        
         logger.info(f"Successfully parsed Bedrock analysis for job: {job_data.get('title')}")
         return analysis_json
 
     except (BotoCoreError, ClientError) as e:
         logger.error(f"AWS Bedrock API call failed: {e}", exc_info=True)
-        raise ConnectionError(f"Communication error with AWS Bedrock: {e}")
-    except json.JSONDecodeError as e:
-        logger.error(f"JSON parsing failed for Bedrock response: {e}")
-        logger.error(f"Response text that failed parsing: {analysis_text}")
+        raise resilience.provider_error(f"Communication error with AWS Bedrock: {e}", e)
+    except response_parser.ResponseFormatError as e:
+        logger.error(f"Could not parse the Bedrock analysis for job {job_data.get('title')}: {e}")
         raise ValueError("Failed to parse the analysis from the AI response.")
     except Exception as e:
         logger.error(f"An unexpected error occurred during Bedrock API call: {e}", exc_info=True)
-        raise ConnectionError("An unexpected error occurred while analyzing the job.")
+        raise resilience.provider_error("An unexpected error occurred while analyzing the job.", e)
 
-async def generate_proposal(job_data: dict, profile_data: dict, analysis_data: dict, api_config: dict) -> str:
+async def get_job_score(job_data: dict, profile_data: dict, api_config: dict) -> dict:
     """
-    Generates a cover letter for a job application using the AWS Bedrock API.
+    Scores a job posting with JOB_SCORE_PROMPT: the suitability_score and a one-line analysis_summary,
+    returned through a tool call with SCORE_RESPONSE_SCHEMA and capped at SCORE_MAX_OUTPUT_TOKENS.
+    Cached like full analyses, under the score prompt.
     """
-    logger.info(f"Starting Bedrock proposal generation for job: {job_data.get('title')}")
+    return await analysis_cache.get_or_compute(
+        analysis_cache_key(job_data, profile_data, prompts.JOB_SCORE_PROMPT, api_config),
+        lambda: _request_job_score(job_data, profile_data, api_config)
+    )
+
+async def _request_job_score(job_data: dict, profile_data: dict, api_config: dict) -> dict:
+    logger.info(f"Starting Bedrock scoring for job: {job_data.get('title')}")
+
+    try:
+        client = client_pool.get_bedrock_client(api_config)
 
-    aws_access_key_id = api_config.get("aws_access_key_id")
-    aws_secret_access_key = api_config.get("aws_secret_access_key")
-    aws_region = api_config.get("aws_region", "us-west-2")
+        async def request(reask: bool) -> str:
+            response = await _converse_analysis(
+                client, api_config, prompts.JOB_SCORE_PREFIX,
+                prompts.JOB_SCORE_JOB + (prompts.JSON_REASK_NOTE if reask else ""), SCORE_CONVERSE_OPTIONS,
+                job_data=job_data,
+                profile_data=profile_data
+            )
+            return _tool_input_or_text(response)
 
-    client_args = {
-        "service_name": "bedrock-runtime",
-        "region_name": aws_region
-    }
+        return await response_parser.parse_or_reask(
+            request, response_parser.parse_score, f"score of job {job_data.get('title')}"
+        )
 
-    if aws_access_key_id and aws_secret_access_key:
-        client_args["aws_access_key_id"] = aws_access_key_id
-        client_args["aws_secret_access_key"] = aws_secret_access_key
+    except (BotoCoreError, ClientError) as e:
+        logger.error(f"AWS Bedrock API call failed during scoring: {e}", exc_info=True)
+        raise resilience.provider_error(f"Communication error with AWS Bedrock: {e}", e)
+    except response_parser.ResponseFormatError as e:
+        logger.error(f"Could not parse the Bedrock score for job {job_data.get('title')}: {e}")
+        raise ValueError("Failed to parse the score from the AI response.")
+    except Exception as e:
+        logger.error(f"An unexpected error occurred during Bedrock scoring: {e}", exc_info=True)
+        raise resilience.provider_error("An unexpected error occurred while scoring the job.", e)
+
+async def get_job_analysis_with_proposal(job_data: dict, profile_data: dict, api_config: dict) -> dict:
+    """
+    Analyzes a job posting and writes its cover letter in a single Bedrock request, using
+    JOB_ANALYSIS_WITH_PROPOSAL_PROMPT. Not cached, like generate_proposal.
+    """
+    logger.info(f"Starting combined Bedrock analysis and proposal for job: {job_data.get('title')}")
+
+    try:
+        client = client_pool.get_bedrock_client(api_config)
+
+        async def request(reask: bool) -> str:
+            response = await _converse_analysis(
+                client, api_config, prompts.JOB_ANALYSIS_WITH_PROPOSAL_PREFIX,
+                prompts.JOB_ANALYSIS_JOB + (prompts.JSON_REASK_NOTE if reask else ""),
+                job_data=job_data,
+                profile_data=profile_data
+            )
+            return response['output']['message']['content'][0]['text']
+
+        result = await response_parser.parse_or_reask(
+            request, response_parser.parse_analysis_with_proposal, f"analysis and proposal of job {job_data.get('title')}"
+        )
+        logger.info(f"Successfully parsed combined Bedrock analysis and proposal for job: {job_data.get('title')}")
+        return result
+
+    except (BotoCoreError, ClientError) as e:
+        logger.error(f"AWS Bedrock API call failed during combined analysis and proposal: {e}", exc_info=True)
+        raise resilience.provider_error(f"Communication error with AWS Bedrock: {e}", e)
+    except response_parser.ResponseFormatError as e:
+        logger.error(f"Could not parse the combined Bedrock answer for job {job_data.get('title')}: {e}")
+        raise ValueError("Failed to parse the analysis and proposal from the AI response.")
+    except Exception as e:
+        logger.error(f"An unexpected error occurred during combined Bedrock analysis and proposal: {e}", exc_info=True)
+        raise resilience.provider_error("An unexpected error occurred while analyzing the job.", e)
+
+async def get_bulk_job_analysis(jobs_data: list, profile_data: dict, api_config: dict) -> list:
+    """
+    Analyzes several job postings in a single Bedrock request using BULK_JOB_ANALYSIS_PROMPT.
+    Each job must carry a "job_id"; returns the per-job analyses found in the response.
+    """
+    logger.info(f"Starting packed Bedrock analysis for {len(jobs_data)} jobs.")
+
+    try:
+        client = client_pool.get_bedrock_client(api_config)
+
+        response = await _converse_analysis(
+            client, api_config, prompts.BULK_JOB_ANALYSIS_PREFIX, prompts.BULK_JOB_ANALYSIS_JOBS,
+            jobs_data=jobs_data,
+            profile_data=profile_data
+        )
+
+        # No re-ask here: jobs missing from the answer fall back to single-job calls.
+        analyses = response_parser.parse_analyses(response['output']['message']['content'][0]['text'])
+        logger.info(f"Packed Bedrock analysis returned {len(analyses)} of {len(jobs_data)} jobs.")
+
+        return analyses
+
+    except (BotoCoreError, ClientError) as e:
+        logger.error(f"AWS Bedrock API call failed during packed analysis: {e}", exc_info=True)
+        raise resilience.provider_error(f"Communication error with AWS Bedrock: {e}", e)
+    except response_parser.ResponseFormatError as e:
+        logger.error(f"Could not parse the packed Bedrock response: {e}")
+        raise ValueError("Failed to parse the packed analysis from the AI response.")
+    except ValueError:
+        raise
+    except Exception as e:
+        logger.error(f"An unexpected error occurred during packed Bedrock analysis: {e}", exc_info=True)
+        raise resilience.provider_error("An unexpected error occurred while analyzing the jobs.", e)
+
+async def generate_proposal(job_data: dict, profile_data: dict, analysis_data: dict, api_config: dict) -> str:
+    """
+    Generates a cover letter for a job application using the AWS Bedrock API.
+    """
+    logger.info(f"Starting Bedrock proposal generation for job: {job_data.get('title')}")
 
     try:
-        client = boto3.client(**client_args)
+        client = client_pool.get_bedrock_client(api_config)
 
-        prompt_text = prompts.PROPOSAL_GENERATION_PROMPT.format(
-            job_data=json.dumps(job_data, indent=2),
-            profile_data=json.dumps(profile_data, indent=2),
-            analysis_data=json.dumps(analysis_data, indent=2)
+        prompt_text = prompts.format_prompt(
+            prompts.PROPOSAL_GENERATION_PROMPT, prompts.description_budget(api_config),
+            job_data=job_data,
+            profile_data=profile_data,
+            analysis_data=analysis_data
         )
 
-        model_id = "us.amazon.nova-lite-v1:0"
+        model = model_id(api_config)
         messages = [{"role": "user", "content": [{"text": prompt_text}]}]
 
-        response = client.converse(
-            modelId=model_id,
+        response = await _converse(
+            client,
+            modelId=model,
             messages=messages,
         )
+
+        _record_usage(response, model)
         
         proposal_text = response['output']['message']['content'][0]['text']
         logger.info(f"Successfully generated proposal for job: {job_data.get('title')}")
@@ -124,7 +330,43 @@ async def generate_proposal(job_data: dict, profile_data: dict, analysis_data: d
 
     except (BotoCoreError, ClientError) as e:
         logger.error(f"AWS Bedrock API call failed during proposal generation: {e}", exc_info=True)
-        raise ConnectionError(f"Communication error with AWS Bedrock during proposal generation: {e}")
+        raise resilience.provider_error(f"Communication error with AWS Bedrock during proposal generation: {e}", e)
     except Exception as e:
         logger.error(f"An unexpected error occurred during Bedrock proposal generation: {e}", exc_info=True)
-        raise ConnectionError("An unexpected error occurred while generating the proposal.")
+        raise resilience.provider_error("An unexpected error occurred while generating the proposal.", e)
+
+async def stream_proposal(job_data: dict, profile_data: dict, analysis_data: dict, api_config: dict) -> AsyncIterator[str]:
+    """
+    Streaming variant of generate_proposal: yields the cover letter's text chunks as Bedrock produces them.
+    """
+    logger.info(f"Starting streamed Bedrock proposal generation for job: {job_data.get('title')}")
+
+    try:
+        client = client_pool.get_bedrock_client(api_config)
+
+        prompt_text = prompts.format_prompt(
+            prompts.PROPOSAL_GENERATION_PROMPT, prompts.description_budget(api_config),
+            job_data=job_data,
+            profile_data=profile_data,
+            analysis_data=analysis_data
+        )
+
+        model = model_id(api_config)
+        messages = [{"role": "user", "content": [{"text": prompt_text}]}]
+
+        async for event in _converse_stream(client, modelId=model, messages=messages):
+            if 'contentBlockDelta' in event:
+                text = event['contentBlockDelta']['delta'].get('text')
+                if text:
+                    yield text
+            elif 'metadata' in event:
+                _record_usage(event['metadata'], model)
+
+        logger.info(f"Finished streaming Bedrock proposal for job: {job_data.get('title')}")
+
+    except (BotoCoreError, ClientError) as e:
+        logger.error(f"AWS Bedrock API call failed during streamed proposal generation: {e}", exc_info=True)
+        raise resilience.provider_error(f"Communication error with AWS Bedrock during proposal generation: {e}", e)
+    except Exception as e:
+        logger.error(f"An unexpected error occurred during streamed Bedrock proposal generation: {e}", exc_info=True)
+        raise resilience.provider_error("An unexpected error occurred while generating the proposal.", e)
@@ -1,56 +1,733 @@
 # backend/bulk_analyzer.py
 import asyncio
+import copy
+import heapq
 import logging
-from typing import List, Dict
+import time
+from typing import AsyncIterator, Awaitable, Callable, List, Dict, Optional, Tuple
 
-from . import gemini_api, bedrock_api
+from . import ai_providers, prompts, rate_limiter, resilience, scheduler, usage_tracker, analysis_cache, job_prefilter, job_ranker, job_dedup, upwork_api, context_cache, triage_cascade, proposal_prefetch, analysis_reuse
 
 logger = logging.getLogger(__name__)
 
-async def analyze_multiple_jobs(jobs: List[Dict], profile_data: Dict, api_config: Dict) -> List[Dict]:
+PACKED_OUTPUT_TOKENS_PER_JOB = 300  # Packed responses are terser per job than single-job analyses.
+DEFAULT_TOP_K = 10
+DEFAULT_PACK_SIZE = 1  # 1 disables packing: one request per job.
+DEFAULT_PACK_TOKEN_BUDGET = 12000  # Input-token ceiling for a single packed request.
+SEARCH_PAGE_SIZE = 50
+SEARCH_PREFETCH_JOBS = 100  # Outstanding analyses above which search-and-analyze stops fetching pages.
+# "full": the complete JOB_ANALYSIS_PROMPT analysis. "score": JOB_SCORE_PROMPT's score and one-line
+# summary only; the full analysis of a job is fetched later, when it is opened.
+ANALYSIS_MODES = ("full", "score")
+
+# Context-cache cleanups still running after their run ended, referenced so they aren't collected.
+_closing_tasks = set()
+
+
+class _RunContext:
+    """State shared by every job of a single bulk run."""
+
+    def __init__(self, profile_data: Dict, api_config: Dict, provider: str,
+                 limiter: rate_limiter.AdaptiveRateLimiter, ledger: usage_tracker.UsageLedger,
+                 on_result: Callable[[Dict, object], None], cascade: Optional[triage_cascade.CascadeRun] = None,
+                 mode: str = "full", reuse: Optional[Dict] = None):
+        self.profile_data = profile_data
+        self.api_config = api_config
+        self.provider = provider
+        self.provider_api = ai_providers.provider_api(provider)
+        self.limiter = limiter
+        self.ledger = ledger
+        self.on_result = on_result
+        self.cascade = cascade
+        self.mode = mode
+        self.reuse = reuse
+        # The static prompt prefix (instructions + profile) is cached with the provider for the run.
+        self.context_cache = context_cache.RunContextCache(profile_data, api_config)
+        self.counters = {"cache_hits": 0, "reuse_lookups": 0, "reused": 0, "packed_requests": 0, "packed_jobs": 0, "fallback_jobs": 0,
+                         "retries": 0, "retries_exhausted": 0,
+                         "answered_by": {}, "failovers": 0, "latency_saved_seconds": 0.0}
+
+    def record_provider(self, provider_meta: Dict):
+        answered_by = self.counters["answered_by"]
+        answered_by[provider_meta["provider"]] = answered_by.get(provider_meta["provider"], 0) + 1
+        if provider_meta["provider"] != provider_meta["primary_provider"]:
+            self.counters["failovers"] += 1
+        self.counters["latency_saved_seconds"] = round(
+            self.counters["latency_saved_seconds"] + provider_meta["latency_saved_seconds"], 3
+        )
+
+    def emit(self, job: Dict, result: object):
+        self.on_result(job, result)
+
+
+def _estimate_analysis_tokens(job: Dict, profile_data: Dict, api_config: Dict) -> int:
+    return scheduler.estimate_prompt_tokens(
+        prompts.JOB_ANALYSIS_PROMPT, scheduler.ANALYSIS_OUTPUT_TOKENS, api_config, job_data=job, profile_data=profile_data
+    )
+
+
+def _estimate_score_tokens(job: Dict, profile_data: Dict, api_config: Dict) -> int:
+    return scheduler.estimate_prompt_tokens(
+        prompts.JOB_SCORE_PROMPT, scheduler.SCORE_OUTPUT_TOKENS, api_config, job_data=job, profile_data=profile_data
+    )
+
+
+async def _limited_call(ctx: _RunContext, estimated_tokens: int, output_tokens: int,
+                        request: Callable[[str], Awaitable], description: str,
+                        validate: Optional[Callable] = None, api_config: Optional[Dict] = None) -> Tuple[object, Dict]:
     """
-    Analyzes a list of job postings in parallel against a freelancer's profile, with rate limiting.
+    Runs `request(provider)` under the bulk failover policy, queued in the scheduler's bulk class
+    so interactive requests to the same provider go first. The call's estimated usage is reserved
+    against the run's budget once it gets its slot. Returns the result and the provider_meta
+    describing which provider answered. `api_config` overrides the run's (e.g. a cascade stage's).
     """
-    logger.info(f"Starting bulk analysis for {len(jobs)} jobs.")
+    if ctx.ledger.exhausted:
+        raise usage_tracker.BudgetExceededError("The run's token/cost budget is exhausted.")
+    api_config = api_config or ctx.api_config
 
-    provider = api_config.get("provider", "google")
-    logger.info(f"Using AI provider: {provider} for bulk analysis.")
+    async def budgeted(provider: str):
+        with ctx.ledger.reservation(ai_providers.model_id(provider, api_config), estimated_tokens - output_tokens, output_tokens):
+            return await request(provider)
+
+    result, provider_meta = await ai_providers.run_with_policy(
+        "bulk", api_config,
+        lambda provider: scheduler.scheduled_call(
+            provider, api_config, lambda: budgeted(provider), description,
+            scheduler.BULK, estimated_tokens, ctx.counters
+        ),
+        validate
+    )
+    ctx.record_provider(provider_meta)
+    return result, provider_meta
+
+
+def _cached_analysis(ctx: _RunContext, job: Dict) -> Optional[Dict]:
+    """
+    Looks up a previous single-job or packed analysis of this job against the same profile.
+    """
+    for template in (prompts.JOB_ANALYSIS_PROMPT, prompts.BULK_JOB_ANALYSIS_PROMPT):
+        cached = analysis_cache.lookup(ctx.provider_api.analysis_cache_key(job, ctx.profile_data, template, ctx.api_config))
+        if cached is not None:
+            ctx.counters["cache_hits"] += 1
+            if ctx.reuse is not None:
+                analysis_reuse.remember(job, ctx.profile_data, cached, ctx.provider, ctx.api_config, template)
+            return cached
+    return None
+
+
+def _known_analysis(ctx: _RunContext, job: Dict, template: str = prompts.JOB_ANALYSIS_PROMPT) -> Optional[Dict]:
+    """
+    A cached analysis of this job or, with api_config["analysis_reuse"] on, one adapted from a
+    near-identical job analyzed with `template` against the same profile.
+    """
+    cached = _cached_analysis(ctx, job)
+    if cached is None and ctx.reuse is not None:
+        return analysis_reuse.find(job, ctx.profile_data, ctx.api_config, ctx.reuse, template, ctx.counters)
+    return cached
+
+
+async def _analyze(ctx: _RunContext, job: Dict) -> Dict:
+    result, provider_meta = await _limited_call(
+        ctx, _estimate_analysis_tokens(job, ctx.profile_data, ctx.api_config), scheduler.ANALYSIS_OUTPUT_TOKENS,
+        lambda provider: ai_providers.analyze_job(provider, job, ctx.profile_data, ctx.api_config),
+        f"job {job.get('title')}", lambda analysis: isinstance(analysis, dict)
+    )
+    if ctx.reuse is not None:
+        analysis_reuse.remember(job, ctx.profile_data, result, provider_meta["provider"], ctx.api_config,
+                                prompts.JOB_ANALYSIS_PROMPT)
+    result['provider_meta'] = provider_meta
+    return result
 
-    all_results = []
-    batch_size = 10  # Rate limit, adjust as needed
 
-    for i in range(0, len(jobs), batch_size):
-        batch = jobs[i:i + batch_size]
-        logger.info(f"Processing batch {i//batch_size + 1}/{(len(jobs) + batch_size - 1)//batch_size}...")
-        
-        tasks = []
-        for job in batch:
-            if provider == "google":
-                task = asyncio.create_task(gemini_api.get_job_analysis(job, profile_data))
-            elif provider == "aws":
-                task = asyncio.create_task(bedrock_api.get_job_analysis(job, profile_data, api_config))
+async def _score(ctx: _RunContext, job: Dict, api_config: Optional[Dict] = None) -> Dict:
+    """Scores a job with JOB_SCORE_PROMPT: suitability_score and a one-line analysis_summary."""
+    result, provider_meta = await _limited_call(
+        ctx, _estimate_score_tokens(job, ctx.profile_data, api_config or ctx.api_config), scheduler.SCORE_OUTPUT_TOKENS,
+        lambda provider: ai_providers.score_job(provider, job, ctx.profile_data, api_config or ctx.api_config),
+        f"score of job {job.get('title')}", lambda score: isinstance(score, dict), api_config
+    )
+    return {**result, "mode": "score", "provider_meta": provider_meta}
+
+
+async def _triage_and_analyze(ctx: _RunContext, job: Dict) -> Dict:
+    """
+    Cascade path of _run_job: the triage model scores the job first, and only a score within the
+    cascade's band (or a failed triage call) leads to the full analysis.
+    """
+    cascade = ctx.cascade
+    started_at = time.monotonic()
+    try:
+        triage = await _score(ctx, job, cascade.triage_config)
+    except (ConnectionError, ValueError) as e:
+        logger.warning(f"Triage of job {job.get('title')} failed, running the full analysis: {e}")
+        cascade.triage_failed()
+        triage_score = None
+    else:
+        cascade.record_latency("triage", time.monotonic() - started_at)
+        triage_score = triage['suitability_score']
+        if not cascade.escalates(triage_score):
+            result = cascade.triage_result(triage)
+            result['provider_meta'] = triage['provider_meta']
+            return result
+
+    started_at = time.monotonic()
+    result = await _analyze(ctx, job)
+    cascade.record_latency("full", time.monotonic() - started_at)
+    result['cascade'] = {"stage": "full", "triage_score": triage_score}
+    return result
+
+
+async def _run_job(ctx: _RunContext, job: Dict):
+    """
+    Analyzes a single job and emits its analysis (or the exception it failed with).
+    Cached and reused analyses are returned without consuming any rate-limit or token budget.
+    """
+    usage_tracker.bind(ctx.ledger)
+    context_cache.bind(ctx.context_cache)
+    try:
+        result = _known_analysis(ctx, job)
+        if result is None:
+            if ctx.mode == "score":
+                result = await _score(ctx, job)
+            elif ctx.cascade is not None:
+                result = await _triage_and_analyze(ctx, job)
             else:
-                # If provider is unsupported, log an error for the job and skip it.
-                logger.error(f"Unsupported AI provider: {provider} for job {job.get('title')}")
-                continue
-            tasks.append(task)
-        
-        results = await asyncio.gather(*tasks, return_exceptions=True)
-        all_results.extend(zip(batch, results))
-
-        if i + batch_size < len(jobs):
-            logger.info("Rate limit pause: waiting for 60 seconds before next batch...")
-            await asyncio.sleep(60)
+                result = await _analyze(ctx, job)
+    except Exception as e:
+        result = e
+    ctx.emit(job, result)
 
-    successful_analyses = []
-    for job, result in all_results:
+
+def _build_packs(jobs: List[Dict], profile_data: Dict, pack_size: int, token_budget: int,
+                 api_config: Dict) -> List[Tuple[List[Dict], int]]:
+    """
+    Groups jobs into packs of at most `pack_size` jobs whose prompt stays within `token_budget`.
+    Returns each pack with its estimated input + output tokens.
+    """
+    description_budget = prompts.description_budget(api_config)
+    base_tokens = rate_limiter.estimate_tokens(prompts.format_prompt(
+        prompts.BULK_JOB_ANALYSIS_PROMPT, description_budget, jobs_data=[], profile_data=profile_data
+    ))
+    packs = []
+    current, current_tokens = [], base_tokens
+    for job in jobs:
+        job_tokens = rate_limiter.estimate_tokens(prompts.render_fields(description_budget, job_data=job)["job_data"])
+        if current and (len(current) >= pack_size or current_tokens + job_tokens > token_budget):
+            packs.append((current, current_tokens + PACKED_OUTPUT_TOKENS_PER_JOB * len(current)))
+            current, current_tokens = [], base_tokens
+        current.append(job)
+        current_tokens += job_tokens
+    if current:
+        packs.append((current, current_tokens + PACKED_OUTPUT_TOKENS_PER_JOB * len(current)))
+    return packs
+
+
+async def _run_pack(ctx: _RunContext, pack: List[Dict], estimated_tokens: int):
+    """
+    Analyzes a pack of jobs in one request with the profile sent once. Jobs the model left out
+    of the response (or the whole pack, if the request fails) fall back to per-job calls.
+    """
+    usage_tracker.bind(ctx.ledger)
+    context_cache.bind(ctx.context_cache)
+    pending = {str(index + 1): job for index, job in enumerate(pack)}
+    try:
+        analyses, provider_meta = await _limited_call(
+            ctx, estimated_tokens, PACKED_OUTPUT_TOKENS_PER_JOB * len(pack),
+            lambda provider: ai_providers.analyze_jobs_packed(
+                provider, [{"job_id": job_id, **job} for job_id, job in pending.items()], ctx.profile_data, ctx.api_config
+            ),
+            f"pack of {len(pack)} jobs"
+        )
+        ctx.counters["packed_requests"] += 1
+    except usage_tracker.BudgetExceededError as e:
+        for job in pack:
+            ctx.emit(job, e)
+        return
+    except Exception as e:
+        logger.warning(f"Packed analysis of {len(pack)} jobs failed, falling back to per-job calls: {e}")
+        analyses = []
+
+    for analysis in analyses:
+        job_id = str(analysis.pop("job_id", None))
+        if job_id not in pending or analysis.get('suitability_score') is None:
+            continue
+        job = pending.pop(job_id)
+        provider_api = ai_providers.provider_api(provider_meta["provider"])
+        analysis_cache.store(
+            provider_api.analysis_cache_key(job, ctx.profile_data, prompts.BULK_JOB_ANALYSIS_PROMPT, ctx.api_config), analysis
+        )
+        if ctx.reuse is not None:
+            analysis_reuse.remember(job, ctx.profile_data, analysis, provider_meta["provider"], ctx.api_config,
+                                    prompts.BULK_JOB_ANALYSIS_PROMPT)
+        analysis['provider_meta'] = provider_meta
+        ctx.counters["packed_jobs"] += 1
+        ctx.emit(job, analysis)
+
+    if pending:
+        logger.info(f"{len(pending)} of {len(pack)} jobs missing from the packed response; analyzing them individually.")
+        ctx.counters["fallback_jobs"] += len(pending)
+        await asyncio.gather(*[_run_job(ctx, job) for job in pending.values()])
+
+
+def _duplicate_result(result: object, representative: Dict) -> object:
+    if isinstance(result, dict):
+        result = copy.deepcopy(result)
+        result['duplicate_of'] = representative.get('id')
+    return result
+
+
+def _top_entry(analysis: Dict) -> Dict:
+    job = analysis.get('job_data', {})
+    return {
+        "job_id": job.get('id'),
+        "title": job.get('title'),
+        "suitability_score": analysis.get('suitability_score'),
+    }
+
+
+class _BulkPipeline:
+    """
+    One bulk run that accepts jobs in batches while earlier ones are still being analyzed.
+    Each batch goes through the pre-filter, pre-rank and duplicate grouping and is scheduled right
+    away; events are queued in completion order, and "done" follows once the pipeline is closed
+    and every scheduled job has finished.
+    """
+
+    def __init__(self, profile_data: Dict, api_config: Dict, top_k: int = DEFAULT_TOP_K,
+                 prefilter: Optional[Dict] = None, prerank: Optional[Dict] = None, budget: Optional[Dict] = None,
+                 mode: str = "full", ledger: Optional[usage_tracker.UsageLedger] = None):
+        # Score mode is already the cheap pass, so it neither triages nor packs.
+        self.mode = mode
+        cascade = triage_cascade.resolve_cascade(api_config) if mode == "full" else None
+        self.cascade = triage_cascade.CascadeRun(api_config, cascade) if cascade is not None else None
+        if self.cascade is not None:
+            # The run's own provider and model are the full-analysis stage's.
+            api_config = self.cascade.full_config
+        self.profile_data = profile_data
+        self.api_config = api_config
+        self.provider = api_config.get("provider", "google")
+        self.top_k = top_k
+        self.rules = job_prefilter.resolve_rules(prefilter)
+        self.prerank = prerank or {}
+        self.pack_size = max(1, int(api_config.get("pack_size") or DEFAULT_PACK_SIZE)) if mode == "full" else 1
+        # A new run supersedes the proposals still being prepared for the previous one.
+        proposal_prefetch.cancel()
+        self.prefetch = proposal_prefetch.resolve_prefetch(api_config)
+        self.prefetch_queued = 0
+        self._prefetch_heap: List[Tuple[float, int, Dict]] = []
+        self.reuse = analysis_reuse.resolve_reuse(api_config)
+        self.source_stats: Dict = {}  # Merged into the final stats by whoever feeds the pipeline.
+
+        self.started_at = time.monotonic()
+        self.progress = {"total": 0, "completed": 0, "succeeded": 0, "failed": 0, "rejected": 0, "skipped": 0}
+        self.estimated_tokens = 0
+        self.first_result_seconds = None
+        self.over_budget = 0
+        self.deduplicated = 0
+        self._top_heap: List[Tuple[float, int, Dict]] = []
+        self._downranked: Dict[int, List[Dict]] = {}
+        self._local_scores: Dict[int, float] = {}
+        self._events: asyncio.Queue = asyncio.Queue()
+        self._tasks: List[asyncio.Task] = []
+        self._pending = 0  # Representatives scheduled but not finished.
+        self._drained = asyncio.Event()
+        self._closed = False
+
+        # Near-duplicate clusters seen so far in the run. Clusters whose analysis already finished keep
+        # a copy of it, so a duplicate arriving in a later batch shares it instead of being re-analyzed.
+        self._dedup_index = job_dedup.MinHashIndex(max_clusters=None)
+        self._clusters: Dict[str, Dict] = {}
+        self._cluster_of: Dict[int, str] = {}
+        self._duplicates_of: Dict[int, List[Dict]] = {}
+        self._finished: Dict[str, Tuple[Dict, object]] = {}
+
+        self.ctx = None
+        if self.provider in ai_providers.PROVIDERS:
+            ledger = ledger or new_ledger(api_config, budget)
+            self.ctx = _RunContext(profile_data, api_config, self.provider,
+                                   rate_limiter.get_rate_limiter(self.provider, api_config), ledger, self._handle_result,
+                                   self.cascade, mode, self.reuse)
+            self._requests_before = self.ctx.limiter.total_requests
+            self._throttled_before = self.ctx.limiter.total_throttled
+            self._breaker = resilience.get_circuit_breaker(self.provider)
+            self._short_circuited_before = self._breaker.short_circuited
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    def _ranking(self) -> List[Dict]:
+        return [entry for _, _, entry in sorted(self._top_heap, key=lambda item: (-item[0], item[1]))]
+
+    def publish(self, event: Dict):
+        self._events.put_nowait(event)
+
+    def add_jobs(self, jobs: List[Dict]):
+        """Screens a batch of jobs and schedules the analysis of the ones that get through."""
+        progress = self.progress
+        progress["total"] += len(jobs)
+
+        passed_jobs, failed_jobs = job_prefilter.apply_rules(jobs, self.rules)
+        jobs, demoted_jobs = passed_jobs, []
+        if self.rules["action"] == "downrank":
+            # Still analyzed, but ranked and queued behind every plausible job and penalized afterwards.
+            self._downranked.update({id(job): reasons for job, reasons in failed_jobs})
+            demoted_jobs = [job for job, _ in failed_jobs]
+        else:
+            for job, reasons in failed_jobs:
+                progress["completed"] += 1
+                progress["rejected"] += 1
+                self.publish({"event": "rejected", "job_id": job.get('id'), "title": job.get('title'),
+                              "reasons": reasons, "job_data": job, "progress": dict(progress)})
+
+        selected_jobs, skipped_jobs = job_ranker.prerank(
+            jobs, self.profile_data, self.prerank.get("top_k"), self.prerank.get("min_score"), demoted_jobs
+        )
+        self._local_scores.update({id(job): score for job, score in selected_jobs})
+        jobs = [job for job, _ in selected_jobs]
+        for job, score in skipped_jobs:
+            progress["completed"] += 1
+            progress["skipped"] += 1
+            self.publish({"event": "skipped", "reason": "prerank", "job_id": job.get('id'), "title": job.get('title'),
+                          "local_score": score, "job_data": job, "progress": dict(progress)})
+
+        if self.ctx is None:
+            # If provider is unsupported, log an error for each job and skip it.
+            for job in jobs:
+                logger.error(f"Unsupported AI provider: {self.provider} for job {job.get('title')}")
+                progress["completed"] += 1
+                progress["failed"] += 1
+                self.publish({"event": "error", "job_id": job.get('id'), "title": job.get('title'),
+                              "error": f"Unsupported AI provider: {self.provider}", "job_data": job,
+                              "progress": dict(progress)})
+            return
+
+        representatives = []
+        for job in jobs:
+            cluster_id = job.get("cluster_id")
+            if cluster_id is None:
+                value = job.get("fingerprint") or job_dedup.fingerprint(job)
+                # A job without text to compare is its own cluster.
+                cluster_id = self._dedup_index.add(job, value) if value else f"unclustered:{id(job)}"
+            if cluster_id in self._finished:
+                _, result = self._finished[cluster_id]
+                self.deduplicated += 1
+                self._publish_result(job, copy.deepcopy(result))
+            elif cluster_id in self._clusters:
+                self.deduplicated += 1
+                self._duplicates_of[id(self._clusters[cluster_id])].append(job)
+            else:
+                self._clusters[cluster_id] = job
+                self._cluster_of[id(job)] = cluster_id
+                self._duplicates_of[id(job)] = []
+                representatives.append(job)
+        self._pending += len(representatives)
+
+        ctx = self.ctx
+        # A cascade triages job by job, so it takes precedence over packing.
+        if self.pack_size > 1 and self.cascade is None:
+            uncached_jobs = []
+            for job in representatives:
+                cached = _known_analysis(ctx, job, prompts.BULK_JOB_ANALYSIS_PROMPT)
+                if cached is not None:
+                    ctx.emit(job, cached)
+                else:
+                    uncached_jobs.append(job)
+            token_budget = int(self.api_config.get("pack_token_budget") or DEFAULT_PACK_TOKEN_BUDGET)
+            packs = _build_packs(uncached_jobs, self.profile_data, self.pack_size, token_budget, self.api_config)
+            ctx.context_cache.plan(len(packs))
+            for pack, pack_tokens in packs:
+                self.estimated_tokens += pack_tokens
+                self._tasks.append(asyncio.create_task(_run_pack(ctx, pack, pack_tokens)))
+        else:
+            ctx.context_cache.plan(len(representatives))
+            for job in representatives:
+                if self.mode == "full":
+                    self.estimated_tokens += _estimate_analysis_tokens(job, self.profile_data, self.api_config)
+                if self.mode == "score" or self.cascade is not None:
+                    self.estimated_tokens += _estimate_score_tokens(job, self.profile_data, self.api_config)
+                self._tasks.append(asyncio.create_task(_run_job(ctx, job)))
+
+    def _handle_result(self, representative: Dict, result: object):
+        # Near-duplicates of the representative share its analysis (or its failure).
+        duplicates = self._duplicates_of.pop(id(representative), [])
+        cluster_id = self._cluster_of.pop(id(representative))
+        if not self._closed:
+            self._finished[cluster_id] = (representative, _duplicate_result(result, representative))
+        members = [(representative, result)] + [
+            (duplicate, _duplicate_result(result, representative)) for duplicate in duplicates
+        ]
+        for job, job_result in members:
+            self._publish_result(job, job_result)
+        self._pending -= 1
+        self._drained.set()
+        self._finish_if_idle()
+
+    def _publish_result(self, job: Dict, result: object):
+        progress = self.progress
+        progress["completed"] += 1
+        if isinstance(result, usage_tracker.BudgetExceededError):
+            progress["skipped"] += 1
+            self.over_budget += 1
+            self.publish({"event": "skipped", "reason": "budget", "job_id": job.get('id'), "title": job.get('title'),
+                          "local_score": self._local_scores.get(id(job)), "job_data": job, "progress": dict(progress)})
+            return
         if isinstance(result, Exception):
             logger.error(f"Error analyzing job {job.get('title')}: {result}")
-        else:
-            result['job_data'] = job
-            successful_analyses.append(result)
-    
-    logger.info(f"Successfully analyzed {len(successful_analyses)} out of {len(jobs)} jobs.")
+            progress["failed"] += 1
+            self.publish({"event": "error", "job_id": job.get('id'), "title": job.get('title'),
+                          "error": str(result), "retryable": getattr(result, 'retryable', False),
+                          "job_data": job, "progress": dict(progress)})
+            return
+
+        result['job_data'] = job
+        result['local_score'] = self._local_scores.get(id(job))
+        if id(job) in self._downranked:
+            result['rejection_reasons'] = self._downranked[id(job)]
+            if isinstance(result.get('suitability_score'), (int, float)):
+                result['suitability_score'] = max(0, result['suitability_score'] - self.rules["downrank_penalty"])
+        progress["succeeded"] += 1
+        if self.first_result_seconds is None:
+            self.first_result_seconds = time.monotonic() - self.started_at
+        score = result.get('suitability_score')
+        if isinstance(score, (int, float)):
+            entry = (score, progress["completed"], _top_entry(result))
+            if len(self._top_heap) < self.top_k:
+                heapq.heappush(self._top_heap, entry)
+            elif self.top_k > 0:
+                heapq.heappushpop(self._top_heap, entry)
+            if self.prefetch is not None and score >= self.prefetch["min_score"]:
+                candidate = (score, -progress["completed"], result)
+                if len(self._prefetch_heap) < self.prefetch["top_n"]:
+                    heapq.heappush(self._prefetch_heap, candidate)
+                else:
+                    heapq.heappushpop(self._prefetch_heap, candidate)
+        self.publish({"event": "result", "analysis": result, "progress": dict(progress), "top": self._ranking()})
+
+    async def wait_for_capacity(self, max_pending: int):
+        """Waits until fewer than `max_pending` analyses are outstanding."""
+        while self._pending >= max_pending:
+            self._drained.clear()
+            await self._drained.wait()
+
+    def close(self):
+        """No more jobs will be added; "done" is published once the scheduled ones finish."""
+        self._closed = True
+        self._finished.clear()
+        self._finish_if_idle()
+
+    def _finish_if_idle(self):
+        if self._closed and self._pending == 0:
+            self._start_prefetch()
+            self.publish({"event": "done", "progress": dict(self.progress), "top": self._ranking(), "stats": self._stats()})
+
+    def _start_prefetch(self):
+        """Hands the run's best results to proposal_prefetch, which works on them once the provider is idle."""
+        if self.prefetch is None or self.ctx is None or not self._prefetch_heap:
+            return
+        results = [result for _, _, result in sorted(self._prefetch_heap, key=lambda item: (-item[0], -item[1]))]
+        self.prefetch_queued = proposal_prefetch.start(results, self.profile_data, self.api_config, self.ctx.ledger)
+
+    def _usage(self) -> Dict:
+        # The run's cached content is deleted right after it ends, so its storage is billed up to now.
+        self.ctx.context_cache.bill_storage(self.ctx.ledger)
+        return self.ctx.ledger.summary()
+
+    def _stats(self) -> Dict:
+        progress = self.progress
+        elapsed = time.monotonic() - self.started_at
+        logger.info(f"Successfully analyzed {progress['succeeded']} out of {progress['total']} jobs in {elapsed:.1f}s.")
+
+        stats = {
+            "provider": self.provider,
+            "mode": "score" if self.mode == "score" else "cascade" if self.cascade is not None else "packed" if self.pack_size > 1 else "single",
+            "jobs_requested": progress["total"],
+            "jobs_analyzed": progress["succeeded"],
+            "jobs_failed": progress["failed"],
+            "jobs_rejected": progress["rejected"],
+            "jobs_downranked": len(self._downranked),
+            "jobs_skipped": progress["skipped"],
+            "jobs_over_budget": self.over_budget,
+            "jobs_deduplicated": self.deduplicated,
+            "elapsed_seconds": round(elapsed, 2),
+            "first_result_seconds": round(self.first_result_seconds, 2) if self.first_result_seconds is not None else None,
+            "jobs_per_minute": round(progress["succeeded"] / elapsed * 60, 2) if elapsed > 0 else 0.0,
+            "estimated_tokens": self.estimated_tokens,
+            **self.source_stats,
+        }
+        if self.ctx is not None:
+            stats.update({
+                "requests": self.ctx.limiter.total_requests - self._requests_before,
+                "throttled": self.ctx.limiter.total_throttled - self._throttled_before,
+                "final_concurrency": self.ctx.limiter.concurrency,
+                "short_circuited": self._breaker.short_circuited - self._short_circuited_before,
+                "circuit_breaker": self._breaker.snapshot(),
+                "usage": self._usage(),
+                "context_cache": self.ctx.context_cache.summary(),
+                **self.ctx.counters,
+            })
+            if self.cascade is not None:
+                stats["cascade"] = self.cascade.summary()
+            if self.reuse is not None:
+                lookups = self.ctx.counters["reuse_lookups"]
+                stats["analysis_reuse"] = {
+                    "threshold": self.reuse["threshold"],
+                    "reuse_rate": round(self.ctx.counters["reused"] / lookups, 3) if lookups else 0.0,
+                }
+            if self.prefetch is not None:
+                stats["proposal_prefetch"] = {"queued": self.prefetch_queued, **self.prefetch}
+        logger.info(f"Bulk analysis throughput: {stats['jobs_per_minute']} jobs/min ({stats})")
+        return stats
+
+    async def events(self) -> AsyncIterator[Dict]:
+        try:
+            while True:
+                event = await self._events.get()
+                yield event
+                if event["event"] == "done":
+                    return
+        finally:
+            # The consumer may stop early (e.g. the client disconnected); don't keep paying for the rest.
+            for task in self._tasks:
+                task.cancel()
+            if self.ctx is not None:
+                # Runs in the background: the consumer may be gone already.
+                close_task = asyncio.create_task(self.ctx.context_cache.close())
+                _closing_tasks.add(close_task)
+                close_task.add_done_callback(_closing_tasks.discard)
+
+
+def new_ledger(api_config: Dict, budget: Optional[Dict] = None, usage: Optional[Dict] = None) -> usage_tracker.UsageLedger:
+    """The usage ledger of a bulk run under `budget`, carrying on from `usage` (a resumed run's earlier summary)."""
+    budget = budget or {}
+    ledger = usage_tracker.UsageLedger(
+        usage_tracker.resolve_price_table(api_config), budget.get("max_tokens"), budget.get("max_cost")
+    )
+    ledger.restore(usage)
+    return ledger
+
+
+async def stream_multiple_jobs(jobs: List[Dict], profile_data: Dict, api_config: Dict,
+                               top_k: int = DEFAULT_TOP_K, prefilter: Optional[Dict] = None,
+                               prerank: Optional[Dict] = None, budget: Optional[Dict] = None,
+                               mode: str = "full", ledger: Optional[usage_tracker.UsageLedger] = None) -> AsyncIterator[Dict]:
+    """
+    Analyzes a list of job postings concurrently and yields an event as soon as each job finishes.
+    Every event carries progress counters and the running top-K ranking; a final "done" event
+    carries the run's throughput stats. Concurrency is governed by the provider's adaptive rate limiter.
+    With api_config["pack_size"] > 1, jobs are sent several at a time with the profile included once.
+    Near-duplicate postings are analyzed once and share the analysis.
+    Jobs failing the deterministic pre-filter rules are rejected (or down-ranked) before any LLM call,
+    and every job gets a local BM25 relevance score; with prerank["top_k"] / prerank["min_score"] only
+    the most relevant jobs are sent to the provider.
+    With budget["max_tokens"] / budget["max_cost"], no new job is sent once the run's reported usage
+    plus in-flight estimates would exceed the budget; those jobs are reported as skipped.
+    With mode="score", each job only gets JOB_SCORE_PROMPT's score and one-line summary.
+    A `ledger` (see new_ledger) charges the run to an existing ledger instead of a fresh one for `budget`.
+    """
+    logger.info(f"Starting bulk analysis for {len(jobs)} jobs ({mode} mode).")
+    logger.info(f"Using AI provider: {api_config.get('provider', 'google')} for bulk analysis.")
+
+    pipeline = _BulkPipeline(profile_data, api_config, top_k, prefilter, prerank, budget, mode, ledger)
+    pipeline.add_jobs(jobs)
+    pipeline.close()
+    async for event in pipeline.events():
+        yield event
+
+
+async def _feed_search_pages(pipeline: _BulkPipeline, search: Dict, max_jobs: int):
+    """
+    Producer side of stream_search_and_analyze: follows the search's next_cursor page by page,
+    handing each page to the pipeline, until max_jobs jobs were fetched or the results run out.
+    Holds off on the next page while SEARCH_PREFETCH_JOBS analyses are still outstanding.
+    """
+    after = search.get("after")
+    page_size = search.get("first") or SEARCH_PAGE_SIZE
+    stats = pipeline.source_stats
+    stats.update({"pages_fetched": 0, "jobs_fetched": 0, "duplicates_collapsed": 0, "search_total": None})
+    try:
+        while stats["jobs_fetched"] < max_jobs:
+            await pipeline.wait_for_capacity(SEARCH_PREFETCH_JOBS)
+            page = await upwork_api.search_upwork_jobs_gql(
+                query=search.get("query"),
+                category_ids=search.get("category_ids"),
+                location=search.get("location"),
+                first=min(page_size, max_jobs - stats["jobs_fetched"]),
+                after=after,
+            )
+            jobs = page["jobs"][:max_jobs - stats["jobs_fetched"]]
+            paging = page.get("paging", {})
+            stats["pages_fetched"] += 1
+            stats["jobs_fetched"] += len(jobs)
+            stats["duplicates_collapsed"] += paging.get("duplicates_collapsed") or 0
+            stats["search_total"] = paging.get("total")
+            after = paging.get("next_cursor")
+            logger.info(f"Search page {stats['pages_fetched']}: {len(jobs)} jobs ({stats['jobs_fetched']}/{max_jobs}).")
+            pipeline.publish({"event": "page", "page": stats["pages_fetched"], "jobs": len(jobs),
+                              "jobs_fetched": stats["jobs_fetched"], "search_total": stats["search_total"],
+                              "next_cursor": after})
+            pipeline.add_jobs(jobs)
+            if not jobs or not paging.get("has_next_page") or not after:
+                break
+    except (ConnectionError, ValueError) as e:
+        # Jobs from earlier pages are still analyzed; the run just ends early.
+        logger.error(f"Job search failed after {stats['pages_fetched']} pages: {e}")
+        pipeline.publish({"event": "search_error", "error": str(e), "pages_fetched": stats["pages_fetched"]})
+    except Exception as e:
+        logger.error(f"Unexpected error during job search after {stats['pages_fetched']} pages: {e}", exc_info=True)
+        pipeline.publish({"event": "search_error", "error": "Failed to search jobs.", "pages_fetched": stats["pages_fetched"]})
+    finally:
+        pipeline.close()
+
+
+async def stream_search_and_analyze(search: Dict, max_jobs: int, profile_data: Dict, api_config: Dict,
+                                    top_k: int = DEFAULT_TOP_K, prefilter: Optional[Dict] = None,
+                                    prerank: Optional[Dict] = None, budget: Optional[Dict] = None,
+                                    mode: str = "full") -> AsyncIterator[Dict]:
+    """
+    Runs a job search and analyzes its results as they arrive: later pages are fetched while the
+    jobs of earlier ones are being scored. Yields the same events as stream_multiple_jobs, plus a
+    "page" event per fetched page (and "search_error" if fetching stops on an error).
+    Pre-rank limits and scores apply to each page on its own, since later pages aren't known yet.
+    """
+    logger.info(f"Starting search-and-analyze for up to {max_jobs} jobs (query: {search.get('query')!r}).")
+
+    pipeline = _BulkPipeline(profile_data, api_config, top_k, prefilter, prerank, budget, mode)
+    producer = asyncio.create_task(_feed_search_pages(pipeline, search, max_jobs))
+    try:
+        async for event in pipeline.events():
+            yield event
+    finally:
+        producer.cancel()
+
+
+async def analyze_multiple_jobs(jobs: List[Dict], profile_data: Dict, api_config: Dict,
+                                prefilter: Optional[Dict] = None, prerank: Optional[Dict] = None,
+                                budget: Optional[Dict] = None, mode: str = "full") -> Dict:
+    """
+    Analyzes a list of job postings concurrently against a freelancer's profile.
+    Returns the ranked analyses, the jobs that failed (after retries) with their errors, the jobs
+    rejected by the pre-filter with their reasons, the jobs left out by the local pre-rank or the
+    budget, and the throughput, retry, circuit-breaker and usage stats of the run.
+    """
+    successful_analyses = []
+    errors = []
+    rejected = []
+    skipped = []
+    stats = {}
+    async for event in stream_multiple_jobs(jobs, profile_data, api_config, prefilter=prefilter,
+                                            prerank=prerank, budget=budget, mode=mode):
+        if event["event"] == "result":
+            successful_analyses.append(event["analysis"])
+        elif event["event"] == "rejected":
+            rejected.append({"job_data": event["job_data"], "reasons": event["reasons"]})
+        elif event["event"] == "error":
+            errors.append({"job_data": event.get("job_data"), "error": event["error"],
+                           "retryable": event.get("retryable", False)})
+        elif event["event"] == "skipped":
+            skipped.append({"job_data": event["job_data"], "local_score": event["local_score"], "reason": event["reason"]})
+        elif event["event"] == "done":
+            stats = event["stats"]
 
     # Rank the results based on the suitability_score
     ranked_analyses = sorted(
@@ -59,4 +736,4 @@ async def analyze_multiple_jobs(jobs: List[Dict], profile_data: Dict, api_config
         reverse=True
     )
 
-    return ranked_analyses
+    return {"results": ranked_analyses, "errors": errors, "rejected": rejected, "skipped": skipped, "stats": stats}
@@ -0,0 +1,192 @@
+# backend/client_pool.py
+import asyncio
+import hashlib
+import logging
+import threading
+import weakref
+from typing import Dict, Optional, Tuple
+
+import boto3
+from botocore.config import Config
+from google.ai import generativelanguage as glm
+from google.api_core import client_options as client_options_lib
+from google.generativeai import types as genai_types
+from google.generativeai.types import generation_types
+
+from . import rate_limiter
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_AWS_REGION = "us-west-2"
+
+# (provider, region, credential fingerprint, model ID or endpoint) -> client or model instance
+_clients: Dict[Tuple[str, str, str, str], object] = {}
+_lock = threading.Lock()
+_stats = {"created": 0, "reused": 0, "invalidations": 0}
+# Event loops that own pooled grpc.aio clients; their clients are dropped when the loop is collected.
+_loops: "weakref.WeakSet[asyncio.AbstractEventLoop]" = weakref.WeakSet()
+
+
+def credential_fingerprint(*secrets: Optional[str]) -> str:
+    """
+    Short digest identifying a set of credentials, so pool keys and stats never hold the secrets
+    themselves. Missing credentials (fall back to the environment) fingerprint as "env".
+    """
+    if not any(secrets):
+        return "env"
+    return hashlib.sha256("\x00".join(secret or "" for secret in secrets).encode('utf-8')).hexdigest()[:16]
+
+
+def _get_or_create(key: Tuple[str, str, str, str], factory):
+    with _lock:
+        client = _clients.get(key)
+        if client is not None:
+            _stats["reused"] += 1
+            return client
+    # Built outside the lock: creating a boto3 client resolves endpoints and credentials.
+    client = factory()
+    with _lock:
+        existing = _clients.get(key)
+        if existing is not None:
+            _stats["reused"] += 1
+            return existing
+        _clients[key] = client
+        _stats["created"] += 1
+    logger.info(f"Created pooled {key[0]} client (region {key[1]}, credentials {key[2]}).")
+    return client
+
+
+def get_bedrock_client(api_config: Dict):
+    """
+    Shared bedrock-runtime client for the config's region and credentials. boto3 clients are
+    thread-safe, and reusing one keeps its endpoint resolution, credential chain and HTTP
+    connections warm across calls.
+    """
+    aws_access_key_id = api_config.get("aws_access_key_id")
+    aws_secret_access_key = api_config.get("aws_secret_access_key")
+    region = api_config.get("aws_region") or DEFAULT_AWS_REGION
+    endpoint_url = api_config.get("bedrock_endpoint_url")
+    # Keys only count as a pair; otherwise boto3 searches the environment (e.g. ~/.aws/credentials).
+    if not (aws_access_key_id and aws_secret_access_key):
+        aws_access_key_id = aws_secret_access_key = None
+
+    def create():
+        client_args = {
+            "service_name": "bedrock-runtime",
+            "region_name": region,
+            # Room for every concurrent call the rate limiter may allow, plus a hedged duplicate.
+            "config": Config(
+                max_pool_connections=max(rate_limiter.DEFAULT_MAX_CONCURRENCY, int(api_config.get("max_concurrency") or 0)) + 1,
+                tcp_keepalive=True,
+            ),
+        }
+        if endpoint_url:
+            client_args["endpoint_url"] = endpoint_url
+        if aws_access_key_id:
+            client_args["aws_access_key_id"] = aws_access_key_id
+            client_args["aws_secret_access_key"] = aws_secret_access_key
+        return boto3.client(**client_args)
+
+    key = ("aws", region, credential_fingerprint(aws_access_key_id, aws_secret_access_key), endpoint_url or "bedrock-runtime")
+    return _get_or_create(key, create)
+
+
+def _forget_loop(loop_suffix: str):
+    with _lock:
+        for key in [key for key in _clients if key[3].endswith(loop_suffix)]:
+            del _clients[key]
+
+
+def _loop_scoped(target: str) -> str:
+    """
+    grpc.aio channels can only be used on the event loop they were created on, so the async Gemini
+    clients are pooled per running loop (one in the server, a fresh one per asyncio.run elsewhere).
+    """
+    loop = asyncio.get_running_loop()
+    suffix = f"@loop-{id(loop):x}"
+    if loop not in _loops:
+        _loops.add(loop)
+        weakref.finalize(loop, _forget_loop, suffix)
+    return target + suffix
+
+
+def get_gemini_client(api_key: str):
+    """Shared async GenerativeService client for `api_key` on the running event loop."""
+    key = ("google", "global", credential_fingerprint(api_key), _loop_scoped("generative-service"))
+    return _get_or_create(key, lambda: glm.GenerativeServiceAsyncClient(
+        client_options=client_options_lib.ClientOptions(api_key=api_key)
+    ))
+
+
+def get_gemini_cache_client(api_key: str):
+    """Shared async CacheService client for `api_key` on the running event loop, used to manage cached content."""
+    key = ("google", "global", credential_fingerprint(api_key), _loop_scoped("cache-service"))
+    return _get_or_create(key, lambda: glm.CacheServiceAsyncClient(
+        client_options=client_options_lib.ClientOptions(api_key=api_key)
+    ))
+
+
+class GeminiModel:
+    """
+    The part of genai.GenerativeModel the providers use, generate_content_async, sent through the
+    pooled GenerativeService client for one API key instead of the process-wide genai.configure
+    client, optionally against cached content. Answers are the SDK's own response type, so
+    .text, .candidates and .usage_metadata work as with GenerativeModel.
+    """
+
+    def __init__(self, api_key: str, model_id: str, cached_content: Optional[str] = None):
+        self.api_key = api_key
+        self.model_name = model_id if "/" in model_id else f"models/{model_id}"
+        self.cached_content = cached_content
+
+    def _request(self, contents: str, generation_config) -> glm.GenerateContentRequest:
+        request = {"model": self.model_name, "contents": [glm.Content(role="user", parts=[glm.Part(text=contents)])]}
+        if generation_config is not None:
+            request["generation_config"] = generation_types.to_generation_config_dict(generation_config)
+        if self.cached_content is not None:
+            request["cached_content"] = self.cached_content
+        return glm.GenerateContentRequest(**request)
+
+    async def generate_content_async(self, contents: str, *, generation_config=None, stream: bool = False,
+                                     request_options: Optional[Dict] = None) -> genai_types.AsyncGenerateContentResponse:
+        request = self._request(contents, generation_config)
+        client = get_gemini_client(self.api_key)
+        if stream:
+            iterator = await client.stream_generate_content(request, **(request_options or {}))
+            return await genai_types.AsyncGenerateContentResponse.from_aiterator(iterator)
+        response = await client.generate_content(request, **(request_options or {}))
+        return genai_types.AsyncGenerateContentResponse.from_response(response)
+
+
+def bind_gemini_model(api_key: str, model_id: str, cached_content: Optional[str] = None) -> GeminiModel:
+    """A model that calls through the pooled client for `api_key`, optionally with cached content as its context."""
+    return GeminiModel(api_key, model_id, cached_content)
+
+
+def get_gemini_model(api_key: str, model_id: str) -> GeminiModel:
+    """Model for `api_key`, so the key saved through /api/config is the one used. Its client is pooled per event loop."""
+    return bind_gemini_model(api_key, model_id)
+
+
+def invalidate():
+    """
+    Drops every pooled client, e.g. after the API config changed. Calls already holding a client
+    finish with it; the next call builds a fresh one.
+    """
+    with _lock:
+        dropped = len(_clients)
+        _clients.clear()
+        _stats["invalidations"] += 1
+    if dropped:
+        logger.info(f"Invalidated {dropped} pooled provider clients.")
+
+
+def get_stats() -> Dict:
+    with _lock:
+        return {
+            **_stats,
+            "clients": [
+                {"provider": provider, "region": region, "credentials": fingerprint, "target": target}
+                for provider, region, fingerprint, target in _clients
+            ],
+        }
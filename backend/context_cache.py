@@ -0,0 +1,219 @@
+# backend/context_cache.py
+import asyncio
+import contextvars
+import logging
+import time
+from typing import Dict, List, Optional, Tuple
+
+from google.ai import generativelanguage as glm
+
+from . import client_pool, prompts, rate_limiter, usage_tracker
+
+logger = logging.getLogger(__name__)
+
+# Smallest prefixes the providers cache: Gemini 2.5 Flash rejects smaller cached content, and
+# Bedrock ignores cache checkpoints below this size on Nova models.
+GEMINI_MIN_CACHE_TOKENS = 1024
+BEDROCK_MIN_CACHE_TOKENS = 1024
+CACHE_TTL_SECONDS = 3600  # Safety net only: a run's Gemini cache is deleted when the run ends.
+# Unless api_config["context_caching"] is set, a run only caches its prefix once it has planned this
+# many provider calls: a Gemini cache is billed for its creation and by the hour for storage, which
+# a handful of calls doesn't earn back.
+MIN_CACHED_RUN_CALLS = 10
+
+PREFIX_NAMES = {
+    prompts.JOB_ANALYSIS_PREFIX: "analysis",
+    prompts.BULK_JOB_ANALYSIS_PREFIX: "packed",
+    prompts.JOB_SCORE_PREFIX: "score",
+}
+
+_current_cache: contextvars.ContextVar = contextvars.ContextVar("context_cache", default=None)
+
+
+class CachedPrefix:
+    """
+    One static prompt prefix of a run (instructions + profile) on one provider, and how well its
+    cache worked. Status: "pending" until the provider confirms the cache, then "active"; or
+    "too_small" / "failed" / "disabled", in which case calls send the full prompt.
+    """
+
+    def __init__(self, provider: str, model_id: str, template: str, text: str, min_tokens: int, enabled: bool):
+        self.provider = provider
+        self.model_id = model_id
+        self.name = PREFIX_NAMES.get(template, "custom")
+        self.text = text
+        self.tokens = rate_limiter.estimate_tokens(text)
+        self.status = "pending"
+        if not enabled:
+            self.status = "disabled"
+        elif self.tokens < min_tokens:
+            self.status = "too_small"
+        self.error = None
+        self.cache_name = None  # Gemini cachedContents/... resource
+        self.model = None  # Gemini model bound to the cached content
+        self.cache_client = None
+        self.lock = asyncio.Lock()
+        self.requests = 0
+        self.hits = 0
+        self.cache_read_tokens = 0
+        self.cache_write_tokens = 0
+        self.storage_billed_until = None  # Gemini cached content: monotonic time storage is billed up to.
+
+    @property
+    def usable(self) -> bool:
+        return self.status in ("pending", "active")
+
+    def record(self, read_tokens: int, write_tokens: int = 0):
+        self.requests += 1
+        read_tokens, write_tokens = int(read_tokens or 0), int(write_tokens or 0)
+        if read_tokens:
+            self.hits += 1
+        if read_tokens or write_tokens:
+            self.status = "active"
+        self.cache_read_tokens += read_tokens
+        self.cache_write_tokens += write_tokens
+
+    def fail(self, error: BaseException):
+        """Stops using the cache for the rest of the run; calls fall back to full prompts."""
+        if self.status != "failed":
+            logger.warning(f"{self.provider} context cache for the {self.name} prefix failed, sending full prompts: {error}")
+        self.status = "failed"
+        self.error = str(error)
+
+    def summary(self, prices: Dict) -> Dict:
+        price = prices.get(self.model_id, {})
+        input_price = price.get("input_per_million", 0.0)
+        cached_price = price.get("cached_input_per_million")
+        saved_per_token = (input_price - (input_price if cached_price is None else cached_price)) / 1_000_000
+        return {
+            "provider": self.provider,
+            "model": self.model_id,
+            "prefix": self.name,
+            "status": self.status,
+            "prefix_tokens": self.tokens,
+            "requests": self.requests,
+            "hits": self.hits,
+            "hit_rate": round(self.hits / self.requests, 3) if self.requests else 0.0,
+            "cache_read_tokens": self.cache_read_tokens,
+            "cache_write_tokens": self.cache_write_tokens,
+            "cost_saved": round(self.cache_read_tokens * saved_per_token, 6),
+            "error": self.error,
+        }
+
+
+class RunContextCache:
+    """
+    The cacheable prompt prefixes of one bulk run. Gemini prefixes are registered as cached content
+    on first use and deleted by close(); Bedrock prefixes are marked with a cachePoint and cached by
+    the provider on the first call.
+    """
+
+    def __init__(self, profile_data: Dict, api_config: Dict):
+        self.profile_data = profile_data
+        # True: always cache. False: never. None (default): once the run plans MIN_CACHED_RUN_CALLS calls.
+        self.setting = api_config.get("context_caching")
+        self.enabled = self.setting is not False
+        self.planned_calls = 0
+        self.prices = usage_tracker.resolve_price_table(api_config)
+        self._prefixes: Dict[Tuple[str, str, str], CachedPrefix] = {}
+
+    def plan(self, calls: int):
+        """Counts provider calls the run has scheduled; see MIN_CACHED_RUN_CALLS."""
+        self.planned_calls += calls
+
+    @property
+    def worthwhile(self) -> bool:
+        return self.setting is True or (self.enabled and self.planned_calls >= MIN_CACHED_RUN_CALLS)
+
+    def _get(self, provider: str, model_id: str, template: str, min_tokens: int) -> CachedPrefix:
+        # Cached content belongs to one model; a triage cascade may use two per provider.
+        key = (provider, model_id, template)
+        if key not in self._prefixes:
+            text = prompts.format_prompt(template, profile_data=self.profile_data)
+            self._prefixes[key] = CachedPrefix(provider, model_id, template, text, min_tokens, self.enabled)
+        return self._prefixes[key]
+
+    async def gemini_prefix(self, template: str, api_key: str, model_id: str) -> Optional[CachedPrefix]:
+        prefix = self._get("google", model_id, template, GEMINI_MIN_CACHE_TOKENS)
+        if not prefix.usable or not self.worthwhile:
+            return None
+        async with prefix.lock:
+            if prefix.model is None and prefix.usable:
+                ledger = usage_tracker.current_ledger()
+                try:
+                    prefix.cache_client = client_pool.get_gemini_cache_client(api_key)
+                    # Creating the cache is billed as input tokens, so it counts against the run's budget.
+                    if ledger is not None:
+                        with ledger.reservation(model_id, prefix.tokens, 0):
+                            cached = await self._create_gemini_cache(prefix, model_id)
+                    else:
+                        cached = await self._create_gemini_cache(prefix, model_id)
+                except Exception as e:
+                    prefix.fail(e)
+                    return None
+                prefix.cache_name = cached.name
+                prefix.cache_write_tokens = cached.usage_metadata.total_token_count or prefix.tokens
+                prefix.storage_billed_until = time.monotonic()
+                usage_tracker.record("google", model_id, prefix.cache_write_tokens, 0)
+                prefix.model = client_pool.bind_gemini_model(api_key, model_id, cached.name)
+                prefix.status = "active"
+                logger.info(f"Registered the {prefix.name} prompt prefix ({prefix.cache_write_tokens} tokens) "
+                            f"as Gemini cached content {cached.name}.")
+        return prefix if prefix.usable else None
+
+    @staticmethod
+    async def _create_gemini_cache(prefix: CachedPrefix, model_id: str):
+        return await prefix.cache_client.create_cached_content(cached_content=glm.CachedContent(
+            model=f"models/{model_id}",
+            display_name=f"upwork-matcher-{prefix.name}-prefix",
+            contents=[glm.Content(role="user", parts=[glm.Part(text=prefix.text)])],
+            ttl={"seconds": CACHE_TTL_SECONDS},
+        ))
+
+    def bedrock_prefix(self, template: str, model_id: str) -> Optional[CachedPrefix]:
+        prefix = self._get("aws", model_id, template, BEDROCK_MIN_CACHE_TOKENS)
+        return prefix if prefix.usable and self.worthwhile else None
+
+    def bill_storage(self, ledger: usage_tracker.UsageLedger):
+        """Charges the storage of the run's Gemini cached content since it was last billed to `ledger`."""
+        now = time.monotonic()
+        for prefix in self._prefixes.values():
+            if prefix.cache_name is None or prefix.storage_billed_until is None:
+                continue
+            ledger.add_storage(prefix.model_id, prefix.cache_write_tokens * (now - prefix.storage_billed_until) / 3600)
+            prefix.storage_billed_until = now
+
+    async def close(self):
+        """Deletes the run's Gemini cached content instead of paying storage until the TTL runs out."""
+        for prefix in self._prefixes.values():
+            if prefix.cache_name is None:
+                continue
+            try:
+                await prefix.cache_client.delete_cached_content(name=prefix.cache_name)
+            except Exception as e:
+                logger.warning(f"Could not delete Gemini cached content {prefix.cache_name}: {e}")
+            prefix.cache_name = None
+
+    def summary(self) -> Dict:
+        prefixes: List[Dict] = [prefix.summary(self.prices) for prefix in self._prefixes.values()]
+        requests = sum(prefix["requests"] for prefix in prefixes)
+        hits = sum(prefix["hits"] for prefix in prefixes)
+        return {
+            "enabled": self.enabled,
+            "planned_calls": self.planned_calls,
+            "requests": requests,
+            "hits": hits,
+            "hit_rate": round(hits / requests, 3) if requests else 0.0,
+            "cache_read_tokens": sum(prefix["cache_read_tokens"] for prefix in prefixes),
+            "cost_saved": round(sum(prefix["cost_saved"] for prefix in prefixes), 6),
+            "prefixes": prefixes,
+        }
+
+
+def bind(cache: Optional[RunContextCache]):
+    """Lets provider calls made from the current task (and tasks it spawns) use `cache`."""
+    _current_cache.set(cache)
+
+
+def current() -> Optional[RunContextCache]:
+    return _current_cache.get()
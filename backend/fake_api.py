@@ -0,0 +1,288 @@
+# backend/fake_api.py
+import asyncio
+import hashlib
+import json
+import logging
+import math
+import random
+from typing import AsyncIterator, Dict, List, Optional
+
+from . import prompts, analysis_cache, rate_limiter, resilience, response_parser, usage_tracker
+
+logger = logging.getLogger(__name__)
+
+# Offline stand-in for gemini_api / bedrock_api, selected with api_config["provider"] = "fake".
+# It makes no network calls and spends no quota: answers are derived from a hash of the job and
+# profile, so the same inputs always get the same analysis, while latency, transient errors and
+# throttling are drawn from the distributions in api_config["fake_provider"] (see DEFAULT_SETTINGS).
+MODEL_ID = "fake-analyzer-v1"
+TRIAGE_MODEL_ID = "fake-triage-v1"
+
+DEFAULT_SETTINGS = {
+    "latency_distribution": "lognormal",  # "fixed", "uniform", "exponential" or "lognormal"
+    "latency_mean_seconds": 1.0,
+    "latency_spread": 0.5,  # lognormal sigma; +/- fraction of the mean for "uniform"
+    "packed_job_seconds": 0.2,  # Extra latency per additional job in a packed request.
+    "score_latency_factor": 0.25,  # Score-only calls take this share of the latency (far fewer output tokens).
+    "error_rate": 0.0,  # Share of calls failing with a transient 503.
+    "throttle_rate": 0.0,  # Share of calls rejected with a 429.
+    "malformed_rate": 0.0,  # Share of answers wrapped in prose / code fences with a trailing comma.
+    "tokens_per_second": 80.0,  # Pace of streamed proposals.
+    "seed": None,  # Seeds latency and error draws; answers are deterministic regardless.
+}
+ANALYSIS_OUTPUT_TOKENS = 250
+SCORE_OUTPUT_TOKENS = 40
+PROPOSAL_OUTPUT_TOKENS = 300
+
+_rngs: Dict[Optional[int], random.Random] = {}
+
+
+class FakeProviderError(Exception):
+    """Simulated provider failure; `code` is read by resilience.provider_error like an SDK status code."""
+
+    def __init__(self, message: str, code: int):
+        super().__init__(message)
+        self.code = code
+
+
+def _settings(api_config: Optional[dict]) -> Dict:
+    settings = dict(DEFAULT_SETTINGS)
+    settings.update({k: v for k, v in ((api_config or {}).get("fake_provider") or {}).items() if v is not None})
+    return settings
+
+
+def _rng(settings: Dict) -> random.Random:
+    seed = settings["seed"]
+    if seed not in _rngs:
+        _rngs[seed] = random.Random(seed)
+    return _rngs[seed]
+
+
+def sample_latency(settings: Dict, rng: random.Random) -> float:
+    mean = float(settings["latency_mean_seconds"])
+    spread = float(settings["latency_spread"])
+    distribution = settings["latency_distribution"]
+    if mean <= 0 or distribution == "fixed":
+        return max(0.0, mean)
+    if distribution == "uniform":
+        return rng.uniform(mean * (1 - spread), mean * (1 + spread))
+    if distribution == "exponential":
+        return rng.expovariate(1 / mean)
+    # Lognormal with the requested mean: a long right tail, like real LLM latencies.
+    return rng.lognormvariate(math.log(mean) - spread ** 2 / 2, spread)
+
+
+async def _simulate_call(settings: Dict, extra_seconds: float = 0.0, latency_factor: float = 1.0):
+    """Waits out one call's latency, then fails it if it drew a 429 or a 503."""
+    rng = _rng(settings)
+    await asyncio.sleep(sample_latency(settings, rng) * latency_factor + extra_seconds)
+    draw = rng.random()
+    if draw < settings["throttle_rate"]:
+        raise FakeProviderError("429 Too Many Requests (simulated)", 429)
+    if draw < settings["throttle_rate"] + settings["error_rate"]:
+        raise FakeProviderError("503 Service Unavailable (simulated)", 503)
+
+
+def _digest(*values) -> int:
+    payload = json.dumps(values, sort_keys=True, default=str)
+    return int(hashlib.sha256(payload.encode('utf-8')).hexdigest()[:12], 16)
+
+
+def fake_analysis(job_data: dict, profile_data: dict) -> dict:
+    """The deterministic analysis of a job: same job and profile, same answer."""
+    digest = _digest(job_data.get('id') or job_data.get('title'), job_data.get('title'), profile_data)
+    skills = [skill for skill in (job_data.get('skills') or []) if isinstance(skill, str)]
+    return {
+        "suitability_score": digest % 101,
+        "analysis_summary": f"Simulated analysis of '{job_data.get('title') or 'untitled job'}'.",
+        "strengths": [f"Experience with {skill}." for skill in skills[:2]] or ["General fit with the profile."],
+        "weaknesses": ["Simulated gap in the profile."] if digest % 3 else [],
+        "proposal_suggestions": ["Mention a project similar to this one.", "Keep the cover letter short."],
+    }
+
+
+def fake_score(job_data: dict, profile_data: dict) -> int:
+    """The deterministic score-only answer for a job: within 10 points of its fake_analysis score."""
+    digest = _digest(job_data.get('id') or job_data.get('title'), job_data.get('title'), profile_data)
+    return min(100, max(0, digest % 101 + (digest >> 8) % 21 - 10))
+
+
+def _render(value, settings: Dict, rng: random.Random) -> str:
+    text = json.dumps(value)
+    if rng.random() < settings["malformed_rate"]:
+        # The defects response_parser repairs: surrounding prose, code fences and a trailing comma.
+        closer = "]" if text.endswith("]") else "}"
+        text = f"Here is the analysis:\n```json\n{text[:-1]},{closer}\n```"
+    return text
+
+
+def model_id(api_config: dict = None) -> str:
+    """The simulated model: api_config["models"]["fake"], or MODEL_ID. It only labels usage and cache keys."""
+    return ((api_config or {}).get("models") or {}).get("fake") or MODEL_ID
+
+
+def _record_usage(api_config: Optional[dict], prompt_text: str, output_tokens: int):
+    usage_tracker.record("fake", model_id(api_config), rate_limiter.estimate_tokens(prompt_text), output_tokens)
+
+
+def analysis_cache_key(job_data: dict, profile_data: dict, prompt_template: str = prompts.JOB_ANALYSIS_PROMPT,
+                       api_config: dict = None) -> str:
+    return analysis_cache.make_key(job_data, profile_data, prompt_template, model_id(api_config),
+                                   prompts.description_budget(api_config))
+
+
+async def get_job_analysis(job_data: dict, profile_data: dict, api_config: dict = None) -> dict:
+    """
+    Analyzes a job posting with the fake provider, through the persistent analysis cache like
+    the real providers.
+    """
+    return await analysis_cache.get_or_compute(
+        analysis_cache_key(job_data, profile_data, api_config=api_config),
+        lambda: _request_job_analysis(job_data, profile_data, api_config)
+    )
+
+
+async def _request_job_analysis(job_data: dict, profile_data: dict, api_config: dict = None) -> dict:
+    settings = _settings(api_config)
+    # Rendered like a real call, so benchmarks include the serialization cost.
+    prompt_text = prompts.format_prompt(
+        prompts.JOB_ANALYSIS_PROMPT, prompts.description_budget(api_config),
+        job_data=job_data,
+        profile_data=profile_data
+    )
+
+    async def request(reask: bool) -> str:
+        await _simulate_call(settings)
+        _record_usage(api_config, prompt_text, ANALYSIS_OUTPUT_TOKENS)
+        return _render(fake_analysis(job_data, profile_data), settings, _rng(settings))
+
+    try:
+        return await response_parser.parse_or_reask(request, response_parser.parse_analysis, f"job {job_data.get('title')}")
+    except FakeProviderError as e:
+        raise resilience.provider_error(f"Simulated provider error: {e}", e)
+
+
+async def get_job_score(job_data: dict, profile_data: dict, api_config: dict = None) -> dict:
+    """Scores a job posting like the score-only prompt: score and one-line summary, faster than an analysis."""
+    return await analysis_cache.get_or_compute(
+        analysis_cache_key(job_data, profile_data, prompts.JOB_SCORE_PROMPT, api_config),
+        lambda: _request_job_score(job_data, profile_data, api_config)
+    )
+
+
+async def _request_job_score(job_data: dict, profile_data: dict, api_config: dict = None) -> dict:
+    settings = _settings(api_config)
+    prompt_text = prompts.format_prompt(
+        prompts.JOB_SCORE_PROMPT, prompts.description_budget(api_config),
+        job_data=job_data,
+        profile_data=profile_data
+    )
+
+    async def request(reask: bool) -> str:
+        await _simulate_call(settings, latency_factor=float(settings["score_latency_factor"]))
+        _record_usage(api_config, prompt_text, SCORE_OUTPUT_TOKENS)
+        score = {
+            "suitability_score": fake_score(job_data, profile_data),
+            "analysis_summary": f"Simulated score of '{job_data.get('title') or 'untitled job'}'.",
+        }
+        return _render(score, settings, _rng(settings))
+
+    try:
+        return await response_parser.parse_or_reask(request, response_parser.parse_score, f"score of job {job_data.get('title')}")
+    except FakeProviderError as e:
+        raise resilience.provider_error(f"Simulated provider error: {e}", e)
+
+
+async def get_job_analysis_with_proposal(job_data: dict, profile_data: dict, api_config: dict = None) -> dict:
+    """
+    The fake analysis and cover letter from one request: one latency sample, plus the letter's
+    writing time at tokens_per_second, as in generate_proposal.
+    """
+    settings = _settings(api_config)
+    prompt_text = prompts.format_prompt(
+        prompts.JOB_ANALYSIS_WITH_PROPOSAL_PROMPT, prompts.description_budget(api_config),
+        job_data=job_data,
+        profile_data=profile_data
+    )
+    analysis = fake_analysis(job_data, profile_data)
+    proposal_text = _fake_proposal(job_data, analysis)
+
+    async def request(reask: bool) -> str:
+        await _simulate_call(settings, len(proposal_text.split()) / float(settings["tokens_per_second"]))
+        _record_usage(api_config, prompt_text, ANALYSIS_OUTPUT_TOKENS + PROPOSAL_OUTPUT_TOKENS)
+        return _render({**analysis, "proposal_text": proposal_text}, settings, _rng(settings))
+
+    try:
+        return await response_parser.parse_or_reask(
+            request, response_parser.parse_analysis_with_proposal, f"analysis and proposal of job {job_data.get('title')}"
+        )
+    except FakeProviderError as e:
+        raise resilience.provider_error(f"Simulated provider error: {e}", e)
+
+async def get_bulk_job_analysis(jobs_data: list, profile_data: dict, api_config: dict = None) -> list:
+    """
+    Analyzes several job postings in one fake request; each job must carry a "job_id".
+    """
+    settings = _settings(api_config)
+    prompt_text = prompts.format_prompt(
+        prompts.BULK_JOB_ANALYSIS_PROMPT, prompts.description_budget(api_config),
+        jobs_data=jobs_data,
+        profile_data=profile_data
+    )
+    try:
+        await _simulate_call(settings, settings["packed_job_seconds"] * max(0, len(jobs_data) - 1))
+    except FakeProviderError as e:
+        raise resilience.provider_error(f"Simulated provider error: {e}", e)
+    _record_usage(api_config, prompt_text, ANALYSIS_OUTPUT_TOKENS * len(jobs_data))
+
+    analyses = [{"job_id": job["job_id"], **fake_analysis({k: v for k, v in job.items() if k != "job_id"}, profile_data)}
+                for job in jobs_data]
+    try:
+        return response_parser.parse_analyses(_render(analyses, settings, _rng(settings)))
+    except response_parser.ResponseFormatError as e:
+        raise ValueError(f"Failed to parse the packed analysis from the AI response: {e}")
+
+
+def _fake_proposal(job_data: dict, analysis_data: dict) -> str:
+    strengths = " ".join(analysis_data.get('strengths') or [])
+    return (f"Hello, I read your posting '{job_data.get('title') or 'untitled job'}' with interest. {strengths} "
+            f"This is a simulated cover letter from the offline fake provider, written so that streamed and "
+            f"non-streamed proposals can be benchmarked without calling a real model. Best regards.")
+
+
+async def generate_proposal(job_data: dict, profile_data: dict, analysis_data: dict, api_config: dict = None) -> str:
+    settings = _settings(api_config)
+    prompt_text = prompts.format_prompt(
+        prompts.PROPOSAL_GENERATION_PROMPT, prompts.description_budget(api_config),
+        job_data=job_data,
+        profile_data=profile_data,
+        analysis_data=analysis_data
+    )
+    proposal_text = _fake_proposal(job_data, analysis_data)
+    try:
+        await _simulate_call(settings, len(proposal_text.split()) / float(settings["tokens_per_second"]))
+    except FakeProviderError as e:
+        raise resilience.provider_error(f"Simulated provider error: {e}", e)
+    _record_usage(api_config, prompt_text, PROPOSAL_OUTPUT_TOKENS)
+    return proposal_text
+
+
+async def stream_proposal(job_data: dict, profile_data: dict, analysis_data: dict, api_config: dict = None) -> AsyncIterator[str]:
+    """Streams the fake cover letter word by word at tokens_per_second, after one latency sample."""
+    settings = _settings(api_config)
+    prompt_text = prompts.format_prompt(
+        prompts.PROPOSAL_GENERATION_PROMPT, prompts.description_budget(api_config),
+        job_data=job_data,
+        profile_data=profile_data,
+        analysis_data=analysis_data
+    )
+    try:
+        await _simulate_call(settings)
+    except FakeProviderError as e:
+        raise resilience.provider_error(f"Simulated provider error: {e}", e)
+    words: List[str] = _fake_proposal(job_data, analysis_data).split(" ")
+    for index, word in enumerate(words):
+        if index:
+            await asyncio.sleep(1 / float(settings["tokens_per_second"]))
+        yield word if index == len(words) - 1 else f"{word} "
+    _record_usage(api_config, prompt_text, PROPOSAL_OUTPUT_TOKENS)
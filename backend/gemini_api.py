@@ -1,11 +1,11 @@
 # backend/gemini_api.py
 import os
-import json
 import logging
+from typing import AsyncIterator
 import google.generativeai as genai
 from google.api_core import exceptions as google_exceptions
 from dotenv import load_dotenv
-from . import prompts
+from . import prompts, analysis_cache, resilience, usage_tracker, client_pool, context_cache, response_parser
 
 # --- Configuration & Setup ---
 DOTENV_PATH = os.path.join(os.path.dirname(__file__), '..', '.env')
@@ -13,73 +13,248 @@ load_dotenv(dotenv_path=DOTENV_PATH)
 
 logger = logging.getLogger(__name__)
 
+# Fallback for configs without a google_api_key.
 GOOGLE_API = os.getenv("GOOGLE_API")
 
 if not GOOGLE_API:
-    logger.error("FATAL: GOOGLE_API not found in .env file.")
-    raise ValueError("GOOGLE_API is not set in the environment.")
+    logger.warning("GOOGLE_API not found in .env file; Gemini calls need a google_api_key in the API config.")
 
-genai.configure(api_key=GOOGLE_API)
+MODEL_ID = 'gemini-2.5-flash'
+# Default model of a triage cascade's score-only stage (see triage_cascade).
+TRIAGE_MODEL_ID = 'gemini-2.5-flash-lite'
 
-async def get_job_analysis(job_data: dict, profile_data: dict) -> dict:
+def model_id(api_config: dict = None) -> str:
+    """The Gemini model to call: api_config["models"]["google"], or MODEL_ID."""
+    return ((api_config or {}).get("models") or {}).get("google") or MODEL_ID
+
+def _api_key(api_config: dict = None) -> str:
+    api_key = (api_config or {}).get("google_api_key") or GOOGLE_API
+    if not api_key:
+        raise ValueError("No Google API key configured. Set one in the API settings or GOOGLE_API in .env.")
+    return api_key
+
+def _get_model(api_config: dict = None):
+    return client_pool.get_gemini_model(_api_key(api_config), model_id(api_config))
+
+def _record_usage(response, model: str, prefix: context_cache.CachedPrefix = None):
+    usage = getattr(response, 'usage_metadata', None)
+    cached_tokens = getattr(usage, 'cached_content_token_count', 0)
+    usage_tracker.record("google", model, getattr(usage, 'prompt_token_count', 0),
+                         getattr(usage, 'candidates_token_count', 0), cached_tokens)
+    if prefix is not None:
+        prefix.record(cached_tokens)
+
+async def _generate_analysis(model, api_config: dict, prefix_template: str, job_template: str, timeout: int,
+                             generation_options: dict = None, **fields):
     """
-    Analyzes a job posting against a freelancer's profile using the Gemini API.
+    Sends an analysis prompt (prefix_template + job_template). Within a bulk run that caches
+    context, only the job part is sent, against the run's cached prefix (instructions + profile).
+    `generation_options` adds GenerationConfig fields, e.g. a response_schema.
     """
-    logger.info(f"Starting Gemini analysis for job: {job_data.get('title')}")
+    budget = prompts.description_budget(api_config)
+    generation_config = genai.types.GenerationConfig(response_mime_type="application/json", **(generation_options or {}))
+    model_name = model_id(api_config)
+    run_cache = context_cache.current()
+    prefix = await run_cache.gemini_prefix(prefix_template, _api_key(api_config), model_name) if run_cache else None
+    if prefix is not None:
+        job_fields = {name: value for name, value in fields.items() if name != "profile_data"}
+        try:
+            response = await prefix.model.generate_content_async(
+                prompts.format_prompt(job_template, budget, **job_fields),
+                generation_config=generation_config,
+                request_options={'timeout': timeout}
+            )
+            _record_usage(response, model_name, prefix)
+            return response
+        except google_exceptions.NotFound as e:
+            # The cached content expired or was deleted; fall back to the full prompt.
+            prefix.fail(e)
 
-    try:
-        prompt_text = prompts.JOB_ANALYSIS_PROMPT.format(
-            job_data=json.dumps(job_data, indent=2),
-            profile_data=json.dumps(profile_data, indent=2)
-        )
+    response = await model.generate_content_async(
+        prompts.format_prompt(prefix_template + job_template, budget, **fields),
+        generation_config=generation_config,
+        request_options={'timeout': timeout}
+    )
+    _record_usage(response, model_name)
+    return response
 
-        model = genai.GenerativeModel('gemini-2.5-flash')
+def analysis_cache_key(job_data: dict, profile_data: dict, prompt_template: str = prompts.JOB_ANALYSIS_PROMPT,
+                       api_config: dict = None) -> str:
+    return analysis_cache.make_key(job_data, profile_data, prompt_template, model_id(api_config),
+                                   prompts.description_budget(api_config))
 
-        generation_config = genai.types.GenerationConfig(response_mime_type="application/json")
+async def get_job_analysis(job_data: dict, profile_data: dict, api_config: dict = None) -> dict:
+    """
+    Analyzes a job posting against a freelancer's profile using the Gemini API.
+    Results are served from the persistent analysis cache when the same job, profile,
+    prompt and model were analyzed before.
+    """
+    return await analysis_cache.get_or_compute(
+        analysis_cache_key(job_data, profile_data, api_config=api_config),
+        lambda: _request_job_analysis(job_data, profile_data, api_config)
+    )
 
-        response = await model.generate_content_async(
-            prompt_text,
-            generation_config=generation_config,
-            request_options={'timeout': 120}
+async def _request_job_analysis(job_data: dict, profile_data: dict, api_config: dict = None) -> dict:
+    logger.info(f"Starting Gemini analysis for job: {job_data.get('title')}")
+    model = _get_model(api_config)
+
+    async def request(reask: bool) -> str:
+        response = await _generate_analysis(
+            model, api_config, prompts.JOB_ANALYSIS_PREFIX,
+            prompts.JOB_ANALYSIS_JOB + (prompts.JSON_REASK_NOTE if reask else ""), 120,
+            job_data=job_data,
+            profile_data=profile_data
         )
+        return response.text
 
-        analysis_json = json.loads(response.text)
+    try:
+        analysis_json = await response_parser.parse_or_reask(
+            request, response_parser.parse_analysis, f"job {job_data.get('title')}"
+        )
         logger.info(f"Successfully parsed Gemini analysis for job: {job_data.get('title')}")
         
         return analysis_json
 
     except (google_exceptions.GoogleAPICallError, google_exceptions.RetryError) as e:
         logger.error(f"Google API call failed: {e}", exc_info=True)
-        raise ConnectionError(f"Communication error with Google AI: {e}")
-    except json.JSONDecodeError as e:
-        response_text = getattr(response, 'text', 'N/A')
-        logger.error(f"JSON parsing failed for Gemini response: {e}")
-        logger.error(f"Response text that failed parsing: {response_text}")
+        raise resilience.provider_error(f"Communication error with Google AI: {e}", e)
+    except response_parser.ResponseFormatError as e:
+        logger.error(f"Could not parse the Gemini analysis for job {job_data.get('title')}: {e}")
         raise ValueError("Failed to parse the analysis from the AI response.")
     except Exception as e:
         logger.error(f"An unexpected error occurred during Gemini API call: {e}", exc_info=True)
-        raise ConnectionError("An unexpected error occurred while analyzing the job.")
+        raise resilience.provider_error("An unexpected error occurred while analyzing the job.", e)
 
-async def generate_proposal(job_data: dict, profile_data: dict, analysis_data: dict) -> str:
+async def get_job_score(job_data: dict, profile_data: dict, api_config: dict = None) -> dict:
+    """
+    Scores a job posting with JOB_SCORE_PROMPT: the suitability_score and a one-line analysis_summary,
+    constrained by SCORE_RESPONSE_SCHEMA and capped at SCORE_MAX_OUTPUT_TOKENS. Cached like full
+    analyses, under the score prompt.
+    """
+    return await analysis_cache.get_or_compute(
+        analysis_cache_key(job_data, profile_data, prompts.JOB_SCORE_PROMPT, api_config),
+        lambda: _request_job_score(job_data, profile_data, api_config)
+    )
+
+async def _request_job_score(job_data: dict, profile_data: dict, api_config: dict = None) -> dict:
+    logger.info(f"Starting Gemini scoring for job: {job_data.get('title')}")
+    model = _get_model(api_config)
+    generation_options = {"response_schema": prompts.SCORE_RESPONSE_SCHEMA, "max_output_tokens": prompts.SCORE_MAX_OUTPUT_TOKENS}
+
+    async def request(reask: bool) -> str:
+        response = await _generate_analysis(
+            model, api_config, prompts.JOB_SCORE_PREFIX,
+            prompts.JOB_SCORE_JOB + (prompts.JSON_REASK_NOTE if reask else ""), 60, generation_options,
+            job_data=job_data,
+            profile_data=profile_data
+        )
+        # An answer stopped by the token cap before any text has no parts; treat it as unreadable.
+        if not (response.candidates and response.candidates[0].content.parts):
+            return ""
+        return response.text
+
+    try:
+        return await response_parser.parse_or_reask(
+            request, response_parser.parse_score, f"score of job {job_data.get('title')}"
+        )
+    except (google_exceptions.GoogleAPICallError, google_exceptions.RetryError) as e:
+        logger.error(f"Google API call failed during scoring: {e}", exc_info=True)
+        raise resilience.provider_error(f"Communication error with Google AI: {e}", e)
+    except response_parser.ResponseFormatError as e:
+        logger.error(f"Could not parse the Gemini score for job {job_data.get('title')}: {e}")
+        raise ValueError("Failed to parse the score from the AI response.")
+    except Exception as e:
+        logger.error(f"An unexpected error occurred during Gemini scoring: {e}", exc_info=True)
+        raise resilience.provider_error("An unexpected error occurred while scoring the job.", e)
+
+async def get_job_analysis_with_proposal(job_data: dict, profile_data: dict, api_config: dict = None) -> dict:
+    """
+    Analyzes a job posting and writes its cover letter in a single Gemini request, using
+    JOB_ANALYSIS_WITH_PROPOSAL_PROMPT. Not cached, like generate_proposal.
+    """
+    logger.info(f"Starting combined Gemini analysis and proposal for job: {job_data.get('title')}")
+    model = _get_model(api_config)
+
+    async def request(reask: bool) -> str:
+        response = await _generate_analysis(
+            model, api_config, prompts.JOB_ANALYSIS_WITH_PROPOSAL_PREFIX,
+            prompts.JOB_ANALYSIS_JOB + (prompts.JSON_REASK_NOTE if reask else ""), 180,
+            job_data=job_data,
+            profile_data=profile_data
+        )
+        return response.text
+
+    try:
+        result = await response_parser.parse_or_reask(
+            request, response_parser.parse_analysis_with_proposal, f"analysis and proposal of job {job_data.get('title')}"
+        )
+        logger.info(f"Successfully parsed combined Gemini analysis and proposal for job: {job_data.get('title')}")
+        return result
+    except (google_exceptions.GoogleAPICallError, google_exceptions.RetryError) as e:
+        logger.error(f"Google API call failed during combined analysis and proposal: {e}", exc_info=True)
+        raise resilience.provider_error(f"Communication error with Google AI: {e}", e)
+    except response_parser.ResponseFormatError as e:
+        logger.error(f"Could not parse the combined Gemini answer for job {job_data.get('title')}: {e}")
+        raise ValueError("Failed to parse the analysis and proposal from the AI response.")
+    except Exception as e:
+        logger.error(f"An unexpected error occurred during combined Gemini analysis and proposal: {e}", exc_info=True)
+        raise resilience.provider_error("An unexpected error occurred while analyzing the job.", e)
+
+async def get_bulk_job_analysis(jobs_data: list, profile_data: dict, api_config: dict = None) -> list:
+    """
+    Analyzes several job postings in a single Gemini request using BULK_JOB_ANALYSIS_PROMPT.
+    Each job must carry a "job_id"; returns the per-job analyses found in the response.
+    """
+    logger.info(f"Starting packed Gemini analysis for {len(jobs_data)} jobs.")
+    model = _get_model(api_config)
+
+    try:
+        response = await _generate_analysis(
+            model, api_config, prompts.BULK_JOB_ANALYSIS_PREFIX, prompts.BULK_JOB_ANALYSIS_JOBS, 180,
+            jobs_data=jobs_data,
+            profile_data=profile_data
+        )
+
+        # No re-ask here: jobs missing from the answer fall back to single-job calls.
+        analyses = response_parser.parse_analyses(response.text)
+        logger.info(f"Packed Gemini analysis returned {len(analyses)} of {len(jobs_data)} jobs.")
+
+        return analyses
+
+    except (google_exceptions.GoogleAPICallError, google_exceptions.RetryError) as e:
+        logger.error(f"Google API call failed during packed analysis: {e}", exc_info=True)
+        raise resilience.provider_error(f"Communication error with Google AI: {e}", e)
+    except response_parser.ResponseFormatError as e:
+        logger.error(f"Could not parse the packed Gemini response: {e}")
+        raise ValueError("Failed to parse the packed analysis from the AI response.")
+    except ValueError:
+        raise
+    except Exception as e:
+        logger.error(f"An unexpected error occurred during packed Gemini analysis: {e}", exc_info=True)
+        raise resilience.provider_error("An unexpected error occurred while analyzing the jobs.", e)
+
+async def generate_proposal(job_data: dict, profile_data: dict, analysis_data: dict, api_config: dict = None) -> str:
     """
     Generates a cover letter for a job application using the Gemini API.
     """
     logger.info(f"Starting proposal generation for job: {job_data.get('title')}")
+    model = _get_model(api_config)
 
     try:
-        prompt_text = prompts.PROPOSAL_GENERATION_PROMPT.format(
-            job_data=json.dumps(job_data, indent=2),
-            profile_data=json.dumps(profile_data, indent=2),
-            analysis_data=json.dumps(analysis_data, indent=2)
+        prompt_text = prompts.format_prompt(
+            prompts.PROPOSAL_GENERATION_PROMPT, prompts.description_budget(api_config),
+            job_data=job_data,
+            profile_data=profile_data,
+            analysis_data=analysis_data
         )
 
-        model = genai.GenerativeModel('gemini-2.5-flash')
-
         response = await model.generate_content_async(
             prompt_text,
             request_options={'timeout': 180}
         )
 
+        _record_usage(response, model_id(api_config))
+
         proposal_text = response.text
         logger.info(f"Successfully generated proposal for job: {job_data.get('title')}")
         
@@ -87,7 +262,43 @@ async def generate_proposal(job_data: dict, profile_data: dict, analysis_data: d
 
     except (google_exceptions.GoogleAPICallError, google_exceptions.RetryError) as e:
         logger.error(f"Google API call failed during proposal generation: {e}", exc_info=True)
-        raise ConnectionError(f"Communication error with Google AI during proposal generation: {e}")
+        raise resilience.provider_error(f"Communication error with Google AI during proposal generation: {e}", e)
     except Exception as e:
         logger.error(f"An unexpected error occurred during proposal generation: {e}", exc_info=True)
-        raise ConnectionError("An unexpected error occurred while generating the proposal.")
+        raise resilience.provider_error("An unexpected error occurred while generating the proposal.", e)
+
+async def stream_proposal(job_data: dict, profile_data: dict, analysis_data: dict, api_config: dict = None) -> AsyncIterator[str]:
+    """
+    Streaming variant of generate_proposal: yields the cover letter's text chunks as Gemini produces them.
+    """
+    logger.info(f"Starting streamed proposal generation for job: {job_data.get('title')}")
+    model = _get_model(api_config)
+
+    try:
+        prompt_text = prompts.format_prompt(
+            prompts.PROPOSAL_GENERATION_PROMPT, prompts.description_budget(api_config),
+            job_data=job_data,
+            profile_data=profile_data,
+            analysis_data=analysis_data
+        )
+
+        response = await model.generate_content_async(
+            prompt_text,
+            stream=True,
+            request_options={'timeout': 180}
+        )
+
+        async for chunk in response:
+            # Chunks without text (e.g. the final one carrying only usage metadata) are skipped.
+            if chunk.candidates and chunk.candidates[0].content.parts:
+                yield chunk.text
+
+        _record_usage(response, model_id(api_config))
+        logger.info(f"Finished streaming proposal for job: {job_data.get('title')}")
+
+    except (google_exceptions.GoogleAPICallError, google_exceptions.RetryError) as e:
+        logger.error(f"Google API call failed during streamed proposal generation: {e}", exc_info=True)
+        raise resilience.provider_error(f"Communication error with Google AI during proposal generation: {e}", e)
+    except Exception as e:
+        logger.error(f"An unexpected error occurred during streamed proposal generation: {e}", exc_info=True)
+        raise resilience.provider_error("An unexpected error occurred while generating the proposal.", e)
@@ -0,0 +1,162 @@
+# backend/job_dedup.py
+import hashlib
+import logging
+import re
+from collections import OrderedDict
+from typing import Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+SHINGLE_SIZE = 2
+NUM_PERMUTATIONS = 64
+LSH_BANDS = 16  # 4 signature values per band: pairs above ~0.6 Jaccard become candidates with high probability.
+SIMILARITY_THRESHOLD = 0.6  # Estimated Jaccard similarity of word shingles above which two postings are duplicates.
+DEFAULT_MAX_CLUSTERS = 5000
+# Fields added by deduplication; they describe search results, not the job, so they are kept
+# out of prompts and analysis cache keys.
+CLUSTER_FIELDS = ("fingerprint", "cluster_id", "duplicates")
+
+_WORD_PATTERN = re.compile(r"\w+")
+_ROWS_PER_BAND = NUM_PERMUTATIONS // LSH_BANDS
+# Multiply-shift hash family (odd 64-bit multipliers, wrapping arithmetic); fixed seed so
+# fingerprints are stable across restarts.
+_rng = np.random.default_rng(0x5EED)
+_MULTIPLIERS = _rng.integers(1, 2 ** 63, NUM_PERMUTATIONS, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+_OFFSETS = _rng.integers(0, 2 ** 63, NUM_PERMUTATIONS, dtype=np.uint64)
+
+
+def _shingles(text: str) -> Set[str]:
+    words = _WORD_PATTERN.findall(text.lower())
+    if len(words) < SHINGLE_SIZE:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+
+
+def _signature(value: str) -> np.ndarray:
+    return np.frombuffer(bytes.fromhex(value), dtype=">u2")
+
+
+def fingerprint(job: Dict) -> Optional[str]:
+    """
+    MinHash signature of the word shingles of the job's title and description, as a hex string
+    (NUM_PERMUTATIONS 16-bit values). Near-identical postings share most signature values.
+    None if the job has no words to compare; such jobs are never treated as duplicates.
+    """
+    features = _shingles(f"{job.get('title') or ''} {job.get('snippet') or ''}")
+    if not features:
+        return None
+    digests = b"".join(hashlib.blake2b(feature.encode('utf-8'), digest_size=4).digest() for feature in features)
+    hashes = np.frombuffer(digests, dtype=np.uint32).astype(np.uint64)
+    with np.errstate(over='ignore'):
+        permuted = (hashes[:, None] * _MULTIPLIERS + _OFFSETS) >> np.uint64(48)
+    return permuted.min(axis=0).astype(">u2").tobytes().hex()
+
+
+def similarity(a: str, b: str) -> float:
+    """Estimated Jaccard similarity of two fingerprints."""
+    return float(np.mean(_signature(a) == _signature(b)))
+
+
+def _brief(job: Dict) -> Dict:
+    return {key: job.get(key) for key in ("id", "title", "url", "date_created")}
+
+
+def without_cluster_fields(job: Dict) -> Dict:
+    return {k: v for k, v in job.items() if k not in CLUSTER_FIELDS}
+
+
+class MinHashIndex:
+    """
+    Clusters of near-duplicate jobs, looked up by LSH bands of their MinHash signatures.
+    The oldest clusters are forgotten beyond `max_clusters`.
+    """
+
+    def __init__(self, max_clusters: Optional[int] = DEFAULT_MAX_CLUSTERS):
+        self.max_clusters = max_clusters
+        self._fingerprints: "OrderedDict[str, str]" = OrderedDict()  # cluster_id -> representative fingerprint
+        self._members: Dict[str, List[Dict]] = {}
+        self._bands: List[Dict[str, Set[str]]] = [{} for _ in range(LSH_BANDS)]
+
+    @staticmethod
+    def _band_keys(value: str) -> List[str]:
+        width = _ROWS_PER_BAND * 4
+        return [value[band * width:(band + 1) * width] for band in range(LSH_BANDS)]
+
+    def find(self, value: str) -> Optional[str]:
+        candidates = set()
+        for band, key in enumerate(self._band_keys(value)):
+            candidates |= self._bands[band].get(key, set())
+        best = None
+        for cluster_id in candidates:
+            score = similarity(value, self._fingerprints[cluster_id])
+            if score >= SIMILARITY_THRESHOLD and (best is None or score > best[0]):
+                best = (score, cluster_id)
+        return best[1] if best else None
+
+    def add(self, job: Dict, value: str) -> str:
+        """Adds the job to its near-duplicate cluster (creating one if needed) and returns the cluster ID."""
+        cluster_id = self.find(value)
+        if cluster_id is None:
+            cluster_id = str(job.get('id') or value[:16])
+            if cluster_id in self._fingerprints:
+                # Same ID re-posted with a different text: keep the old cluster and start a new one.
+                cluster_id = f"{cluster_id}:{value[:16]}"
+            self._fingerprints[cluster_id] = value
+            self._members[cluster_id] = []
+            for band, key in enumerate(self._band_keys(value)):
+                self._bands[band].setdefault(key, set()).add(cluster_id)
+            self._evict()
+        else:
+            self._fingerprints.move_to_end(cluster_id)
+        members = self._members[cluster_id]
+        if not any(member["id"] == job.get('id') for member in members):
+            members.append(_brief(job))
+        return cluster_id
+
+    def members(self, cluster_id: str) -> List[Dict]:
+        return list(self._members.get(cluster_id, []))
+
+    def _evict(self):
+        while self.max_clusters is not None and len(self._fingerprints) > self.max_clusters:
+            cluster_id, value = self._fingerprints.popitem(last=False)
+            del self._members[cluster_id]
+            for band, key in enumerate(self._band_keys(value)):
+                bucket = self._bands[band].get(key)
+                if bucket is not None:
+                    bucket.discard(cluster_id)
+                    if not bucket:
+                        del self._bands[band][key]
+
+
+# Shared across search pages and searches, so a repost is recognized wherever it shows up again.
+_search_index = MinHashIndex()
+
+
+def dedupe_search_results(jobs: List[Dict]) -> Tuple[List[Dict], int]:
+    """
+    Fingerprints a page of search results and keeps one representative per near-duplicate cluster.
+    Each representative gets its cluster_id and the other known postings of the cluster, including
+    ones seen on earlier pages or in earlier searches, under `duplicates`.
+    Returns the representatives and the number of postings folded into them.
+    """
+    representatives: Dict[str, Dict] = {}
+    for index, job in enumerate(jobs):
+        job["fingerprint"] = job.get("fingerprint") or fingerprint(job)
+        if job["fingerprint"] is None:
+            job["cluster_id"] = None
+            representatives[f"unclustered:{index}"] = job
+            continue
+        cluster_id = _search_index.add(job, job["fingerprint"])
+        job["cluster_id"] = cluster_id
+        representatives.setdefault(cluster_id, job)
+
+    for cluster_id, job in representatives.items():
+        job["duplicates"] = [member for member in _search_index.members(cluster_id) if member["id"] != job.get('id')]
+
+    collapsed = len(jobs) - len(representatives)
+    if collapsed:
+        logger.info(f"Collapsed {collapsed} near-duplicate job postings into {len(representatives)} results.")
+    return list(representatives.values()), collapsed
+
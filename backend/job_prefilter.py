@@ -0,0 +1,94 @@
+# backend/job_prefilter.py
+import logging
+import re
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Deterministic versions of the RED FLAGS in prompts.BULK_JOB_ANALYSIS_PROMPT, evaluated
+# locally on the fields search_upwork_jobs_gql already returns. Off unless a request opts in
+# with {"enabled": true}.
+DEFAULT_RULES = {
+    "enabled": False,
+    "action": "drop",  # "drop": never sent to the LLM. "downrank": analyzed last, with a score penalty.
+    "min_hourly_rate": 40.0,
+    "require_verified_payment": True,
+    "require_client_history": True,
+    "min_description_length": 200,
+    "downrank_penalty": 25,
+}
+
+_AMOUNT_PATTERN = re.compile(r"(\d[\d,]*(?:\.\d+)?)")
+
+
+def resolve_rules(overrides: Optional[Dict] = None) -> Dict:
+    """Merges per-request overrides (None values ignored) over DEFAULT_RULES."""
+    rules = dict(DEFAULT_RULES)
+    rules.update({k: v for k, v in (overrides or {}).items() if v is not None})
+    return rules
+
+
+def parse_hourly_range(rate_display: Optional[str]) -> Tuple[Optional[float], Optional[float]]:
+    """
+    Extracts (min, max) hourly rates from the rate_display built in upwork_api,
+    e.g. "$15.00 - $30.00/hr", "From $20.00/hr", "Up to $35.00/hr". Fixed-price jobs return (None, None).
+    """
+    if not rate_display or "/hr" not in rate_display:
+        return None, None
+    amounts = [float(a.replace(",", "")) for a in _AMOUNT_PATTERN.findall(rate_display)]
+    if not amounts:
+        return None, None
+    if rate_display.startswith("From"):
+        return amounts[0], None
+    if rate_display.startswith("Up to"):
+        return None, amounts[0]
+    return amounts[0], amounts[-1]
+
+
+def evaluate_job(job: Dict, rules: Dict) -> List[Dict]:
+    """
+    Returns the machine-readable reasons a job fails the rules (empty if it passes).
+    Missing client data is treated as unknown rather than as a failure.
+    """
+    reasons = []
+    client = job.get('client') or {}
+
+    min_rate = rules.get("min_hourly_rate")
+    if min_rate:
+        _, max_hourly = parse_hourly_range(job.get('rate_display'))
+        if max_hourly is not None and max_hourly < min_rate:
+            reasons.append({"rule": "min_hourly_rate", "detail": f"Hourly budget tops out at ${max_hourly:g}, below ${min_rate:g}."})
+
+    verification_status = client.get('verification_status')
+    if rules.get("require_verified_payment") and verification_status and verification_status.upper() != "VERIFIED":
+        reasons.append({"rule": "require_verified_payment", "detail": f"Client payment status is {verification_status}."})
+
+    if rules.get("require_client_history"):
+        if client.get('total_hires') == 0:
+            reasons.append({"rule": "require_client_history", "detail": "Client has never hired on Upwork."})
+        elif client.get('total_feedback') == 0:
+            reasons.append({"rule": "require_client_history", "detail": "Client has no feedback rating."})
+
+    min_length = rules.get("min_description_length")
+    description = (job.get('snippet') or "").strip()
+    if min_length and len(description) < min_length:
+        reasons.append({"rule": "min_description_length", "detail": f"Description is {len(description)} characters, below {min_length}."})
+
+    return reasons
+
+
+def apply_rules(jobs: List[Dict], rules: Dict) -> Tuple[List[Dict], List[Tuple[Dict, List[Dict]]]]:
+    """
+    Splits jobs into those that pass the rules and (job, reasons) pairs for those that fail.
+    """
+    if not rules.get("enabled", True):
+        return list(jobs), []
+    passed, failed = [], []
+    for job in jobs:
+        reasons = evaluate_job(job, rules)
+        if reasons:
+            failed.append((job, reasons))
+        else:
+            passed.append(job)
+    logger.info(f"Pre-filter: {len(passed)} of {len(jobs)} jobs passed, {len(failed)} failed ({rules['action']}).")
+    return passed, failed
@@ -0,0 +1,110 @@
+# backend/job_ranker.py
+import logging
+import string
+from itertools import repeat
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# BM25 parameters and field weights for the CPU-only relevance pre-rank.
+BM25_K1 = 1.2
+BM25_B = 0.75
+TITLE_WEIGHT = 3
+SKILLS_WEIGHT = 2
+# Profile sections that hold configuration rather than anything describing the freelancer.
+EXCLUDED_PROFILE_KEYS = {"api_config"}
+
+# Punctuation (other than the "+" and "#" in names like C++ / C#) becomes whitespace before splitting.
+_TOKEN_SEPARATORS = str.maketrans({c: " " for c in string.punctuation if c not in "+#"})
+_DOC_BOUNDARY = "\x00"
+_STOPWORDS = frozenset(
+    "a an and are as at be but by can for from has have i if in into is it its looking me my need "
+    "needed of on or our please project that the their this to us we will with work you your".split()
+)
+
+
+def _split(text: str) -> List[str]:
+    return text.lower().translate(_TOKEN_SEPARATORS).split()
+
+
+def tokenize(text: str) -> List[str]:
+    return [token for token in _split(text) if token not in _STOPWORDS]
+
+
+def _job_text(job: Dict) -> str:
+    # Repeating a field is the cheap way to weight it in a bag-of-words model.
+    title = job.get('title') or ""
+    skills = " ".join(job.get('skills') or [])
+    return " ".join([title] * TITLE_WEIGHT + [skills] * SKILLS_WEIGHT + [job.get('snippet') or ""])
+
+
+def _profile_text(value) -> str:
+    if isinstance(value, dict):
+        return " ".join(_profile_text(v) for k, v in value.items() if k not in EXCLUDED_PROFILE_KEYS)
+    if isinstance(value, list):
+        return " ".join(_profile_text(v) for v in value)
+    return value if isinstance(value, str) else ""
+
+
+def score_jobs(jobs: List[Dict], profile_data: Dict) -> np.ndarray:
+    """
+    Scores each job's title, skills and description against the profile text with BM25,
+    normalized to 0-100 (the best job in the list scores 100).
+    """
+    if not jobs:
+        return np.zeros(0)
+
+    vocabulary = {term: index for index, term in enumerate(set(tokenize(_profile_text(profile_data))))}
+    if not vocabulary:
+        return np.zeros(len(jobs))
+
+    # The whole corpus is tokenized in one pass, with a boundary token between jobs. Tokens map to
+    # their profile-term column, -1 for any other word (stopwords never reach the vocabulary) and
+    # -2 for a boundary, so per-job term counts can be built with NumPy alone.
+    corpus = f" {_DOC_BOUNDARY} ".join(_job_text(job).replace(_DOC_BOUNDARY, " ") for job in jobs)
+    lookup = {**vocabulary, _DOC_BOUNDARY: -2}.get
+    columns = np.fromiter(map(lookup, _split(corpus), repeat(-1)), dtype=np.intp)
+
+    is_boundary = columns == -2
+    rows = np.cumsum(is_boundary)
+    doc_lengths = np.bincount(rows, minlength=len(jobs)) - np.bincount(rows, weights=is_boundary, minlength=len(jobs))
+    matched = columns >= 0
+    counts = np.bincount(rows[matched] * len(vocabulary) + columns[matched], minlength=len(jobs) * len(vocabulary))
+    counts = counts.reshape(len(jobs), len(vocabulary)).astype(np.float32)
+
+    document_frequency = np.count_nonzero(counts, axis=0)
+    idf = np.log1p((len(jobs) - document_frequency + 0.5) / (document_frequency + 0.5))
+    length_norm = BM25_K1 * (1 - BM25_B + BM25_B * doc_lengths / max(doc_lengths.mean(), 1.0))
+    scores = ((counts * (BM25_K1 + 1)) / (counts + length_norm[:, None])) @ idf
+
+    best = scores.max()
+    return scores / best * 100 if best > 0 else scores
+
+
+def prerank(jobs: List[Dict], profile_data: Dict, top_k: Optional[int] = None,
+            min_score: Optional[float] = None,
+            demoted: Optional[List[Dict]] = None) -> Tuple[List[Tuple[Dict, float]], List[Tuple[Dict, float]]]:
+    """
+    Ranks jobs by local relevance and splits them into (selected, skipped) lists of (job, local_score),
+    keeping the top_k jobs that also reach min_score. Without limits every job is selected.
+    `demoted` jobs (e.g. downranked by the pre-filter) are scored alongside but ranked after all of
+    `jobs`, so they only take top_k places the other jobs leave free.
+    """
+    demoted = demoted or []
+    scores = score_jobs(jobs + demoted, profile_data)
+    order = np.concatenate([
+        np.argsort(-scores[:len(jobs)], kind="stable"),
+        len(jobs) + np.argsort(-scores[len(jobs):], kind="stable"),
+    ]).astype(int)
+    candidates = jobs + demoted
+    selected, skipped = [], []
+    for rank, index in enumerate(order):
+        score = round(float(scores[index]), 2)
+        within_k = top_k is None or rank < top_k
+        above_threshold = min_score is None or score >= min_score
+        (selected if within_k and above_threshold else skipped).append((candidates[index], score))
+    if top_k is not None or min_score is not None:
+        logger.info(f"Local pre-rank selected {len(selected)} of {len(candidates)} jobs (top_k={top_k}, min_score={min_score}).")
+    return selected, skipped
@@ -1,16 +1,18 @@
 # backend/main.py
 import os
+import json
 import logging
+import time
 from fastapi import FastAPI, Request, Query, HTTPException
-from fastapi.responses import RedirectResponse, JSONResponse
+from fastapi.responses import RedirectResponse, JSONResponse, StreamingResponse
 from dotenv import load_dotenv, set_key
 import urllib.parse
 import httpx
 from pydantic import BaseModel
-from typing import Optional, List
+from typing import Optional, List, Dict
 
 from fastapi.middleware.cors import CORSMiddleware
-from . import upwork_api, local_profile_storage, gemini_api, bulk_analyzer, bedrock_api
+from . import upwork_api, local_profile_storage, bulk_analyzer, run_manager, analysis_cache, resilience, ai_providers, scheduler, prompts, usage_tracker, client_pool, response_parser, proposal_prefetch, analysis_reuse
 
 # --- Configuration & Setup ---
 DOTENV_PATH = os.path.join(os.path.dirname(__file__), '..', '.env')
@@ -32,12 +34,84 @@ UPWORK_OAUTH_BASE_URL = "https://www.upwork.com/ab/account-security/oauth2/autho
 UPWORK_TOKEN_ENDPOINT = "https://www.upwork.com/api/v3/oauth2/token"
 
 # --- Pydantic Models ---
+class ModelPrice(BaseModel):
+    input_per_million: Optional[float] = None
+    output_per_million: Optional[float] = None
+    cached_input_per_million: Optional[float] = None
+    cache_storage_per_million_hour: Optional[float] = None
+
+class FailoverPolicy(BaseModel):
+    mode: Optional[str] = None  # "off", "failover" or "hedge"
+    secondary: Optional[str] = None
+    latency_threshold_seconds: Optional[float] = None
+
+class FakeProviderConfig(BaseModel):
+    # Any field left as None falls back to fake_api.DEFAULT_SETTINGS.
+    latency_distribution: Optional[str] = None  # "fixed", "uniform", "exponential" or "lognormal"
+    latency_mean_seconds: Optional[float] = None
+    latency_spread: Optional[float] = None
+    packed_job_seconds: Optional[float] = None
+    error_rate: Optional[float] = None
+    throttle_rate: Optional[float] = None
+    malformed_rate: Optional[float] = None
+    tokens_per_second: Optional[float] = None
+    seed: Optional[int] = None
+
+class CascadeConfig(BaseModel):
+    # Any field left as None falls back to triage_cascade.DEFAULT_CASCADE.
+    enabled: Optional[bool] = None
+    triage_provider: Optional[str] = None
+    triage_model: Optional[str] = None
+    full_provider: Optional[str] = None
+    full_model: Optional[str] = None
+    band_min: Optional[float] = None
+    band_max: Optional[float] = None
+
+class ProposalPrefetchConfig(BaseModel):
+    # Any field left as None falls back to proposal_prefetch.DEFAULT_PREFETCH.
+    enabled: Optional[bool] = None
+    top_n: Optional[int] = None
+    min_score: Optional[float] = None
+
+class AnalysisReuseConfig(BaseModel):
+    # Any field left as None falls back to analysis_reuse.DEFAULT_REUSE.
+    enabled: Optional[bool] = None
+    threshold: Optional[float] = None  # TF-IDF cosine similarity, 0-1.
+
 class ApiConfig(BaseModel):
     provider: str
+    # Model ID per provider ("google", "aws", "fake"), overriding the provider module's MODEL_ID.
+    models: Optional[Dict[str, str]] = None
     google_api_key: Optional[str] = None
     aws_access_key_id: Optional[str] = None
     aws_secret_access_key: Optional[str] = None
     aws_region: Optional[str] = "us-west-2"
+    # Overrides the bedrock-runtime endpoint, e.g. a VPC endpoint or a local stub for benchmarks.
+    bedrock_endpoint_url: Optional[str] = None
+    # Simulated latency / error behaviour when provider is "fake" (offline benchmarking).
+    fake_provider: Optional[FakeProviderConfig] = None
+    # Rate limiting overrides; None falls back to the provider defaults in rate_limiter.
+    rate_limit_rpm: Optional[int] = None
+    rate_limit_tpm: Optional[int] = None
+    max_concurrency: Optional[int] = None
+    # Packed bulk analysis: jobs per request (1 disables packing) and the input-token ceiling per request.
+    pack_size: Optional[int] = None
+    pack_token_budget: Optional[int] = None
+    # Job descriptions are cut to this many tokens in prompts; 0 disables truncation.
+    max_description_tokens: Optional[int] = None
+    # Register each bulk run's instructions + profile prefix with the provider's context cache: true always,
+    # false never, unset once the run plans context_cache.MIN_CACHED_RUN_CALLS calls.
+    context_caching: Optional[bool] = None
+    # Bulk runs: a cheap triage model scores every job, the full analysis only runs for scores in the band.
+    cascade: Optional[CascadeConfig] = None
+    # After a bulk run, pre-generate proposals for its top results on idle provider capacity.
+    proposal_prefetch: Optional[ProposalPrefetchConfig] = None
+    # Jobs near-identical to one already analyzed against the profile reuse its analysis instead of an LLM call.
+    analysis_reuse: Optional[AnalysisReuseConfig] = None
+    # Per-endpoint ("analysis", "proposal", "bulk") failover / hedging policy; see ai_providers.DEFAULT_POLICY.
+    failover_policy: Optional[Dict[str, FailoverPolicy]] = None
+    # USD per million tokens by model ID, overriding usage_tracker.DEFAULT_PRICE_TABLE.
+    price_table: Optional[Dict[str, ModelPrice]] = None
 
 class JobSearchRequest(BaseModel):
     query: Optional[str] = None
@@ -76,14 +150,56 @@ class Job(BaseModel):
     workload: Optional[str] = None
     duration: Optional[str] = None
     client: Client
+    # Near-duplicate clustering from job_dedup; absent for jobs that didn't come from search.
+    fingerprint: Optional[str] = None
+    cluster_id: Optional[str] = None
+    duplicates: Optional[List[dict]] = None
 
 class AnalysisRequest(BaseModel):
     job: Job
     profile: dict
+    mode: str = "full"  # "full" or "score" (suitability_score and a one-line summary only)
+
+class PrefilterRules(BaseModel):
+    # Any field left as None falls back to job_prefilter.DEFAULT_RULES (rules are off unless enabled is true).
+    enabled: Optional[bool] = None
+    action: Optional[str] = None  # "drop" or "downrank"
+    min_hourly_rate: Optional[float] = None
+    require_verified_payment: Optional[bool] = None
+    require_client_history: Optional[bool] = None
+    min_description_length: Optional[int] = None
+    downrank_penalty: Optional[int] = None
+
+class PrerankOptions(BaseModel):
+    # Local relevance cut-off applied before any LLM call; None means no limit.
+    top_k: Optional[int] = None
+    min_score: Optional[float] = None
+
+class BudgetOptions(BaseModel):
+    # Per-run spend limits; None means unlimited. Costs use api_config.price_table (USD).
+    max_tokens: Optional[int] = None
+    max_cost: Optional[float] = None
 
 class BulkAnalysisRequest(BaseModel):
     jobs: List[Job]
     profile: dict
+    prefilter: Optional[PrefilterRules] = None
+    prerank: Optional[PrerankOptions] = None
+    budget: Optional[BudgetOptions] = None
+    mode: str = "full"  # See AnalysisRequest.mode.
+
+class SearchAnalysisRequest(BaseModel):
+    search: JobSearchRequest
+    max_jobs: int = 200  # Pages are followed until this many jobs were fetched or the results run out.
+    profile: dict
+    prefilter: Optional[PrefilterRules] = None
+    prerank: Optional[PrerankOptions] = None  # Applied to each fetched page.
+    budget: Optional[BudgetOptions] = None
+    mode: str = "full"  # See AnalysisRequest.mode.
+
+class AnalyzeAndProposeRequest(BaseModel):
+    job: Job
+    profile: dict
 
 class ProposalGenerationRequest(BaseModel):
     job: Job
@@ -101,6 +217,11 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.on_event("startup")
+async def start_run_manager():
+    # Resumes bulk-analysis runs that were interrupted by a backend restart.
+    await run_manager.start()
+
 # --- Authentication Routes ---
 @app.get("/login", tags=["Authentication"])
 async def login_via_upwork():
@@ -166,9 +287,18 @@ async def get_auth_status():
     return {"authenticated": True}
 
 # --- API Endpoints ---
+def _check_mode(mode: str):
+    if mode not in bulk_analyzer.ANALYSIS_MODES:
+        raise HTTPException(status_code=400, detail=f"Unsupported analysis mode: {mode}")
+
 @app.post("/jobs/analyze-all", tags=["Analysis"])
-async def analyze_all_jobs(request: BulkAnalysisRequest):
-    logger.info(f"Received request to analyze {len(request.jobs)} jobs.")
+async def analyze_all_jobs(request: BulkAnalysisRequest, details: bool = Query(False)):
+    """
+    Returns the ranked analyses, or with ?details=true an object holding them under "results"
+    next to the errors, rejected and skipped jobs and the run's stats.
+    """
+    logger.info(f"Received request to analyze {len(request.jobs)} jobs ({request.mode} mode).")
+    _check_mode(request.mode)
     try:
         local_profile = local_profile_storage.read_local_profile()
         api_config = local_profile.get("api_config", {"provider": "google"})
@@ -176,16 +306,120 @@ async def analyze_all_jobs(request: BulkAnalysisRequest):
         analysis_results = await bulk_analyzer.analyze_multiple_jobs(
             jobs=[job.dict() for job in request.jobs],
             profile_data=request.profile,
-            api_config=api_config
+            api_config=api_config,
+            prefilter=request.prefilter.dict() if request.prefilter else None,
+            prerank=request.prerank.dict() if request.prerank else None,
+            budget=request.budget.dict() if request.budget else None,
+            mode=request.mode
         )
-        return JSONResponse(content=analysis_results)
+        return JSONResponse(content=analysis_results if details else analysis_results["results"])
     except Exception as e:
         logger.error(f"An unexpected error occurred during bulk analysis: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail="An unexpected server error occurred during bulk analysis.")
 
+@app.post("/jobs/analyze-all/stream", tags=["Analysis"])
+async def analyze_all_jobs_stream(request: BulkAnalysisRequest, output_format: str = Query("ndjson", alias="format", pattern="^(ndjson|sse)$"), top_k: int = Query(10, ge=0, le=100)):
+    """
+    Streams each job's analysis as soon as it completes, as NDJSON lines or Server-Sent Events.
+    """
+    logger.info(f"Received request to stream analysis of {len(request.jobs)} jobs ({output_format}, {request.mode} mode).")
+    _check_mode(request.mode)
+    local_profile = local_profile_storage.read_local_profile()
+    api_config = local_profile.get("api_config", {"provider": "google"})
+
+    events = bulk_analyzer.stream_multiple_jobs(
+        jobs=[job.dict() for job in request.jobs],
+        profile_data=request.profile,
+        api_config=api_config,
+        top_k=top_k,
+        prefilter=request.prefilter.dict() if request.prefilter else None,
+        prerank=request.prerank.dict() if request.prerank else None,
+        budget=request.budget.dict() if request.budget else None,
+        mode=request.mode
+    )
+    return _stream_events(events, output_format, "streamed bulk analysis")
+
+@app.post("/jobs/search-and-analyze/stream", tags=["Analysis"])
+async def search_and_analyze_stream(request: SearchAnalysisRequest, output_format: str = Query("ndjson", alias="format", pattern="^(ndjson|sse)$"), top_k: int = Query(10, ge=0, le=100)):
+    """
+    Searches Upwork and analyzes the results in one go, streaming events like /jobs/analyze-all/stream.
+    Later result pages are fetched while the jobs of earlier ones are being analyzed.
+    """
+    if request.max_jobs < 1 or request.max_jobs > 1000:
+        raise HTTPException(status_code=400, detail="max_jobs must be between 1 and 1000.")
+    _check_mode(request.mode)
+    logger.info(f"Received request to search and analyze up to {request.max_jobs} jobs ({output_format}).")
+    local_profile = local_profile_storage.read_local_profile()
+    api_config = local_profile.get("api_config", {"provider": "google"})
+
+    events = bulk_analyzer.stream_search_and_analyze(
+        search=request.search.dict(),
+        max_jobs=request.max_jobs,
+        profile_data=request.profile,
+        api_config=api_config,
+        top_k=top_k,
+        prefilter=request.prefilter.dict() if request.prefilter else None,
+        prerank=request.prerank.dict() if request.prerank else None,
+        budget=request.budget.dict() if request.budget else None,
+        mode=request.mode
+    )
+    return _stream_events(events, output_format, "search-and-analyze")
+
+def _stream_events(events, output_format: str, description: str) -> StreamingResponse:
+    """Serializes bulk analysis events as NDJSON lines or Server-Sent Events."""
+    async def event_stream():
+        try:
+            async for event in events:
+                payload = json.dumps(event)
+                if output_format == "sse":
+                    yield f"event: {event['event']}\ndata: {payload}\n\n"
+                else:
+                    yield f"{payload}\n"
+        except Exception as e:
+            logger.error(f"An unexpected error occurred during {description}: {e}", exc_info=True)
+            payload = json.dumps({"event": "fatal", "error": "An unexpected server error occurred during bulk analysis."})
+            yield f"event: fatal\ndata: {payload}\n\n" if output_format == "sse" else f"{payload}\n"
+
+    media_type = "text/event-stream" if output_format == "sse" else "application/x-ndjson"
+    return StreamingResponse(event_stream(), media_type=media_type, headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+# --- Background Bulk Runs ---
+@app.post("/runs", tags=["Analysis"], status_code=202)
+async def submit_bulk_run(request: BulkAnalysisRequest):
+    logger.info(f"Received request to queue a bulk run of {len(request.jobs)} jobs.")
+    _check_mode(request.mode)
+    try:
+        run = run_manager.submit_run(
+            jobs=[job.dict() for job in request.jobs],
+            profile_data=request.profile,
+            prefilter=request.prefilter.dict() if request.prefilter else None,
+            prerank=request.prerank.dict() if request.prerank else None,
+            budget=request.budget.dict() if request.budget else None,
+            mode=request.mode
+        )
+        return JSONResponse(status_code=202, content=run)
+    except Exception as e:
+        logger.error(f"Error queuing bulk run: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Could not queue the bulk analysis run.")
+
+@app.get("/runs/{run_id}", tags=["Analysis"])
+async def get_bulk_run(run_id: str):
+    run = run_manager.get_run(run_id)
+    if run is None:
+        raise HTTPException(status_code=404, detail="Run not found.")
+    return JSONResponse(content=run)
+
+@app.delete("/runs/{run_id}", tags=["Analysis"])
+async def cancel_bulk_run(run_id: str):
+    run = run_manager.cancel_run(run_id)
+    if run is None:
+        raise HTTPException(status_code=404, detail="Run not found.")
+    return JSONResponse(content=run)
+
 @app.post("/jobs/analyze", tags=["Analysis"])
 async def analyze_job(request: AnalysisRequest):
-    logger.info(f"Received request to analyze job: {request.job.title}")
+    logger.info(f"Received request to analyze job: {request.job.title} ({request.mode} mode)")
+    _check_mode(request.mode)
     try:
         # Read the full local profile to get the API config
         local_profile = local_profile_storage.read_local_profile()
@@ -199,20 +433,44 @@ async def analyze_job(request: AnalysisRequest):
         provider = api_config.get("provider", "google")
         logger.info(f"Using AI provider: {provider}")
 
-        if provider == "google":
-            analysis_result = await gemini_api.get_job_analysis(
-                job_data=request.job.dict(),
-                profile_data=request.profile
-            )
-        elif provider == "aws":
-            analysis_result = await bedrock_api.get_job_analysis(
-                job_data=request.job.dict(),
-                profile_data=request.profile,
-                api_config=api_config
-            )
-        else:
+        if provider not in ai_providers.PROVIDERS:
             raise HTTPException(status_code=400, detail=f"Unsupported AI provider: {provider}")
 
+        job_data = request.job.dict()
+        if request.mode == "score":
+            # Score and one-line summary only; the full analysis is requested when the job is opened.
+            prompt_template, output_tokens, analyze = prompts.JOB_SCORE_PROMPT, scheduler.SCORE_OUTPUT_TOKENS, ai_providers.score_job
+        else:
+            prompt_template, output_tokens, analyze = prompts.JOB_ANALYSIS_PROMPT, scheduler.ANALYSIS_OUTPUT_TOKENS, ai_providers.analyze_job
+
+        # An exact cached analysis of this job beats a reused one; both are returned without a provider call.
+        reuse = analysis_reuse.resolve_reuse(api_config)
+        cache_key = ai_providers.provider_api(provider).analysis_cache_key(job_data, request.profile, prompt_template, api_config)
+        known = analysis_cache.lookup(cache_key)
+        if known is None and reuse is not None:
+            known = analysis_reuse.find(job_data, request.profile, api_config, reuse, prompt_template)
+        if known is not None:
+            if request.mode == "score":
+                known["mode"] = "score"
+            return JSONResponse(content=known)
+        estimated_tokens = scheduler.estimate_prompt_tokens(
+            prompt_template, output_tokens, api_config, job_data=job_data, profile_data=request.profile
+        )
+        analysis_result, provider_meta = await ai_providers.run_with_policy(
+            "analysis", api_config,
+            lambda p: scheduler.scheduled_call(
+                p, api_config, lambda: analyze(p, job_data, request.profile, api_config),
+                f"job {request.job.title}", scheduler.INTERACTIVE, estimated_tokens
+            ),
+            lambda analysis: isinstance(analysis, dict)
+        )
+        if reuse is not None:
+            analysis_reuse.remember(job_data, request.profile, analysis_result, provider_meta["provider"], api_config,
+                                    prompt_template)
+        analysis_result = {**analysis_result, "provider_meta": provider_meta}
+        if request.mode == "score":
+            analysis_result["mode"] = "score"
+
         return JSONResponse(content=analysis_result)
     except (ValueError, ConnectionError) as e:
         logger.error(f"Error during job analysis for '{request.job.title}': {e}", exc_info=True)
@@ -224,6 +482,46 @@ async def analyze_job(request: AnalysisRequest):
         raise HTTPException(status_code=500, detail="An unexpected server error occurred.")
 
 
+@app.post("/jobs/analyze-and-propose", tags=["Analysis"])
+async def analyze_and_propose(request: AnalyzeAndProposeRequest):
+    """
+    Analyzes a job and writes its cover letter in one provider call, instead of /jobs/analyze
+    followed by /proposals/generate. Returns the analysis fields plus "proposal_text".
+    """
+    logger.info(f"Received request to analyze and write a proposal for job: {request.job.title}")
+    try:
+        local_profile = local_profile_storage.read_local_profile()
+        api_config = local_profile.get("api_config", {"provider": "google"})
+        provider = api_config.get("provider", "google")
+        logger.info(f"Using AI provider: {provider} for combined analysis and proposal")
+
+        if provider not in ai_providers.PROVIDERS:
+            raise HTTPException(status_code=400, detail=f"Unsupported AI provider: {provider}")
+
+        job_data = request.job.dict()
+        estimated_tokens = scheduler.estimate_prompt_tokens(
+            prompts.JOB_ANALYSIS_WITH_PROPOSAL_PROMPT, scheduler.ANALYSIS_WITH_PROPOSAL_OUTPUT_TOKENS, api_config,
+            job_data=job_data, profile_data=request.profile
+        )
+        result, provider_meta = await ai_providers.run_with_policy(
+            "proposal", api_config,
+            lambda p: scheduler.scheduled_call(
+                p, api_config, lambda: ai_providers.analyze_and_propose(p, job_data, request.profile, api_config),
+                f"analysis and proposal for {request.job.title}", scheduler.INTERACTIVE, estimated_tokens
+            ),
+            lambda value: isinstance(value, dict)
+        )
+
+        return JSONResponse(content={**result, "provider_meta": provider_meta})
+    except (ValueError, ConnectionError) as e:
+        logger.error(f"Error during combined analysis and proposal for '{request.job.title}': {e}", exc_info=True)
+        raise HTTPException(status_code=424, detail=str(e))
+    except HTTPException as e:
+        raise e
+    except Exception as e:
+        logger.error(f"An unexpected error occurred during combined analysis and proposal for '{request.job.title}': {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail="An unexpected server error occurred.")
+
 @app.post("/proposals/generate", tags=["Proposals"])
 async def generate_proposal_endpoint(request: ProposalGenerationRequest):
     logger.info(f"Received request to generate proposal for job: {request.job.title}")
@@ -233,30 +531,120 @@ async def generate_proposal_endpoint(request: ProposalGenerationRequest):
         provider = api_config.get("provider", "google")
         logger.info(f"Using AI provider: {provider} for proposal generation")
 
-        if provider == "google":
-            proposal_text = await gemini_api.generate_proposal(
-                job_data=request.job.dict(),
-                profile_data=request.profile,
-                analysis_data=request.analysis
-            )
-        elif provider == "aws":
-            proposal_text = await bedrock_api.generate_proposal(
-                job_data=request.job.dict(),
-                profile_data=request.profile,
-                analysis_data=request.analysis,
-                api_config=api_config
-            )
-        else:
+        if provider not in ai_providers.PROVIDERS:
             raise HTTPException(status_code=400, detail=f"Unsupported AI provider: {provider}")
 
-        return JSONResponse(content={"proposal_text": proposal_text})
+        job_data = request.job.dict()
+        # Only the analysis itself goes into the prompt, not run metadata such as provider_meta.
+        analysis_data = prompts.project_analysis(request.analysis)
+        prepared = proposal_prefetch.take(job_data, request.profile, analysis_data, api_config)
+        if prepared is not None:
+            logger.info(f"Serving the prepared proposal for job: {request.job.title}")
+            return JSONResponse(content={**prepared, "prepared": True})
+        estimated_tokens = scheduler.estimate_prompt_tokens(
+            prompts.PROPOSAL_GENERATION_PROMPT, scheduler.PROPOSAL_OUTPUT_TOKENS, api_config,
+            job_data=job_data, profile_data=request.profile, analysis_data=analysis_data
+        )
+        proposal_text, provider_meta = await ai_providers.run_with_policy(
+            "proposal", api_config,
+            lambda p: scheduler.scheduled_call(
+                p, api_config, lambda: ai_providers.generate_proposal(p, job_data, request.profile, analysis_data, api_config),
+                f"proposal for {request.job.title}", scheduler.INTERACTIVE, estimated_tokens
+            ),
+            lambda text: isinstance(text, str) and bool(text.strip())
+        )
+
+        return JSONResponse(content={"proposal_text": proposal_text, "provider_meta": provider_meta})
     except (ValueError, ConnectionError) as e:
         logger.error(f"Error during proposal generation for '{request.job.title}': {e}", exc_info=True)
         raise HTTPException(status_code=424, detail=str(e))
+    except HTTPException as e:
+        raise e
     except Exception as e:
         logger.error(f"An unexpected error occurred during proposal generation for '{request.job.title}': {e}", exc_info=True)
         raise HTTPException(status_code=500, detail="An unexpected server error occurred.")
 
+async def _replay(text: str):
+    """A prepared proposal, relayed like a provider stream."""
+    yield text
+
+@app.post("/proposals/generate/stream", tags=["Proposals"])
+async def stream_proposal_endpoint(request: ProposalGenerationRequest):
+    """
+    Generates a cover letter like /proposals/generate, relaying the provider's text as Server-Sent
+    Events while it is written: "meta" (provider and time to first token), one "token" per chunk,
+    then "done" with the full text, or "error" if the provider fails mid-stream. Failures before
+    the first token are returned as HTTP errors, like /proposals/generate.
+    """
+    logger.info(f"Received request to stream proposal for job: {request.job.title}")
+    started_at = time.monotonic()
+    try:
+        local_profile = local_profile_storage.read_local_profile()
+        api_config = local_profile.get("api_config", {"provider": "google"})
+        provider = api_config.get("provider", "google")
+        logger.info(f"Using AI provider: {provider} for streamed proposal generation")
+
+        if provider not in ai_providers.PROVIDERS:
+            raise HTTPException(status_code=400, detail=f"Unsupported AI provider: {provider}")
+
+        job_data = request.job.dict()
+        analysis_data = prompts.project_analysis(request.analysis)
+        prepared = proposal_prefetch.take(job_data, request.profile, analysis_data, api_config)
+        if prepared is not None:
+            logger.info(f"Serving the prepared proposal for job: {request.job.title}")
+            stream = _replay(prepared["proposal_text"])
+            provider_meta = {**prepared["provider_meta"], "prepared": True,
+                             "time_to_first_token_seconds": round(time.monotonic() - started_at, 3)}
+        else:
+            estimated_tokens = scheduler.estimate_prompt_tokens(
+                prompts.PROPOSAL_GENERATION_PROMPT, scheduler.PROPOSAL_OUTPUT_TOKENS, api_config,
+                job_data=job_data, profile_data=request.profile, analysis_data=analysis_data
+            )
+            stream, provider_meta = await ai_providers.open_stream_with_policy(
+                "proposal", api_config,
+                lambda p: scheduler.scheduled_stream(
+                    p, api_config, lambda: ai_providers.stream_proposal(p, job_data, request.profile, analysis_data, api_config),
+                    f"proposal for {request.job.title}", scheduler.INTERACTIVE, estimated_tokens
+                )
+            )
+    except (ValueError, ConnectionError) as e:
+        logger.error(f"Error during streamed proposal generation for '{request.job.title}': {e}", exc_info=True)
+        raise HTTPException(status_code=424, detail=str(e))
+    except HTTPException as e:
+        raise e
+    except Exception as e:
+        logger.error(f"An unexpected error occurred during streamed proposal generation for '{request.job.title}': {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail="An unexpected server error occurred.")
+
+    logger.info(f"First proposal token for '{request.job.title}' after {provider_meta['time_to_first_token_seconds']}s.")
+
+    def sse(event: str, data: Dict) -> str:
+        return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+    async def event_stream():
+        chunks = []
+        yield sse("meta", {"provider_meta": provider_meta})
+        try:
+            async for text in stream:
+                chunks.append(text)
+                yield sse("token", {"text": text})
+        except Exception as e:
+            logger.error(f"Proposal stream for '{request.job.title}' failed after {len(chunks)} chunks: {e}", exc_info=True)
+            message = str(e) if isinstance(e, (ValueError, ConnectionError)) else "An unexpected server error occurred."
+            yield sse("error", {"error": message, "partial_text": "".join(chunks)})
+            return
+        finally:
+            # Frees the rate-limiter slot right away if the client disconnected mid-stream.
+            await stream.aclose()
+        yield sse("done", {
+            "proposal_text": "".join(chunks),
+            "provider_meta": provider_meta,
+            "time_to_first_token_seconds": provider_meta["time_to_first_token_seconds"],
+            "total_seconds": round(time.monotonic() - started_at, 3),
+        })
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
 @app.get("/filters/categories", tags=["Filters"])
 async def get_categories():
     try:
@@ -343,6 +731,9 @@ async def update_api_config(api_config: ApiConfig):
         
         # Write the entire profile back
         local_profile_storage.write_local_profile(existing_profile)
+
+        # Pooled provider clients were built from the old keys/region.
+        client_pool.invalidate()
         
         return {"status": "success", "message": "API configuration updated successfully."}
     except Exception as e:
@@ -350,6 +741,46 @@ async def update_api_config(api_config: ApiConfig):
         raise HTTPException(status_code=500, detail="Could not write API config.")
 
 
+# --- Metrics ---
+@app.get("/metrics/cache", tags=["System"])
+async def get_cache_metrics():
+    return JSONResponse(content=analysis_cache.get_stats())
+
+@app.get("/metrics/providers", tags=["System"])
+async def get_provider_metrics():
+    return JSONResponse(content={
+        "circuit_breakers": resilience.get_breaker_states(),
+        "average_latency_seconds": ai_providers.get_latency_stats(),
+        "client_pool": client_pool.get_stats(),
+        "response_parser": response_parser.get_stats(),
+    })
+
+@app.get("/metrics/proposals", tags=["System"])
+async def get_proposal_metrics():
+    return JSONResponse(content=proposal_prefetch.get_stats())
+
+@app.get("/metrics/reuse", tags=["System"])
+async def get_reuse_metrics():
+    return JSONResponse(content=analysis_reuse.get_stats())
+
+@app.delete("/proposals/prefetch", tags=["Proposals"])
+async def cancel_proposal_prefetch():
+    proposal_prefetch.cancel()
+    return JSONResponse(content=proposal_prefetch.get_stats())
+
+@app.get("/metrics/usage", tags=["System"])
+async def get_usage_metrics(days: int = Query(30, ge=1, le=366)):
+    try:
+        api_config = local_profile_storage.read_local_profile().get("api_config", {})
+        return JSONResponse(content=usage_tracker.get_daily_usage(api_config, days))
+    except Exception as e:
+        logger.error(f"Error reading usage metrics: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Could not read usage metrics.")
+
+@app.get("/metrics/scheduler", tags=["System"])
+async def get_scheduler_metrics():
+    return JSONResponse(content=scheduler.get_stats())
+
 # --- Health Check ---
 @app.get("/healthz", tags=["System"])
 async def health_check():
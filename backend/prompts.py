@@ -1,18 +1,15 @@
 # backend/prompts.py
+import json
+from typing import Dict, List, Optional
 
-JOB_ANALYSIS_PROMPT = """
+# Analysis prompts are a static prefix (instructions and profile, identical for every job of a run)
+# followed by the job part, so providers can cache the prefix; see context_cache.
+JOB_ANALYSIS_PREFIX = """
 **Role:** You are an expert career coach and Upwork proposal writer.
 
-**Objective:** Analyze the provided Upwork job posting and the freelancer's profile to determine the fit. Provide a suitability score, a detailed rationale for the score, and concrete suggestions for the freelancer to improve their proposal or profile for this specific job.
+**Objective:** Analyze the Upwork job posting given at the end and the freelancer's profile below to determine the fit. Provide a suitability score, a detailed rationale for the score, and concrete suggestions for the freelancer to improve their proposal or profile for this specific job.
 
-**Input:**
-
-**1. Upwork Job Posting:**
-```json
-{job_data}
-```
-
-**2. Freelancer's Profile:**
+**Freelancer's Profile:**
 ```json
 {profile_data}
 ```
@@ -48,15 +45,100 @@ Please provide your analysis in the following JSON format. Do not include any te
 4.  **Proposal Suggestions:** Provide concrete, actionable advice. Tell the freelancer *what* to emphasize and *why*. These suggestions are the most critical part of your analysis.
 """
 
-BULK_JOB_ANALYSIS_PROMPT = """
+JOB_ANALYSIS_JOB = """
+**Upwork Job Posting:**
+```json
+{job_data}
+```
+"""
+
+JOB_ANALYSIS_PROMPT = JOB_ANALYSIS_PREFIX + JOB_ANALYSIS_JOB
+
+# Analysis and cover letter from one request (/jobs/analyze-and-propose): the JOB_ANALYSIS_PROMPT
+# answer plus "proposal_text", written from that analysis within the same response. The job and
+# profile are sent once, and the analysis never has to be sent back as analysis_data.
+JOB_ANALYSIS_WITH_PROPOSAL_PREFIX = """
+**Role:** You are an expert career coach and Upwork proposal writer.
+**Objective:** Analyze the Upwork job posting given at the end against the freelancer's profile below, then write the cover letter for applying to it, based on your analysis.
+
+**Freelancer's Profile:**
+```json
+{profile_data}
+```
+
+**Output Format:**
+Please provide your answer in the following JSON format. Do not include any text outside of the JSON structure.
+```json
+{{
+  "suitability_score": <A number from 0 to 100, where 100 is a perfect match>,
+  "analysis_summary": "<A one-sentence summary of your analysis.>",
+  "strengths": ["<A key strength or point of alignment between the profile and the job.>", "<Another key strength.>"],
+  "weaknesses": ["<A key weakness or gap in the profile relative to the job.>", "<Another key weakness.>"],
+  "proposal_suggestions": ["<A specific, actionable suggestion for the cover letter.>", "<Another specific suggestion.>"],
+  "proposal_text": "<The cover letter, with paragraphs separated by \\n\\n.>"
+}}
+```
+
+**Analysis Instructions:**
+1.  **Suitability Score:** Base this on a holistic view of skills, experience, client history, and job requirements. A score of 85+ is a strong fit, 70-84 is a good fit, 50-69 is a potential fit with some gaps, and below 50 is a weak fit.
+2.  **Strengths / Weaknesses:** Direct overlaps with specific examples from the profile; missing skills, experience or red flags, constructively.
+3.  **Proposal Suggestions:** Concrete advice on *what* to emphasize and *why*.
+
+**Cover Letter Instructions:**
+1.  **Tone:** Professional, confident, and enthusiastic.
+2.  **Structure:** A strong opening that acknowledges the project; a body that addresses the key requirements, follows your own strengths and proposal_suggestions, and backs claims with specific examples from the profile; a conclusion that suggests next steps (e.g., a brief call) with a professional closing.
+3.  **Personalization:** It must not sound generic; it should feel written specifically for this job.
+4.  **Length:** 150-250 words.
+"""
+
+JOB_ANALYSIS_WITH_PROPOSAL_PROMPT = JOB_ANALYSIS_WITH_PROPOSAL_PREFIX + JOB_ANALYSIS_JOB
+
+# Score-only analysis: the fast "score" mode of /jobs/analyze and /jobs/analyze-all, and the first
+# stage of a triage cascade (see triage_cascade). The answer is held to SCORE_RESPONSE_SCHEMA
+# (Gemini response_schema, Bedrock tool schema) and SCORE_MAX_OUTPUT_TOKENS.
+JOB_SCORE_PREFIX = """
+**Role:** You screen Upwork job postings for a freelancer.
+
+**Objective:** Rate how well the job posting given at the end fits the freelancer's profile below.
+
+**Freelancer's Profile:**
+```json
+{profile_data}
+```
+
+**Output Format:** Reply with this JSON object only:
+{{"suitability_score": <A number from 0 to 100>, "analysis_summary": "<One sentence of at most 25 words on the fit.>"}}
+85+ is a strong fit, 70-84 a good fit, 50-69 a potential fit with some gaps, below 50 a weak fit.
+"""
+
+JOB_SCORE_JOB = JOB_ANALYSIS_JOB
+
+JOB_SCORE_PROMPT = JOB_SCORE_PREFIX + JOB_SCORE_JOB
+
+SCORE_RESPONSE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "suitability_score": {"type": "integer", "description": "Fit from 0 to 100."},
+        "analysis_summary": {"type": "string", "description": "One sentence on the fit."},
+    },
+    "required": ["suitability_score", "analysis_summary"],
+}
+SCORE_MAX_OUTPUT_TOKENS = 128
+
+BULK_JOB_ANALYSIS_PREFIX = """
 
 You're a top opportunity analyzer for an Upwork talent that's looking only for the best opportunities in order to save
 time and connects. So efficiency is necessary. You need to be bold and clearly say if there's not any opportunity available.
 
 The user profile is passed next to this query, where you'll find all the information related to the user.
 
+**Freelancer's Profile:**
+```json
+{profile_data}
+```
+
 Analysis Criteria - Rate each opportunity:
-RED FLAGS (Automatic rejection):
+RED FLAGS (Automatic rejection, score below 30):
 Budget under $40 per hour.
 Vague project descriptions.
 No client payment history, low client rating or NO client rating.
@@ -73,19 +155,44 @@ Project matches my expertise level
 Growth potential or ongoing work mentioned
 
 DECISION FRAMEWORK:
-QUALITY SCORE: 1-10 scale
-KEY CONCERNS: Top 2-3 potential issues
-WIN PROBABILITY: Your assessment of my chances
+SUITABILITY SCORE: 0-100 scale. 85+ is a strong fit, 70-84 is a good fit, 50-69 is a potential fit with some gaps, and below 50 is a weak fit.
+KEY CONCERNS: Top 2-3 potential issues, listed as weaknesses
+WIN PROBABILITY: Your assessment of my chances, reflected in the score and summary
 
 Output Format:
-List only opportunities scoring 7+
-If none meet this threshold, state "No suitable opportunities found". 
-Rank suitable opportunities by attractiveness
-Maximum 3-5 recommendations to avoid decision paralysis
+Return a JSON array with exactly one object per job posting, in any order, and no text outside of the JSON structure.
+Score every job, including the ones you reject.
+
+```json
+[
+  {{
+    "job_id": "<The job_id of the posting this object refers to.>",
+    "suitability_score": <A number from 0 to 100>,
+    "analysis_summary": "<A one-sentence summary of your analysis.>",
+    "strengths": ["<A key strength or point of alignment.>"],
+    "weaknesses": ["<A key concern or red flag.>"],
+    "proposal_suggestions": ["<A specific, actionable suggestion for the proposal cover letter.>"]
+  }}
+]
+```
 
 Focus on quality over quantity - I'd rather pursue 2 excellent opportunities than 10 mediocre ones.
 """
 
+BULK_JOB_ANALYSIS_JOBS = """
+**Job Postings** (each one has a "job_id"):
+```json
+{jobs_data}
+```
+"""
+
+BULK_JOB_ANALYSIS_PROMPT = BULK_JOB_ANALYSIS_PREFIX + BULK_JOB_ANALYSIS_JOBS
+
+# Appended to an analysis prompt when the first answer held no usable JSON (see response_parser).
+JSON_REASK_NOTE = """
+**Note:** A previous answer to this request could not be read. Reply with the JSON only, exactly in the format described above, with no text before or after it.
+"""
+
 PROPOSAL_GENERATION_PROMPT = """
 **Role:** You are a world-class proposal writer and career coach, specializing in the Upwork platform. You write clear, concise, and persuasive cover letters that get results.
 
@@ -130,3 +237,135 @@ Please provide the cover letter as a single string. The cover letter should be w
 
 "I was excited to see your job posting for a React developer. My experience building responsive and user-friendly web applications, particularly my work on the e-commerce platform where I used both React and Tailwind CSS, aligns perfectly with your requirements. I'm confident I can help you build a high-quality and performant application."
 """
+
+
+# --- Prompt serialization ---
+# Jobs, profiles and analyses are rendered as compact JSON holding only what the prompts use:
+# no nulls or empty values, no indentation, and descriptions cut to a token budget.
+
+# Job fields the analysis reads; IDs, URLs and dedup clusters stay out of prompts ("job_id" is kept
+# so packed responses can be matched back).
+JOB_PROMPT_FIELDS = (
+    "job_id", "title", "snippet", "skills", "category2", "subcategory2", "job_type",
+    "rate_display", "workload", "duration", "date_created", "client",
+)
+ANALYSIS_PROMPT_FIELDS = ("suitability_score", "analysis_summary", "strengths", "weaknesses", "proposal_suggestions")
+PROFILE_EXCLUDED_KEYS = {"api_config"}  # Credentials and settings stored alongside the local profile.
+DEFAULT_MAX_DESCRIPTION_TOKENS = 1500
+CHARS_PER_TOKEN = 4  # Same rough ratio as rate_limiter.estimate_tokens.
+TRUNCATION_MARKER = " [...]"
+
+
+def _strip_empty(value):
+    if isinstance(value, dict):
+        stripped = {key: _strip_empty(item) for key, item in value.items()}
+        return {key: item for key, item in stripped.items() if item not in (None, "", [], {})}
+    if isinstance(value, list):
+        return [item for item in (_strip_empty(item) for item in value) if item not in (None, "", [], {})]
+    if isinstance(value, str):
+        return value.strip()
+    return value
+
+
+def _unwrap_connections(value):
+    """Flattens GraphQL {"edges": [{"node": {"id": ...}}]} connections (e.g. profile skills) to plain lists."""
+    if isinstance(value, dict):
+        if set(value) == {"edges"} and isinstance(value["edges"], list):
+            nodes = [edge.get("node") if isinstance(edge, dict) else edge for edge in value["edges"]]
+            return [_unwrap_connections(next(iter(node.values())) if isinstance(node, dict) and len(node) == 1 else node)
+                    for node in nodes]
+        return {key: _unwrap_connections(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_unwrap_connections(item) for item in value]
+    return value
+
+
+def to_prompt_json(value) -> str:
+    return json.dumps(_strip_empty(value), separators=(",", ":"), ensure_ascii=False)
+
+
+def truncate_text(text: str, max_tokens: Optional[int]) -> str:
+    if not text or max_tokens is None:
+        return text
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    if len(text) <= max_chars:
+        return text
+    cut = text[:max_chars]
+    # Prefer ending on a word boundary.
+    return (cut.rsplit(" ", 1)[0] if " " in cut[-40:] else cut) + TRUNCATION_MARKER
+
+
+def project_job(job_data: Dict, max_description_tokens: Optional[int] = DEFAULT_MAX_DESCRIPTION_TOKENS) -> Dict:
+    job = {key: job_data.get(key) for key in JOB_PROMPT_FIELDS if key in job_data}
+    if job.get("snippet"):
+        job["snippet"] = truncate_text(job["snippet"], max_description_tokens)
+    return job
+
+
+def project_profile(profile_data: Dict) -> Dict:
+    def drop_excluded(value):
+        if isinstance(value, dict):
+            return {key: drop_excluded(item) for key, item in value.items() if key not in PROFILE_EXCLUDED_KEYS}
+        if isinstance(value, list):
+            return [drop_excluded(item) for item in value]
+        return value
+    return _unwrap_connections(drop_excluded(profile_data or {}))
+
+
+def project_analysis(analysis_data: Dict) -> Dict:
+    return {key: analysis_data.get(key) for key in ANALYSIS_PROMPT_FIELDS if key in (analysis_data or {})}
+
+
+def description_budget(api_config: Optional[Dict]) -> Optional[int]:
+    """Token budget for job descriptions: api_config["max_description_tokens"] (0 disables truncation)."""
+    budget = (api_config or {}).get("max_description_tokens")
+    if budget is None:
+        return DEFAULT_MAX_DESCRIPTION_TOKENS
+    return int(budget) or None
+
+
+def render_fields(max_description_tokens: Optional[int] = DEFAULT_MAX_DESCRIPTION_TOKENS, **fields) -> Dict[str, str]:
+    """Serializes prompt placeholders (job_data, jobs_data, profile_data, analysis_data) for str.format."""
+    projections = {
+        "job_data": lambda job: project_job(job, max_description_tokens),
+        "jobs_data": lambda jobs: [project_job(job, max_description_tokens) for job in jobs],
+        "profile_data": project_profile,
+        "analysis_data": project_analysis,
+    }
+    return {name: to_prompt_json(projections.get(name, lambda value: value)(value)) for name, value in fields.items()}
+
+
+def format_prompt(prompt_template: str, max_description_tokens: Optional[int] = DEFAULT_MAX_DESCRIPTION_TOKENS, **fields) -> str:
+    return prompt_template.format(**render_fields(max_description_tokens, **fields))
+
+
+def _legacy_prompt(prompt_template: str, **fields) -> str:
+    return prompt_template.format(**{name: json.dumps(value, indent=2) for name, value in fields.items()})
+
+
+def size_report(jobs: List[Dict], profile_data: Dict, pack_size: int = 10,
+                max_description_tokens: Optional[int] = DEFAULT_MAX_DESCRIPTION_TOKENS) -> Dict:
+    """
+    Estimated prompt tokens of single-job and packed analysis prompts for `jobs`, rendered the old
+    way (indented json.dumps of the raw payloads) and with the compact serialization.
+    """
+    def tokens(text: str) -> int:
+        return max(1, len(text) // CHARS_PER_TOKEN)
+
+    report = {}
+    single_old = sum(tokens(_legacy_prompt(JOB_ANALYSIS_PROMPT, job_data=job, profile_data=profile_data)) for job in jobs)
+    single_new = sum(tokens(format_prompt(JOB_ANALYSIS_PROMPT, max_description_tokens, job_data=job, profile_data=profile_data))
+                     for job in jobs)
+    report["single"] = {"requests": len(jobs), "old_tokens": single_old, "new_tokens": single_new}
+
+    packs = [[{"job_id": str(i + 1), **job} for i, job in enumerate(jobs[start:start + pack_size])]
+             for start in range(0, len(jobs), pack_size)]
+    packed_old = sum(tokens(_legacy_prompt(BULK_JOB_ANALYSIS_PROMPT, jobs_data=pack, profile_data=profile_data)) for pack in packs)
+    packed_new = sum(tokens(format_prompt(BULK_JOB_ANALYSIS_PROMPT, max_description_tokens, jobs_data=pack, profile_data=profile_data))
+                     for pack in packs)
+    report["packed"] = {"requests": len(packs), "old_tokens": packed_old, "new_tokens": packed_new}
+
+    for entry in report.values():
+        entry["saved_tokens"] = entry["old_tokens"] - entry["new_tokens"]
+        entry["saved_percent"] = round(100 * entry["saved_tokens"] / entry["old_tokens"], 1) if entry["old_tokens"] else 0.0
+    return report
@@ -0,0 +1,173 @@
+# backend/proposal_prefetch.py
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+from . import ai_providers, analysis_cache, context_cache, prompts, scheduler, usage_tracker
+
+logger = logging.getLogger(__name__)
+
+# Speculative proposals, configured by api_config["proposal_prefetch"]: once a bulk run is done, cover
+# letters for its top results are generated on idle provider capacity (the scheduler's SPECULATIVE
+# class), so "generate proposal" on one of them is answered without waiting on the provider.
+DEFAULT_PREFETCH = {
+    "enabled": False,
+    "top_n": 3,  # Best-scored results of the run to prepare proposals for.
+    "min_score": 70,  # Results scored below this aren't worth a proposal.
+}
+MAX_PREPARED = 100  # Prepared proposals kept; the oldest are dropped first.
+PREPARED_TTL_SECONDS = 24 * 60 * 60
+
+# Prepared proposals by proposal_key(), oldest first. Each is served once: asking again writes a new one.
+_prepared: "OrderedDict[str, Dict]" = OrderedDict()
+_current: Optional[asyncio.Task] = None
+_stats = {"batches": 0, "queued": 0, "prepared": 0, "analyses_fetched": 0, "failed": 0,
+          "cancelled": 0, "served": 0, "misses": 0, "expired": 0}
+
+
+def resolve_prefetch(api_config: Dict) -> Optional[Dict]:
+    """api_config["proposal_prefetch"] merged over DEFAULT_PREFETCH, or None if pre-generation is off."""
+    prefetch = dict(DEFAULT_PREFETCH)
+    prefetch.update({k: v for k, v in (api_config.get("proposal_prefetch") or {}).items() if v is not None})
+    return prefetch if prefetch["enabled"] and prefetch["top_n"] > 0 else None
+
+
+def proposal_key(job_data: Dict, profile_data: Dict, analysis_data: Dict, api_config: Dict,
+                 provider: Optional[str] = None) -> str:
+    """
+    Content address of a proposal: the job, the profile, the analysis fields the prompt reads
+    (prompts.project_analysis, so run metadata like provider_meta doesn't count), the proposal
+    prompt and the model of `provider` (by default api_config["provider"], which a request asks first).
+    """
+    provider = provider or api_config.get("provider", "google")
+    return analysis_cache.make_key(
+        job_data, {"profile": profile_data, "analysis": prompts.project_analysis(analysis_data)},
+        prompts.PROPOSAL_GENERATION_PROMPT, ai_providers.model_id(provider, api_config), prompts.description_budget(api_config)
+    )
+
+
+def take(job_data: Dict, profile_data: Dict, analysis_data: Dict, api_config: Dict) -> Optional[Dict]:
+    """
+    Removes and returns the prepared proposal ({"proposal_text", "provider_meta"}) for this job,
+    profile and analysis, or None if there is none.
+    """
+    entry = _prepared.pop(proposal_key(job_data, profile_data, analysis_data, api_config), None)
+    if entry is not None and time.time() - entry["created_at"] > PREPARED_TTL_SECONDS:
+        _stats["expired"] += 1
+        entry = None
+    if entry is None:
+        _stats["misses"] += 1
+        return None
+    _stats["served"] += 1
+    return {"proposal_text": entry["proposal_text"], "provider_meta": entry["provider_meta"]}
+
+
+def _needs_full_analysis(analysis: Dict) -> bool:
+    # Score-mode results and jobs a cascade stopped at triage only carry a score and a summary.
+    return analysis.get("mode") == "score" or (analysis.get("cascade") or {}).get("stage") == "triage"
+
+
+async def _speculative_call(api_config: Dict, ledger: Optional[usage_tracker.UsageLedger], call, description: str,
+                            prompt_template: str, output_tokens: int, validate, **fields):
+    """Runs `call(provider)` in the scheduler's SPECULATIVE class, reserved against the run's budget if it had one."""
+    estimated_tokens = scheduler.estimate_prompt_tokens(prompt_template, output_tokens, api_config, **fields)
+
+    async def budgeted(provider: str):
+        if ledger is None:
+            return await call(provider)
+        with ledger.reservation(ai_providers.model_id(provider, api_config), estimated_tokens - output_tokens, output_tokens):
+            return await call(provider)
+
+    return await ai_providers.run_with_policy(
+        "bulk", api_config,
+        lambda provider: scheduler.scheduled_call(
+            provider, api_config, lambda: budgeted(provider), description, scheduler.SPECULATIVE, estimated_tokens
+        ),
+        validate
+    )
+
+
+async def _prepare(result: Dict, profile_data: Dict, api_config: Dict, ledger: Optional[usage_tracker.UsageLedger]):
+    job_data = result["job_data"]
+    title = job_data.get("title")
+    analysis = result
+    try:
+        if _needs_full_analysis(analysis):
+            # The full analysis is cached, so opening the job later is served from the analysis cache too.
+            analysis, _ = await _speculative_call(
+                api_config, ledger, lambda p: ai_providers.analyze_job(p, job_data, profile_data, api_config),
+                f"speculative analysis of job {title}", prompts.JOB_ANALYSIS_PROMPT, scheduler.ANALYSIS_OUTPUT_TOKENS,
+                lambda value: isinstance(value, dict), job_data=job_data, profile_data=profile_data
+            )
+            _stats["analyses_fetched"] += 1
+        key = proposal_key(job_data, profile_data, analysis, api_config)
+        if key in _prepared:
+            return
+        analysis_data = prompts.project_analysis(analysis)
+        proposal_text, provider_meta = await _speculative_call(
+            api_config, ledger, lambda p: ai_providers.generate_proposal(p, job_data, profile_data, analysis_data, api_config),
+            f"speculative proposal for {title}", prompts.PROPOSAL_GENERATION_PROMPT, scheduler.PROPOSAL_OUTPUT_TOKENS,
+            lambda text: isinstance(text, str) and bool(text.strip()),
+            job_data=job_data, profile_data=profile_data, analysis_data=analysis_data
+        )
+    except usage_tracker.BudgetExceededError:
+        logger.info(f"Skipping the speculative proposal for {title}: the run's budget is exhausted.")
+        _stats["failed"] += 1
+        return
+    except (ConnectionError, ValueError) as e:
+        logger.warning(f"Speculative proposal for {title} failed: {e}")
+        _stats["failed"] += 1
+        return
+    except Exception as e:
+        logger.error(f"Unexpected error during the speculative proposal for {title}: {e}", exc_info=True)
+        _stats["failed"] += 1
+        return
+
+    # Keyed on the provider that wrote it: a proposal from the secondary after a failover isn't the primary model's.
+    key = proposal_key(job_data, profile_data, analysis, api_config, provider_meta["provider"])
+    _prepared[key] = {"proposal_text": proposal_text, "provider_meta": provider_meta, "created_at": time.time()}
+    _prepared.move_to_end(key)
+    while len(_prepared) > MAX_PREPARED:
+        _prepared.popitem(last=False)
+    _stats["prepared"] += 1
+    logger.info(f"Prepared a speculative proposal for {title}.")
+
+
+async def _run(results: List[Dict], profile_data: Dict, api_config: Dict, ledger: Optional[usage_tracker.UsageLedger]):
+    usage_tracker.bind(ledger)
+    # Started from within the run's tasks, but outlives the run's context cache.
+    context_cache.bind(None)
+    await asyncio.gather(*[_prepare(result, profile_data, api_config, ledger) for result in results])
+
+
+def start(results: List[Dict], profile_data: Dict, api_config: Dict,
+          ledger: Optional[usage_tracker.UsageLedger] = None) -> int:
+    """
+    Starts preparing proposals for the given results in the background, replacing any batch still
+    running. Returns how many were queued.
+    """
+    global _current
+    cancel()
+    if not results:
+        return 0
+    _stats["batches"] += 1
+    _stats["queued"] += len(results)
+    logger.info(f"Preparing speculative proposals for the top {len(results)} results.")
+    _current = asyncio.create_task(_run(results, profile_data, api_config, ledger))
+    return len(results)
+
+
+def cancel():
+    """Stops the running batch, e.g. because a new bulk run started. Proposals already prepared are kept."""
+    global _current
+    if _current is not None and not _current.done():
+        _current.cancel()
+        _stats["cancelled"] += 1
+        logger.info("Speculative proposal generation cancelled.")
+    _current = None
+
+
+def get_stats() -> Dict:
+    return {**_stats, "stored": len(_prepared), "running": _current is not None and not _current.done()}
@@ -0,0 +1,278 @@
+# backend/rate_limiter.py
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Deque, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Requests-per-minute / tokens-per-minute budgets used when api_config does not override them.
+DEFAULT_LIMITS = {
+    "google": {"rpm": 60, "tpm": 1_000_000},
+    "aws": {"rpm": 50, "tpm": 200_000},
+    "fake": {"rpm": 100_000, "tpm": 1_000_000_000},  # Effectively unlimited: benchmarks set their own.
+}
+DEFAULT_MAX_CONCURRENCY = 10
+INITIAL_CONCURRENCY = 2
+THROTTLE_COOLDOWN_SECONDS = 2.0
+MAX_THROTTLE_COOLDOWN_SECONDS = 30.0
+
+# Priority classes in the order they are served. While several classes are waiting, each gets up to
+# its weight in grants per round, so interactive calls go first but bulk work keeps a 1-in-4 share.
+# Classes without a weight only run on idle capacity: when no weighted class is waiting, and while
+# IDLE_RESERVED_SLOTS of the concurrency window stay free for whatever arrives next.
+PRIORITY_CLASSES = ("interactive", "bulk", "speculative")
+PRIORITY_WEIGHTS = {"interactive": 3, "bulk": 1}
+IDLE_RESERVED_SLOTS = 1
+WAIT_SAMPLE_SIZE = 500  # Recent queue waits kept per class for the percentile stats.
+
+# Substrings that identify a provider throttling / quota response in a wrapped error message.
+THROTTLE_MARKERS = (
+    "429",
+    "resource exhausted",
+    "resourceexhausted",
+    "resource has been exhausted",
+    "quota",
+    "throttl",
+    "too many requests",
+    "rate exceeded",
+)
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token estimate (about four characters per token) used for budgeting."""
+    return max(1, len(text) // 4)
+
+
+def is_throttling_error(error: BaseException) -> bool:
+    """Returns True if the error looks like a 429 / quota response from the provider."""
+    message = f"{type(error).__name__} {error}".lower()
+    return any(marker in message for marker in THROTTLE_MARKERS)
+
+
+class TokenBucket:
+    """A continuously refilling bucket holding at most one minute of budget."""
+
+    def __init__(self, per_minute: int):
+        self.capacity = float(per_minute)
+        self.tokens = self.capacity
+        self.refill_rate = self.capacity / 60.0
+        self.updated_at = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.refill_rate)
+        self.updated_at = now
+
+    def delay_for(self, amount: float) -> float:
+        """Seconds to wait until `amount` can be consumed (requests larger than the bucket wait for a full one)."""
+        self._refill()
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.refill_rate
+
+    def consume(self, amount: float):
+        self._refill()
+        self.tokens -= min(amount, self.capacity)
+
+    def resize(self, per_minute: int):
+        """Changes the budget, keeping what has been consumed so far (capped at the new capacity)."""
+        self._refill()
+        self.capacity = float(per_minute)
+        self.refill_rate = self.capacity / 60.0
+        self.tokens = min(self.tokens, self.capacity)
+
+
+class AdaptiveRateLimiter:
+    """
+    Per-provider limiter combining RPM/TPM token buckets with an AIMD concurrency window.
+    The window grows by roughly one slot per round of successful calls and is halved
+    whenever the provider answers with a throttling error. Waiting calls are granted by a
+    single dispatcher in weighted round-robin over PRIORITY_CLASSES, FIFO within a class.
+    """
+
+    def __init__(self, provider: str, rpm: int, tpm: int, max_concurrency: int):
+        self.provider = provider
+        self.limits = (rpm, tpm, max_concurrency)
+        self.max_concurrency = max(1, max_concurrency)
+        self._window = float(min(INITIAL_CONCURRENCY, self.max_concurrency))
+        self._request_bucket = TokenBucket(rpm)
+        self._token_bucket = TokenBucket(tpm)
+        self._in_flight = 0
+        self._cooldown_until = 0.0
+        self._last_decrease_at = 0.0
+        self._consecutive_throttles = 0
+        self._released = asyncio.Event()
+        self._waiting: Dict[str, Deque[Tuple[asyncio.Future, int, float]]] = {p: deque() for p in PRIORITY_CLASSES}
+        self._credits = dict(PRIORITY_WEIGHTS)
+        self._dispatcher: Optional[asyncio.Task] = None
+        self._waits: Dict[str, Deque[float]] = {p: deque(maxlen=WAIT_SAMPLE_SIZE) for p in PRIORITY_CLASSES}
+        self._granted = {p: 0 for p in PRIORITY_CLASSES}
+        self.total_requests = 0
+        self.total_throttled = 0
+
+    @property
+    def concurrency(self) -> int:
+        return max(1, int(self._window))
+
+    def update_limits(self, rpm: int, tpm: int, max_concurrency: int):
+        """
+        Applies new limits in place, so calls already holding a slot or budget keep counting
+        against them.
+        """
+        self.limits = (rpm, tpm, max_concurrency)
+        self.max_concurrency = max(1, max_concurrency)
+        self._window = min(self._window, float(self.max_concurrency))
+        self._request_bucket.resize(rpm)
+        self._token_bucket.resize(tpm)
+        self._released.set()
+
+    def _delay_for(self, tokens: int) -> float:
+        cooldown = max(0.0, self._cooldown_until - time.monotonic())
+        return max(cooldown, self._request_bucket.delay_for(1), self._token_bucket.delay_for(tokens))
+
+    async def acquire(self, tokens: int, priority: str = "bulk"):
+        """
+        Waits until a concurrency slot and enough RPM/TPM budget are available.
+        Every acquire must be paired with release().
+        """
+        if priority not in self._waiting:
+            raise ValueError(f"Unknown priority class: {priority}")
+        ticket = asyncio.get_running_loop().create_future()
+        self._waiting[priority].append((ticket, tokens, time.monotonic()))
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = asyncio.create_task(self._dispatch())
+        else:
+            self._released.set()
+        try:
+            await ticket
+        except asyncio.CancelledError:
+            if ticket.done() and not ticket.cancelled():
+                # Granted just before the caller was cancelled: hand the slot back.
+                self._in_flight -= 1
+            self._released.set()
+            raise
+
+    def _next_class(self) -> Optional[str]:
+        waiting = [p for p in PRIORITY_WEIGHTS if self._waiting[p]]
+        if not waiting:
+            return next((p for p in PRIORITY_CLASSES if self._waiting[p]), None)
+        if not any(self._credits[p] > 0 for p in waiting):
+            self._credits = dict(PRIORITY_WEIGHTS)
+        return next(p for p in waiting if self._credits[p] > 0)
+
+    async def _dispatch(self):
+        while True:
+            priority = self._next_class()
+            if priority is None:
+                return
+            ticket, tokens, enqueued_at = self._waiting[priority][0]
+            if ticket.done():
+                # The caller gave up (cancelled) while queued.
+                self._waiting[priority].popleft()
+                continue
+            delay = self._delay_for(tokens)
+            slots = self.concurrency if priority in PRIORITY_WEIGHTS else max(1, self.concurrency - IDLE_RESERVED_SLOTS)
+            has_slot = self._in_flight < slots
+            if has_slot and delay <= 0:
+                self._waiting[priority].popleft()
+                self._request_bucket.consume(1)
+                self._token_bucket.consume(tokens)
+                self._in_flight += 1
+                self.total_requests += 1
+                if priority in self._credits:
+                    self._credits[priority] -= 1
+                self._granted[priority] += 1
+                self._waits[priority].append(time.monotonic() - enqueued_at)
+                ticket.set_result(None)
+                continue
+            self._released.clear()
+            try:
+                await asyncio.wait_for(self._released.wait(), timeout=delay if has_slot else None)
+            except asyncio.TimeoutError:
+                pass
+
+    def release(self, throttled: bool = False):
+        """Frees a slot and adapts the concurrency window to the outcome of the call."""
+        self._in_flight -= 1
+        now = time.monotonic()
+        if throttled:
+            self.total_throttled += 1
+            self._consecutive_throttles += 1
+            # Only back off once per burst: calls that were already in flight fail together.
+            if now - self._last_decrease_at > THROTTLE_COOLDOWN_SECONDS:
+                self._window = max(1.0, self._window / 2)
+                self._last_decrease_at = now
+            cooldown = min(MAX_THROTTLE_COOLDOWN_SECONDS, THROTTLE_COOLDOWN_SECONDS * 2 ** (self._consecutive_throttles - 1))
+            self._cooldown_until = max(self._cooldown_until, now + cooldown)
+            logger.warning(f"{self.provider} throttled the request; concurrency reduced to {self.concurrency}, cooling down {cooldown:.1f}s.")
+        else:
+            self._consecutive_throttles = 0
+            self._window = min(float(self.max_concurrency), self._window + 1.0 / self._window)
+        self._released.set()
+
+    def snapshot(self) -> Dict:
+        rpm, tpm, max_concurrency = self.limits
+        return {
+            "provider": self.provider,
+            "rpm_limit": rpm,
+            "tpm_limit": tpm,
+            "max_concurrency": max_concurrency,
+            "concurrency": self.concurrency,
+            "in_flight": self._in_flight,
+            "total_requests": self.total_requests,
+            "total_throttled": self.total_throttled,
+            "queues": {priority: self._queue_stats(priority) for priority in PRIORITY_CLASSES},
+        }
+
+    def _queue_stats(self, priority: str) -> Dict:
+        waits = sorted(self._waits[priority])
+
+        def percentile(q: float) -> Optional[float]:
+            return round(waits[min(len(waits) - 1, int(q * len(waits)))], 3) if waits else None
+
+        return {
+            "waiting": len(self._waiting[priority]),
+            "granted": self._granted[priority],
+            "wait_avg_seconds": round(sum(waits) / len(waits), 3) if waits else None,
+            "wait_p50_seconds": percentile(0.5),
+            "wait_p95_seconds": percentile(0.95),
+            "wait_max_seconds": round(waits[-1], 3) if waits else None,
+        }
+
+
+_limiters: Dict[str, AdaptiveRateLimiter] = {}
+
+
+def _resolve_limits(provider: str, api_config: Optional[Dict]) -> tuple:
+    api_config = api_config or {}
+    defaults = DEFAULT_LIMITS.get(provider, DEFAULT_LIMITS["google"])
+    rpm = api_config.get("rate_limit_rpm") or defaults["rpm"]
+    tpm = api_config.get("rate_limit_tpm") or defaults["tpm"]
+    max_concurrency = api_config.get("max_concurrency") or DEFAULT_MAX_CONCURRENCY
+    return int(rpm), int(tpm), int(max_concurrency)
+
+
+def get_rate_limiter(provider: str, api_config: Optional[Dict] = None) -> AdaptiveRateLimiter:
+    """
+    Returns the shared limiter for a provider, updating its limits in place if the configured
+    limits changed.
+    """
+    limits = _resolve_limits(provider, api_config)
+    rpm, tpm, max_concurrency = limits
+    limiter = _limiters.get(provider)
+    if limiter is None:
+        logger.info(f"Creating rate limiter for {provider}: {rpm} RPM, {tpm} TPM, max concurrency {max_concurrency}.")
+        limiter = AdaptiveRateLimiter(provider, rpm, tpm, max_concurrency)
+        _limiters[provider] = limiter
+    elif limiter.limits != limits:
+        logger.info(f"Updating rate limiter for {provider}: {rpm} RPM, {tpm} TPM, max concurrency {max_concurrency}.")
+        limiter.update_limits(rpm, tpm, max_concurrency)
+    return limiter
+
+
+def get_snapshots() -> Dict[str, Dict]:
+    """Current window, counters and per-priority queue-wait stats of every provider limiter."""
+    return {provider: limiter.snapshot() for provider, limiter in _limiters.items()}
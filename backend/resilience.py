@@ -0,0 +1,234 @@
+# backend/resilience.py
+import asyncio
+import logging
+import random
+import time
+from email.utils import parsedate_to_datetime
+from typing import Awaitable, Callable, Dict, Optional
+
+from . import rate_limiter
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 4
+BASE_BACKOFF_SECONDS = 1.0
+MAX_BACKOFF_SECONDS = 30.0
+BREAKER_FAILURE_THRESHOLD = 5  # Consecutive transient failures that open the circuit.
+BREAKER_RESET_SECONDS = 30.0  # How long an open circuit fails fast before letting a probe through.
+
+RETRYABLE_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+# AWS error codes (ClientError.response["Error"]["Code"]) that are worth retrying.
+RETRYABLE_ERROR_CODES = {
+    "ThrottlingException",
+    "TooManyRequestsException",
+    "ServiceUnavailableException",
+    "InternalServerException",
+    "ModelNotReadyException",
+    "ModelTimeoutException",
+}
+
+
+class ProviderError(ConnectionError):
+    """
+    A failed LLM provider call, classified for the retry policy. Still a ConnectionError,
+    so endpoints keep mapping it to HTTP 424.
+    """
+
+    def __init__(self, message: str, retryable: bool = False, throttled: bool = False,
+                 retry_after: Optional[float] = None, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.retryable = retryable
+        self.throttled = throttled
+        self.retry_after = retry_after
+        self.status_code = status_code
+
+
+class CircuitOpenError(ProviderError):
+    """Raised without calling the provider while its circuit breaker is open."""
+
+
+def _parse_retry_after(value) -> Optional[float]:
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(str(value)).timestamp() - time.time())
+    except (TypeError, ValueError, IndexError):
+        return None
+
+
+def _error_details(error: BaseException):
+    """
+    Extracts (status_code, error_code, retry_after) from Google API and botocore exceptions
+    without importing either SDK.
+    """
+    status_code = getattr(error, 'code', None)
+    error_code = None
+    retry_after = None
+
+    response = getattr(error, 'response', None)
+    if isinstance(response, dict):
+        # botocore ClientError
+        metadata = response.get('ResponseMetadata', {})
+        status_code = metadata.get('HTTPStatusCode')
+        error_code = response.get('Error', {}).get('Code')
+        retry_after = _parse_retry_after(metadata.get('HTTPHeaders', {}).get('retry-after'))
+    elif response is not None:
+        headers = getattr(response, 'headers', None) or {}
+        retry_after = _parse_retry_after(headers.get('retry-after') or headers.get('Retry-After'))
+
+    # Google quota errors carry a google.rpc.RetryInfo detail instead of a header.
+    for detail in getattr(error, 'details', None) or []:
+        delay = getattr(detail, 'retry_delay', None)
+        if delay is not None and retry_after is None:
+            retry_after = delay.seconds + delay.nanos / 1e9
+
+    return (status_code if isinstance(status_code, int) else None), error_code, retry_after
+
+
+def provider_error(message: str, cause: BaseException) -> ProviderError:
+    """
+    Builds the ProviderError a provider module raises for `cause`, deciding whether it is
+    transient (throttling, 5xx, timeouts, dropped connections) or permanent.
+    """
+    if isinstance(cause, ProviderError):
+        return cause
+
+    status_code, error_code, retry_after = None, None, None
+    error = cause
+    while error is not None and status_code is None and error_code is None:
+        status_code, error_code, retry_after = _error_details(error)
+        error = getattr(error, 'cause', None) or error.__cause__
+
+    throttled = status_code == 429 or error_code in ("ThrottlingException", "TooManyRequestsException") \
+        or rate_limiter.is_throttling_error(cause)
+    type_name = type(cause).__name__
+    network_failure = isinstance(cause, (asyncio.TimeoutError, TimeoutError, OSError)) \
+        or "Timeout" in type_name or "Connection" in type_name
+    retryable = throttled or status_code in RETRYABLE_STATUS_CODES or error_code in RETRYABLE_ERROR_CODES \
+        or (status_code is None and error_code is None and network_failure)
+    return ProviderError(message, retryable=retryable, throttled=throttled,
+                         retry_after=retry_after, status_code=status_code)
+
+
+def is_throttled(error: BaseException) -> bool:
+    if isinstance(error, ProviderError):
+        return error.throttled
+    return rate_limiter.is_throttling_error(error)
+
+
+def backoff_delay(attempt: int, retry_after: Optional[float] = None) -> float:
+    """
+    Capped exponential backoff with full jitter; a provider's Retry-After takes precedence.
+    """
+    if retry_after is not None:
+        return min(MAX_BACKOFF_SECONDS, retry_after)
+    return random.uniform(0, min(MAX_BACKOFF_SECONDS, BASE_BACKOFF_SECONDS * 2 ** (attempt - 1)))
+
+
+class CircuitBreaker:
+    """
+    Per-provider breaker. After BREAKER_FAILURE_THRESHOLD consecutive transient failures the circuit
+    opens and calls fail fast; after BREAKER_RESET_SECONDS a single probe call is let through and
+    its outcome closes or re-opens the circuit. Throttling is left to the rate limiter.
+    """
+
+    def __init__(self, provider: str):
+        self.provider = provider
+        self.state = "closed"
+        self._consecutive_failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self.times_opened = 0
+        self.short_circuited = 0
+
+    def before_call(self):
+        if self.state == "open" and time.monotonic() - self._opened_at >= BREAKER_RESET_SECONDS:
+            self.state = "half_open"
+            self._probe_in_flight = False
+        if self.state == "open" or (self.state == "half_open" and self._probe_in_flight):
+            self.short_circuited += 1
+            raise CircuitOpenError(f"{self.provider} is unavailable; skipping the call while the circuit breaker is open.")
+        if self.state == "half_open":
+            self._probe_in_flight = True
+
+    def record_success(self):
+        if self.state != "closed":
+            logger.info(f"{self.provider} circuit breaker closed.")
+        self.state = "closed"
+        self._consecutive_failures = 0
+        self._probe_in_flight = False
+
+    def record_failure(self, error: BaseException):
+        if not isinstance(error, ProviderError) or not error.retryable or error.throttled:
+            # Permanent errors are about the request, not the provider; throttling is expected under load.
+            self._probe_in_flight = False
+            return
+        self._consecutive_failures += 1
+        if self.state == "half_open" or self._consecutive_failures >= BREAKER_FAILURE_THRESHOLD:
+            if self.state != "open":
+                self.times_opened += 1
+                logger.warning(f"{self.provider} circuit breaker opened after {self._consecutive_failures} consecutive failures.")
+            self.state = "open"
+            self._opened_at = time.monotonic()
+        self._probe_in_flight = False
+
+    def snapshot(self) -> Dict:
+        retry_in = None
+        if self.state == "open":
+            retry_in = round(max(0.0, BREAKER_RESET_SECONDS - (time.monotonic() - self._opened_at)), 1)
+        return {
+            "provider": self.provider,
+            "state": self.state,
+            "consecutive_failures": self._consecutive_failures,
+            "times_opened": self.times_opened,
+            "short_circuited": self.short_circuited,
+            "retry_in_seconds": retry_in,
+        }
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+
+
+def get_circuit_breaker(provider: str) -> CircuitBreaker:
+    if provider not in _breakers:
+        _breakers[provider] = CircuitBreaker(provider)
+    return _breakers[provider]
+
+
+def get_breaker_states() -> Dict[str, Dict]:
+    return {provider: breaker.snapshot() for provider, breaker in _breakers.items()}
+
+
+async def call_with_retry(provider: str, call: Callable[[], Awaitable], description: str,
+                          counters: Optional[Dict] = None):
+    """
+    Runs a provider call through the provider's circuit breaker, retrying transient failures
+    up to MAX_ATTEMPTS times. `counters`, if given, accumulates "retries" and "retries_exhausted".
+    """
+    breaker = get_circuit_breaker(provider)
+    for attempt in range(1, MAX_ATTEMPTS + 1):
+        breaker.before_call()
+        try:
+            result = await call()
+        except BaseException as e:
+            # Includes cancellation, so an abandoned half-open probe doesn't block the circuit.
+            breaker.record_failure(e)
+            if not isinstance(e, ProviderError) or not e.retryable:
+                raise
+            if attempt == MAX_ATTEMPTS:
+                if counters is not None:
+                    counters["retries_exhausted"] = counters.get("retries_exhausted", 0) + 1
+                raise
+            delay = backoff_delay(attempt, e.retry_after)
+            if counters is not None:
+                counters["retries"] = counters.get("retries", 0) + 1
+            logger.warning(f"Transient {provider} error for {description} (attempt {attempt}/{MAX_ATTEMPTS}), "
+                           f"retrying in {delay:.1f}s: {e}")
+            await asyncio.sleep(delay)
+        else:
+            breaker.record_success()
+            return result
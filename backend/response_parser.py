@@ -0,0 +1,319 @@
+# backend/response_parser.py
+import json
+import logging
+import re
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Analysis schema shared by JOB_ANALYSIS_PROMPT and BULK_JOB_ANALYSIS_PROMPT answers.
+SCORE_FIELD = "suitability_score"  # Required; coerced to a number from 0 to 100.
+TEXT_FIELDS = ("analysis_summary",)  # Default to "".
+LIST_FIELDS = ("strengths", "weaknesses", "proposal_suggestions")  # Default to [].
+PROPOSAL_FIELD = "proposal_text"  # Required in JOB_ANALYSIS_WITH_PROPOSAL_PROMPT answers.
+
+_SMART_DOUBLE_QUOTES = str.maketrans({"“": '"', "”": '"', "„": '"', "‟": '"'})
+_CLOSERS = {"{": "}", "[": "]"}
+_NUMBER = re.compile(r"-?\d+(?:\.\d+)?")
+_OUT_OF_TEN = re.compile(r"^\s*/\s*10(?!\d)")
+
+_stats = {"responses": 0, "clean": 0, "repaired": 0, "coerced": 0, "dropped_items": 0, "reasks": 0, "failures": 0}
+_repairs: Dict[str, int] = {}
+
+
+class ResponseFormatError(ValueError):
+    """The response holds no usable analysis JSON, even after repair."""
+
+
+def _scan(text: str, start: int) -> Tuple[str, int, List[Tuple[str, int, bool]], bool, bool]:
+    """
+    Copies the JSON value opening at text[start] up to its closing bracket, dropping commas that
+    precede a closing bracket. Returns the copy, the index after it, the containers still open
+    (non-empty if the text was cut off), whether the cut fell inside a string, and whether any
+    trailing commas were dropped. Each open container is (bracket, offset in the copy where its
+    current element starts, whether that element has passed its ":").
+    """
+    out: List[str] = []
+    frames: List[Tuple[str, int, bool]] = []
+    in_string = escaped = dropped_commas = False
+    index = start
+    while index < len(text):
+        char = text[index]
+        index += 1
+        out.append(char)
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char in _CLOSERS:
+            frames.append((char, len(out), False))
+        elif char == "," and frames:
+            frames[-1] = (frames[-1][0], len(out), False)
+        elif char == ":" and frames:
+            frames[-1] = (frames[-1][0], frames[-1][1], True)
+        elif char in "}]":
+            out.pop()
+            while out and out[-1].isspace():
+                out.pop()
+            if out and out[-1] == ",":
+                out.pop()
+                dropped_commas = True
+            out.append(char)
+            frames.pop()
+            if not frames:
+                break
+    return "".join(out), index, frames, in_string, dropped_commas
+
+
+def _close_truncated(value: str, frames: List[Tuple[str, int, bool]], in_string: bool) -> Tuple[str, bool]:
+    """
+    Ends a cut-off JSON value. The innermost container's last element is kept only if it is
+    visibly complete (a closed string or container, and in an object a whole key: value pair);
+    anything else, like a number that may have lost digits, a cut string or a dangling key, is
+    dropped. Then the open brackets are closed. Also returns whether the cut fell inside an item
+    of the outermost array, rather than between its items.
+    """
+    openers = [opener for opener, _, _ in frames]
+    in_item = "[" in openers and openers.index("[") < len(openers) - 1
+    bracket, element_start, past_colon = frames[-1]
+    tail = value[element_start:].strip()
+    complete = not in_string and bool(tail) and tail[-1] in '"}]' and (bracket == "[" or past_colon)
+    if not complete:
+        value = value[:element_start]
+    value = value.rstrip()
+    if value.endswith(","):
+        value = value[:-1]
+    return value + "".join(_CLOSERS[opener] for opener in reversed(openers)), in_item
+
+
+def _load(text: str, opener: str) -> Tuple[Any, List[str]]:
+    """
+    Parses the JSON value in `text`, looking for the first `opener` bracket (or the other kind)
+    when the text isn't pure JSON. Returns the value and the repairs that were needed.
+    """
+    try:
+        return json.loads(text), []
+    except json.JSONDecodeError:
+        pass
+
+    fixed_quotes = text.translate(_SMART_DOUBLE_QUOTES)
+    attempts = [(text, [])]
+    if fixed_quotes != text:
+        attempts.append((fixed_quotes, ["smart_quotes"]))
+    for source, repairs in attempts:
+        start = source.find(opener)
+        if start == -1:
+            start = source.find("[" if opener == "{" else "{")
+        if start == -1:
+            continue
+        value, end, frames, in_string, dropped_commas = _scan(source, start)
+        repairs = list(repairs)
+        if source[:start].strip() or source[end:].strip():
+            repairs.append("extracted")
+        if dropped_commas:
+            repairs.append("trailing_commas")
+        if frames:
+            value, in_item = _close_truncated(value, frames, in_string)
+            repairs.append("truncated")
+            if in_item:
+                repairs.append("truncated_item")
+        try:
+            return json.loads(value), repairs
+        except json.JSONDecodeError:
+            continue
+    raise ResponseFormatError("Could not find valid JSON in the AI response.")
+
+
+def coerce_score(value: Any) -> Optional[float]:
+    """
+    Reads a suitability score given as a number or as text ("85", "85%", "8.5/10"), clamped to
+    0-100. Returns None if there is no number to read.
+    """
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        score = float(value)
+    elif isinstance(value, str):
+        match = _NUMBER.search(value)
+        if not match:
+            return None
+        score = float(match.group())
+        if _OUT_OF_TEN.match(value[match.end():]):
+            score *= 10
+    else:
+        return None
+    score = min(100.0, max(0.0, score))
+    return int(score) if score.is_integer() else round(score, 1)
+
+
+def validate_analysis(data: Dict) -> Tuple[Dict, List[str]]:
+    """
+    Checks an analysis object against the schema, coercing fields of the wrong type.
+    Returns the analysis and the names of the coerced fields; raises ResponseFormatError if it
+    has no readable suitability_score.
+    """
+    analysis = dict(data)
+    coerced = []
+    score = coerce_score(analysis.get(SCORE_FIELD))
+    if score is None:
+        raise ResponseFormatError(f"The analysis has no valid {SCORE_FIELD}.")
+    if score != analysis[SCORE_FIELD]:
+        coerced.append(SCORE_FIELD)
+    analysis[SCORE_FIELD] = score
+
+    for field in TEXT_FIELDS:
+        value = analysis.get(field)
+        if not isinstance(value, str):
+            analysis[field] = "" if value is None else str(value)
+            coerced.append(field)
+    for field in LIST_FIELDS:
+        value = analysis.get(field)
+        if isinstance(value, list) and all(isinstance(item, str) for item in value):
+            continue
+        if value is None or value == "":
+            analysis[field] = []
+        elif isinstance(value, list):
+            analysis[field] = [item if isinstance(item, str) else json.dumps(item) for item in value if item is not None]
+        else:
+            analysis[field] = [str(value)]
+        coerced.append(field)
+    if "job_id" in analysis and not isinstance(analysis["job_id"], str):
+        analysis["job_id"] = str(analysis["job_id"])
+    return analysis, coerced
+
+
+def _record(repairs: List[str], coerced: bool):
+    if repairs:
+        _stats["repaired"] += 1
+        for repair in repairs:
+            _repairs[repair] = _repairs.get(repair, 0) + 1
+        logger.info(f"Repaired AI response JSON: {', '.join(repairs)}.")
+    else:
+        _stats["clean"] += 1
+    if coerced:
+        _stats["coerced"] += 1
+
+
+def parse_analysis(text: str) -> Dict:
+    """Extracts, repairs and validates a single-job analysis from a model response."""
+    _stats["responses"] += 1
+    try:
+        parsed, repairs = _load(text or "", "{")
+        if isinstance(parsed, list) and len(parsed) == 1 and isinstance(parsed[0], dict):
+            parsed = parsed[0]
+            repairs.append("unwrapped")
+        if not isinstance(parsed, dict):
+            raise ResponseFormatError("Expected a JSON object in the AI response.")
+        analysis, coerced = validate_analysis(parsed)
+    except ResponseFormatError:
+        _stats["failures"] += 1
+        raise
+    _record(repairs, bool(coerced))
+    return analysis
+
+
+def parse_analysis_with_proposal(text: str) -> Dict:
+    """
+    Extracts a JOB_ANALYSIS_WITH_PROPOSAL_PROMPT answer: a valid analysis with a non-empty
+    proposal_text. A cut-off answer is rejected rather than repaired, since the cover letter
+    (the last field) would end mid-sentence.
+    """
+    _stats["responses"] += 1
+    try:
+        parsed, repairs = _load(text or "", "{")
+        if "truncated" in repairs:
+            raise ResponseFormatError("The response was cut off.")
+        if not isinstance(parsed, dict):
+            raise ResponseFormatError("Expected a JSON object in the AI response.")
+        analysis, coerced = validate_analysis(parsed)
+        proposal = analysis.get(PROPOSAL_FIELD)
+        if not isinstance(proposal, str) or not proposal.strip():
+            raise ResponseFormatError(f"The response has no {PROPOSAL_FIELD}.")
+    except ResponseFormatError:
+        _stats["failures"] += 1
+        raise
+    _record(repairs, bool(coerced))
+    analysis[PROPOSAL_FIELD] = proposal.strip()
+    return analysis
+
+
+def parse_score(text: str) -> Dict:
+    """
+    Extracts a JOB_SCORE_PROMPT answer: the score and the one-line analysis_summary ("" if missing).
+    Other fields are ignored.
+    """
+    _stats["responses"] += 1
+    try:
+        parsed, repairs = _load(text or "", "{")
+        if isinstance(parsed, list) and len(parsed) == 1 and isinstance(parsed[0], dict):
+            parsed = parsed[0]
+            repairs.append("unwrapped")
+        score = coerce_score(parsed.get(SCORE_FIELD)) if isinstance(parsed, dict) else None
+        if score is None:
+            raise ResponseFormatError(f"The response has no valid {SCORE_FIELD}.")
+    except ResponseFormatError:
+        _stats["failures"] += 1
+        raise
+    summary = parsed.get("analysis_summary")
+    _record(repairs, score != parsed[SCORE_FIELD] or not isinstance(summary, str))
+    return {SCORE_FIELD: score, "analysis_summary": summary if isinstance(summary, str) else ""}
+
+
+def parse_analyses(text: str) -> List[Dict]:
+    """
+    Extracts, repairs and validates the analyses of a packed response. Items that fail validation
+    are dropped (their jobs fall back to single-job calls); raises ResponseFormatError if no array
+    of analyses can be found.
+    """
+    _stats["responses"] += 1
+    try:
+        parsed, repairs = _load(text or "", "[")
+        if isinstance(parsed, dict):
+            # {"analyses": [...]} or a lone analysis object.
+            lists = [value for value in parsed.values() if isinstance(value, list)]
+            parsed = [parsed] if SCORE_FIELD in parsed else lists[0] if len(lists) == 1 else None
+            repairs.append("unwrapped")
+        if not isinstance(parsed, list):
+            raise ResponseFormatError("Expected a JSON array of analyses in the AI response.")
+    except ResponseFormatError:
+        _stats["failures"] += 1
+        raise
+    if "truncated_item" in repairs and parsed:
+        # The cut fell inside the last item, so it is closed but incomplete: its job is analyzed on its own instead.
+        parsed = parsed[:-1]
+        _stats["dropped_items"] += 1
+
+    analyses, coerced = [], False
+    for item in parsed:
+        try:
+            analysis, coerced_fields = validate_analysis(item if isinstance(item, dict) else {})
+        except ResponseFormatError:
+            _stats["dropped_items"] += 1
+            continue
+        analyses.append(analysis)
+        coerced = coerced or bool(coerced_fields)
+    _record(repairs, coerced)
+    return analyses
+
+
+async def parse_or_reask(request: Callable[[bool], Awaitable[str]], parse: Callable[[str], Any], description: str):
+    """
+    Parses the text returned by `request(False)`. Only if nothing usable can be recovered from it
+    is the model asked again, once, with `request(True)` (which should add prompts.JSON_REASK_NOTE).
+    """
+    text = await request(False)
+    try:
+        return parse(text)
+    except ResponseFormatError as e:
+        _stats["reasks"] += 1
+        logger.warning(f"Unusable AI response for {description} ({e}); asking again. Response: {text[:500]!r}")
+    return parse(await request(True))
+
+
+def get_stats() -> Dict:
+    return {**_stats, "repairs": dict(_repairs)}
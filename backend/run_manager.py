@@ -0,0 +1,255 @@
+# backend/run_manager.py
+import asyncio
+import json
+import logging
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Set
+
+from . import bulk_analyzer, local_profile_storage, run_storage
+
+logger = logging.getLogger(__name__)
+
+ACTIVE_STATUSES = ("queued", "running")
+# While a run streams, its checkpoint is rewritten at most every CHECKPOINT_EVERY_EVENTS events or
+# CHECKPOINT_INTERVAL_SECONDS, whichever comes first, and once more when it ends.
+CHECKPOINT_EVERY_EVENTS = 25
+CHECKPOINT_INTERVAL_SECONDS = 5.0
+# Finished runs are deleted once older than this, and beyond the newest MAX_FINISHED_RUNS.
+RUN_RETENTION_SECONDS = 7 * 24 * 60 * 60
+MAX_FINISHED_RUNS = 50
+
+_runs: Dict[str, dict] = {}
+_running_tasks: Dict[str, asyncio.Task] = {}
+_cancel_requested: Set[str] = set()
+_queue: Optional[asyncio.Queue] = None
+_worker_task: Optional[asyncio.Task] = None
+# Encrypting and writing checkpoints happens off the event loop, on one thread so writes (and
+# deletions) of a run's file land in the order they were issued.
+_storage_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="run-storage")
+
+
+def job_key(job: dict) -> str:
+    """Stable identifier for a job inside a run, used to track per-job completion."""
+    return str(job.get('id') or job.get('title'))
+
+
+def _summarize(run: dict, include_results: bool = False) -> dict:
+    summary = {
+        "run_id": run["run_id"],
+        "status": run["status"],
+        "mode": run["mode"],
+        "created_at": run["created_at"],
+        "updated_at": run["updated_at"],
+        "progress": {
+            "total": len(run["jobs"]),
+            "completed": len(run["results"]) + len(run["errors"]) + len(run["rejected"]) + len(run["skipped"]),
+            "succeeded": len(run["results"]),
+            "failed": len(run["errors"]),
+            "rejected": len(run["rejected"]),
+            "skipped": len(run["skipped"]),
+        },
+        "stats": run["stats"],
+        "error": run["error"],
+    }
+    if include_results:
+        summary["results"] = sorted(
+            [res for res in run["results"].values() if res.get('suitability_score') is not None],
+            key=lambda x: x['suitability_score'],
+            reverse=True
+        )
+        summary["errors"] = run["errors"]
+        summary["rejected"] = list(run["rejected"].values())
+        summary["skipped"] = list(run["skipped"].values())
+    return summary
+
+
+def _log_storage_error(future: asyncio.Future):
+    if not future.cancelled() and future.exception() is not None:
+        logger.error(f"Run checkpoint write failed: {future.exception()}")
+
+
+def _checkpoint(run: dict) -> asyncio.Future:
+    """
+    Snapshots the run and writes it in the background. Await the returned future to wait for the
+    write; callers that don't still get their writes applied in order.
+    """
+    run["updated_at"] = time.time()
+    data = json.dumps(run).encode('utf-8')  # Serialized here, since the run keeps changing on the loop.
+    future = asyncio.get_running_loop().run_in_executor(_storage_executor, run_storage.write_run, run["run_id"], data)
+    future.add_done_callback(_log_storage_error)
+    return future
+
+
+def _prune_finished_runs():
+    """Forgets finished runs past RUN_RETENTION_SECONDS or beyond the newest MAX_FINISHED_RUNS."""
+    finished = sorted((run for run in _runs.values() if run["status"] not in ACTIVE_STATUSES),
+                      key=lambda run: run["updated_at"], reverse=True)
+    cutoff = time.time() - RUN_RETENTION_SECONDS
+    expired = [run for index, run in enumerate(finished) if index >= MAX_FINISHED_RUNS or run["updated_at"] < cutoff]
+    for run in expired:
+        del _runs[run["run_id"]]
+        asyncio.get_running_loop().run_in_executor(_storage_executor, run_storage.delete_run, run["run_id"])
+    if expired:
+        logger.info(f"Deleted {len(expired)} finished bulk runs past retention.")
+
+
+async def start():
+    """
+    Starts the queue worker and re-enqueues runs that were queued or running when the backend stopped.
+    """
+    global _queue, _worker_task
+    _queue = asyncio.Queue()
+    _worker_task = asyncio.create_task(_worker())
+
+    for run in run_storage.list_runs():
+        run.setdefault("prefilter", None)
+        run.setdefault("rejected", {})
+        run.setdefault("prerank", None)
+        run.setdefault("skipped", {})
+        run.setdefault("budget", None)
+        run.setdefault("mode", "full")
+        run.setdefault("usage", None)
+        _runs[run["run_id"]] = run
+        if run["status"] in ACTIVE_STATUSES:
+            logger.info(f"Resuming bulk run {run['run_id']} ({len(run['results'])}/{len(run['jobs'])} jobs already analyzed).")
+            run["status"] = "queued"
+            _queue.put_nowait(run["run_id"])
+    _prune_finished_runs()
+
+
+def submit_run(jobs: List[dict], profile_data: dict, prefilter: Optional[dict] = None,
+               prerank: Optional[dict] = None, budget: Optional[dict] = None, mode: str = "full") -> dict:
+    """
+    Checkpoints a new run and queues it for background analysis. Returns immediately.
+    """
+    now = time.time()
+    run = {
+        "run_id": uuid.uuid4().hex,
+        "status": "queued",
+        "created_at": now,
+        "updated_at": now,
+        "jobs": jobs,
+        "profile": profile_data,
+        "prefilter": prefilter,
+        "prerank": prerank,
+        "budget": budget,
+        "mode": mode,
+        "usage": None,
+        "results": {},
+        "errors": {},
+        "rejected": {},
+        "skipped": {},
+        "stats": None,
+        "error": None,
+    }
+    _runs[run["run_id"]] = run
+    _checkpoint(run)
+    _queue.put_nowait(run["run_id"])
+    logger.info(f"Queued bulk run {run['run_id']} with {len(jobs)} jobs.")
+    return _summarize(run)
+
+
+def get_run(run_id: str) -> Optional[dict]:
+    """Returns the run's progress and its partial (or final) ranked results."""
+    run = _runs.get(run_id)
+    return _summarize(run, include_results=True) if run else None
+
+
+def cancel_run(run_id: str) -> Optional[dict]:
+    """Cancels a queued or running run. Finished runs are returned unchanged."""
+    run = _runs.get(run_id)
+    if run is None:
+        return None
+    if run["status"] == "queued":
+        run["status"] = "cancelled"
+        _checkpoint(run)
+    elif run["status"] == "running" and run_id in _running_tasks:
+        _cancel_requested.add(run_id)
+        _running_tasks[run_id].cancel()
+    return _summarize(run)
+
+
+async def _worker():
+    while True:
+        run_id = await _queue.get()
+        run = _runs.get(run_id)
+        if run is None or run["status"] != "queued":
+            continue
+        task = asyncio.create_task(_execute(run))
+        _running_tasks[run_id] = task
+        try:
+            await task
+        finally:
+            _running_tasks.pop(run_id, None)
+            _cancel_requested.discard(run_id)
+        _prune_finished_runs()
+
+
+def _remaining_prerank(run: dict) -> Optional[dict]:
+    """run["prerank"] for the jobs still pending: top_k covers the whole run, so analyzed jobs use up places."""
+    prerank = run["prerank"]
+    if not prerank or prerank.get("top_k") is None:
+        return prerank
+    return {**prerank, "top_k": max(0, prerank["top_k"] - len(run["results"]))}
+
+
+async def _execute(run: dict):
+    run_id = run["run_id"]
+    run["status"] = "running"
+    ledger = None
+    try:
+        await _checkpoint(run)
+        local_profile = local_profile_storage.read_local_profile()
+        api_config = local_profile.get("api_config", {"provider": "google"})
+        # A resumed run only sends the jobs without an outcome yet; failed ones are retried.
+        finished = run["results"].keys() | run["rejected"].keys() | run["skipped"].keys()
+        pending_jobs = [job for job in run["jobs"] if job_key(job) not in finished]
+        run["errors"] = {}
+        # Spending carries over between resumes, so cancelling and resuming can't exceed the budget.
+        ledger = bulk_analyzer.new_ledger(api_config, run["budget"], run["usage"])
+        logger.info(f"Running bulk run {run_id}: {len(pending_jobs)} of {len(run['jobs'])} jobs left to analyze.")
+
+        unsaved_events, saved_at = 0, time.monotonic()
+        async for event in bulk_analyzer.stream_multiple_jobs(pending_jobs, run["profile"], api_config,
+                                                              prefilter=run["prefilter"], prerank=_remaining_prerank(run),
+                                                              budget=run["budget"], mode=run["mode"], ledger=ledger):
+            if event["event"] == "result":
+                run["results"][job_key(event["analysis"]["job_data"])] = event["analysis"]
+            elif event["event"] == "rejected":
+                run["rejected"][job_key(event["job_data"])] = {"job_data": event["job_data"], "reasons": event["reasons"]}
+            elif event["event"] == "skipped":
+                run["skipped"][job_key(event["job_data"])] = {
+                    "job_data": event["job_data"], "local_score": event["local_score"], "reason": event["reason"]
+                }
+            elif event["event"] == "error":
+                run["errors"][str(event.get("job_id") or event.get("title"))] = event["error"]
+            elif event["event"] == "done":
+                run["stats"] = event["stats"]
+            unsaved_events += 1
+            if unsaved_events >= CHECKPOINT_EVERY_EVENTS or time.monotonic() - saved_at >= CHECKPOINT_INTERVAL_SECONDS:
+                run["usage"] = ledger.summary()
+                await _checkpoint(run)
+                unsaved_events, saved_at = 0, time.monotonic()
+        run["status"] = "completed"
+    except asyncio.CancelledError:
+        if run_id not in _cancel_requested:
+            # Backend is shutting down: save progress but leave the checkpoint "running" so the run resumes on restart.
+            if ledger is not None:
+                run["usage"] = ledger.summary()
+            _checkpoint(run)
+            raise
+        logger.info(f"Bulk run {run_id} cancelled after {len(run['results'])} jobs.")
+        run["status"] = "cancelled"
+    except Exception as e:
+        logger.error(f"Bulk run {run_id} failed: {e}", exc_info=True)
+        run["status"] = "failed"
+        run["error"] = str(e)
+    if ledger is not None:
+        run["usage"] = ledger.summary()
+    try:
+        # Shielded: a shutdown landing here must not cancel the queued write and leave the run "running" on disk.
+        await asyncio.shield(_checkpoint(run))
+    except Exception:
+        pass  # Already logged; the run's state stays available in memory.
@@ -0,0 +1,78 @@
+import os
+import json
+import logging
+from typing import List, Optional
+from . import encryption
+
+logger = logging.getLogger(__name__)
+
+# Each bulk-analysis run is checkpointed to its own encrypted file, since it embeds the user's profile.
+STORAGE_DIR = os.path.dirname(__file__)
+RUNS_DIR = os.path.join(STORAGE_DIR, "runs")
+
+
+def _run_path(run_id: str) -> str:
+    return os.path.join(RUNS_DIR, f"{run_id}.json.encrypted")
+
+
+def save_run(run: dict):
+    """
+    Encrypts and writes a run checkpoint. The file is replaced atomically so a crash
+    mid-write never leaves a corrupt checkpoint behind.
+    """
+    write_run(run["run_id"], json.dumps(run).encode('utf-8'))
+
+
+def write_run(run_id: str, data: bytes):
+    """Encrypts and atomically writes an already serialized run checkpoint."""
+    os.makedirs(RUNS_DIR, exist_ok=True)
+    path = _run_path(run_id)
+    tmp_path = f"{path}.tmp"
+    try:
+        encrypted_data = encryption.encrypt_data(data)
+        with open(tmp_path, "wb") as f:
+            f.write(encrypted_data)
+        os.replace(tmp_path, path)
+    except Exception as e:
+        logger.error(f"Failed to write checkpoint for run {run_id}: {e}", exc_info=True)
+        raise
+
+
+def delete_run(run_id: str):
+    """Removes a run checkpoint, if it exists."""
+    try:
+        os.remove(_run_path(run_id))
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        logger.error(f"Failed to delete checkpoint for run {run_id}: {e}", exc_info=True)
+
+
+def load_run(run_id: str) -> Optional[dict]:
+    """
+    Reads and decrypts a run checkpoint. Returns None if it doesn't exist or can't be read.
+    """
+    path = _run_path(run_id)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "rb") as f:
+            return json.loads(encryption.decrypt_data(f.read()).decode('utf-8'))
+    except Exception as e:
+        logger.error(f"Failed to read checkpoint for run {run_id}: {e}", exc_info=True)
+        return None
+
+
+def list_runs() -> List[dict]:
+    """
+    Loads every readable run checkpoint.
+    """
+    if not os.path.isdir(RUNS_DIR):
+        return []
+    runs = []
+    for filename in sorted(os.listdir(RUNS_DIR)):
+        if filename.endswith(".json.encrypted"):
+            run = load_run(filename[:-len(".json.encrypted")])
+            if run is not None:
+                runs.append(run)
+    return runs
@@ -0,0 +1,90 @@
+# backend/scheduler.py
+import logging
+from typing import AsyncIterator, Awaitable, Callable, Dict, Optional
+
+from . import prompts, rate_limiter, resilience
+
+logger = logging.getLogger(__name__)
+
+INTERACTIVE = "interactive"  # /jobs/analyze and /proposals/generate: someone is waiting on the result.
+BULK = "bulk"  # /jobs/analyze-all, its stream and background runs.
+SPECULATIVE = "speculative"  # Work nobody asked for yet (proposal pre-generation); idle capacity only.
+
+ANALYSIS_OUTPUT_TOKENS = 600  # Typical size of a JOB_ANALYSIS_PROMPT response, reserved against the TPM budget.
+PROPOSAL_OUTPUT_TOKENS = 800  # Typical cover letter length.
+SCORE_OUTPUT_TOKENS = 60  # A JOB_SCORE_PROMPT answer: score and one-line summary.
+ANALYSIS_WITH_PROPOSAL_OUTPUT_TOKENS = ANALYSIS_OUTPUT_TOKENS + PROPOSAL_OUTPUT_TOKENS
+
+
+def estimate_prompt_tokens(prompt_template: str, output_tokens: int, api_config: Optional[Dict] = None, **fields) -> int:
+    """
+    Estimated input + output tokens of a prompt filled with the serialized fields, with job
+    descriptions truncated to api_config's description budget as the providers send them.
+    """
+    prompt = prompts.format_prompt(prompt_template, prompts.description_budget(api_config), **fields)
+    return rate_limiter.estimate_tokens(prompt) + output_tokens
+
+
+async def scheduled_call(provider: str, api_config: Dict, call: Callable[[], Awaitable], description: str,
+                         priority: str, estimated_tokens: int, counters: Optional[Dict] = None):
+    """
+    Runs a provider call through the provider's shared rate limiter in the given priority class.
+    Transient failures are retried with backoff by the resilience layer, and every attempt
+    queues for its own slot.
+    """
+    limiter = rate_limiter.get_rate_limiter(provider, api_config)
+
+    async def attempt():
+        await limiter.acquire(estimated_tokens, priority)
+        throttled = False
+        try:
+            return await call()
+        except Exception as e:
+            throttled = resilience.is_throttled(e)
+            raise
+        finally:
+            limiter.release(throttled=throttled)
+
+    return await resilience.call_with_retry(provider, attempt, description, counters)
+
+
+async def scheduled_stream(provider: str, api_config: Dict, open_stream: Callable[[], AsyncIterator[str]], description: str,
+                           priority: str, estimated_tokens: int) -> AsyncIterator[str]:
+    """
+    Streaming counterpart of scheduled_call: one rate-limiter slot is held for the whole stream.
+    Failures before the first chunk are retried like scheduled_call; once text has been relayed
+    the stream can't be restarted, so later errors are raised to the consumer.
+    """
+    limiter = rate_limiter.get_rate_limiter(provider, api_config)
+
+    async def first_chunk():
+        await limiter.acquire(estimated_tokens, priority)
+        stream = open_stream()
+        try:
+            return stream, await stream.__anext__()
+        except StopAsyncIteration:
+            limiter.release()
+            await stream.aclose()
+            raise ValueError(f"{provider} returned an empty response.")
+        except BaseException as e:
+            limiter.release(throttled=resilience.is_throttled(e))
+            await stream.aclose()
+            raise
+
+    stream, chunk = await resilience.call_with_retry(provider, first_chunk, description)
+    throttled = False
+    try:
+        yield chunk
+        async for chunk in stream:
+            yield chunk
+    except Exception as e:
+        throttled = resilience.is_throttled(e)
+        raise
+    finally:
+        await stream.aclose()
+        limiter.release(throttled=throttled)
+
+
+def get_stats() -> Dict[str, Dict]:
+    """Concurrency window and per-priority queue-wait stats for every provider."""
+    return rate_limiter.get_snapshots()
@@ -0,0 +1,121 @@
+# backend/triage_cascade.py
+import logging
+from typing import Dict, List, Optional
+
+from . import ai_providers
+
+logger = logging.getLogger(__name__)
+
+# Two-stage bulk analysis, configured by api_config["cascade"]: a cheap model scores every job with
+# JOB_SCORE_PROMPT, and only jobs whose score falls in [band_min, band_max] get the full
+# JOB_ANALYSIS_PROMPT analysis from the stronger model. The others keep their triage score.
+DEFAULT_CASCADE = {
+    "enabled": False,
+    "triage_provider": None,  # Defaults to api_config["provider"].
+    "triage_model": None,  # Defaults to the provider's TRIAGE_MODEL_ID.
+    "full_provider": None,  # Defaults to api_config["provider"].
+    "full_model": None,  # Defaults to api_config["models"][provider], then the provider's MODEL_ID.
+    "band_min": 40,  # Below: a clear reject, not worth a full analysis.
+    "band_max": 100,  # Above: a clear fit. Lower it to skip the full analysis of obvious matches too.
+}
+
+
+def resolve_cascade(api_config: Dict) -> Optional[Dict]:
+    """api_config["cascade"] merged over DEFAULT_CASCADE, or None if the cascade is off."""
+    cascade = dict(DEFAULT_CASCADE)
+    cascade.update({k: v for k, v in (api_config.get("cascade") or {}).items() if v is not None})
+    if not cascade["enabled"]:
+        return None
+    primary = api_config.get("provider", "google")
+    for stage in ("triage", "full"):
+        cascade[f"{stage}_provider"] = cascade[f"{stage}_provider"] or primary
+        if cascade[f"{stage}_provider"] not in ai_providers.PROVIDERS:
+            logger.warning(f"Unsupported {stage} provider '{cascade[f'{stage}_provider']}'; triage cascade disabled.")
+            return None
+    return cascade
+
+
+def stage_config(api_config: Dict, cascade: Dict, stage: str) -> Dict:
+    """
+    The api_config a stage's calls run with: the stage's provider, and its model selected through
+    api_config["models"]. Without a triage_model, every provider triages with its TRIAGE_MODEL_ID,
+    so a failover of the triage call doesn't land on a full-size model.
+    """
+    provider = cascade[f"{stage}_provider"]
+    models = dict(api_config.get("models") or {})
+    if stage == "triage":
+        models.update({name: api.TRIAGE_MODEL_ID for name, api in ai_providers.PROVIDER_APIS.items()})
+    if cascade[f"{stage}_model"]:
+        models[provider] = cascade[f"{stage}_model"]
+    return {**api_config, "provider": provider, "models": models}
+
+
+def _latency(samples: List[float]) -> Dict:
+    if not samples:
+        return {"calls": 0, "mean_seconds": None, "p95_seconds": None}
+    ordered = sorted(samples)
+    return {
+        "calls": len(ordered),
+        "mean_seconds": round(sum(ordered) / len(ordered), 3),
+        "p95_seconds": round(ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))], 3),
+    }
+
+
+class CascadeRun:
+    """The two stage configs of one bulk run, the band, and how many jobs each stage handled."""
+
+    def __init__(self, api_config: Dict, cascade: Dict):
+        self.triage_config = stage_config(api_config, cascade, "triage")
+        self.full_config = stage_config(api_config, cascade, "full")
+        self.band_min = float(cascade["band_min"])
+        self.band_max = float(cascade["band_max"])
+        self.counters = {"triaged": 0, "triage_failed": 0, "below_band": 0, "above_band": 0, "escalated": 0}
+        self._latencies: Dict[str, List[float]] = {"triage": [], "full": []}
+
+    def escalates(self, score: float) -> bool:
+        """Records a triage score and tells whether the job goes on to the full analysis."""
+        self.counters["triaged"] += 1
+        if score < self.band_min:
+            self.counters["below_band"] += 1
+            return False
+        if score > self.band_max:
+            self.counters["above_band"] += 1
+            return False
+        self.counters["escalated"] += 1
+        return True
+
+    def triage_failed(self):
+        """A job whose triage call failed is escalated rather than dropped."""
+        self.counters["triage_failed"] += 1
+        self.counters["escalated"] += 1
+
+    def record_latency(self, stage: str, seconds: float):
+        self._latencies[stage].append(seconds)
+
+    def triage_result(self, triage: Dict) -> Dict:
+        """The analysis reported for a job that stopped at the triage stage: score and one-line summary."""
+        score = triage["suitability_score"]
+        return {
+            "suitability_score": score,
+            "analysis_summary": triage.get("analysis_summary") or "",
+            "strengths": [],
+            "weaknesses": [],
+            "proposal_suggestions": [],
+            "cascade": {"stage": "triage", "triage_score": score},
+        }
+
+    def summary(self) -> Dict:
+        triage_provider, full_provider = self.triage_config["provider"], self.full_config["provider"]
+        triaged = self.counters["triaged"] + self.counters["triage_failed"]
+        return {
+            "triage_provider": triage_provider,
+            "triage_model": ai_providers.model_id(triage_provider, self.triage_config),
+            "full_provider": full_provider,
+            "full_model": ai_providers.model_id(full_provider, self.full_config),
+            "band": [self.band_min, self.band_max],
+            **self.counters,
+            "escalation_rate": round(self.counters["escalated"] / triaged, 3) if triaged else 0.0,
+            "triage_latency": _latency(self._latencies["triage"]),
+            "full_latency": _latency(self._latencies["full"]),
+        }
+
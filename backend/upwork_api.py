@@ -11,6 +11,7 @@ from dotenv import load_dotenv
 from functools import lru_cache
 import asyncio
 from typing import List, Optional
+from . import job_dedup
 
 # --- Load environment variables (Unchanged) ---
 DOTENV_PATH = os.path.join(os.path.dirname(__file__), '..', '.env')
@@ -285,7 +286,8 @@ async def search_upwork_jobs_gql(
     try:
         client.epoint = "graphql"
         client.set_org_uid_header(tenant_id)
-        gql_response = client.post("", {"query": gql_query, "variables": variables})
+        # Off the event loop, so analyses already in flight keep going while a page is fetched.
+        gql_response = await asyncio.to_thread(client.post, "", {"query": gql_query, "variables": variables})
 
         logger.debug(f"Raw GraphQL response (Anna's Fix Test): {json.dumps(gql_response, indent=2)}")
 
@@ -362,13 +364,18 @@ async def search_upwork_jobs_gql(
                           "total_reviews": client_details.get('totalReviews')
                      }
                  }
+                job["fingerprint"] = job_dedup.fingerprint(job)
                 transformed_jobs.append(job)
                 
 
 
+        # Reposts and near-identical postings are returned once, with the others listed under "duplicates".
+        transformed_jobs, duplicates_collapsed = job_dedup.dedupe_search_results(transformed_jobs)
+
         paging_info = { "total": search_results.get('totalCount'),
                         "next_cursor": search_results.get('pageInfo', {}).get('endCursor'),
-                        "has_next_page": search_results.get('pageInfo', {}).get('hasNextPage'), }
+                        "has_next_page": search_results.get('pageInfo', {}).get('hasNextPage'),
+                        "duplicates_collapsed": duplicates_collapsed, }
         final_result = {"jobs": transformed_jobs, "paging": paging_info}
         logger.info(f"Found jobs via GQL (Anna's Fix Test): {len(transformed_jobs)} (Total matching query: {paging_info.get('total')})")
         return final_result
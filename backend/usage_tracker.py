@@ -0,0 +1,238 @@
+# backend/usage_tracker.py
+import contextvars
+import datetime
+import logging
+import os
+import sqlite3
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+USAGE_PATH = os.path.join(os.path.dirname(__file__), "usage.sqlite3")
+
+# USD per million tokens. api_config["price_table"] overrides entries per model ID.
+# cached_input_per_million prices input tokens served from the provider's context cache, and
+# cache_storage_per_million_hour the time Gemini keeps a run's cached content.
+DEFAULT_PRICE_TABLE = {
+    "gemini-2.5-flash": {"input_per_million": 0.30, "output_per_million": 2.50, "cached_input_per_million": 0.075,
+                         "cache_storage_per_million_hour": 1.00},
+    "us.amazon.nova-lite-v1:0": {"input_per_million": 0.06, "output_per_million": 0.24, "cached_input_per_million": 0.015},
+    # Default triage models of a cascade (see triage_cascade).
+    "gemini-2.5-flash-lite": {"input_per_million": 0.10, "output_per_million": 0.40, "cached_input_per_million": 0.025,
+                              "cache_storage_per_million_hour": 1.00},
+    "us.amazon.nova-micro-v1:0": {"input_per_million": 0.035, "output_per_million": 0.14, "cached_input_per_million": 0.00875},
+}
+
+_connection: Optional[sqlite3.Connection] = None
+_current_ledger: contextvars.ContextVar = contextvars.ContextVar("usage_ledger", default=None)
+
+
+class BudgetExceededError(Exception):
+    """
+    Raised instead of making a call that would take a run over its token or cost budget.
+    Deliberately not a ConnectionError/ValueError, so it is never retried or failed over.
+    """
+
+
+def resolve_price_table(api_config: Optional[Dict] = None) -> Dict[str, Dict[str, float]]:
+    prices = {model_id: dict(price) for model_id, price in DEFAULT_PRICE_TABLE.items()}
+    for model_id, price in ((api_config or {}).get("price_table") or {}).items():
+        prices.setdefault(model_id, {"input_per_million": 0.0, "output_per_million": 0.0})
+        prices[model_id].update({k: v for k, v in price.items() if v is not None})
+    return prices
+
+
+def compute_cost(prices: Dict[str, Dict[str, float]], model_id: str, input_tokens: int, output_tokens: int,
+                 cached_input_tokens: int = 0) -> float:
+    """Cost of a call; `input_tokens` includes the `cached_input_tokens` read from a context cache."""
+    price = prices.get(model_id)
+    if price is None:
+        return 0.0
+    cached_price = price.get("cached_input_per_million")
+    if cached_price is None:
+        cached_price = price["input_per_million"]
+    return ((input_tokens - cached_input_tokens) * price["input_per_million"] + cached_input_tokens * cached_price
+            + output_tokens * price["output_per_million"]) / 1_000_000
+
+
+class UsageLedger:
+    """
+    Token and cost totals of a single bulk run, with an optional max_tokens / max_cost budget.
+    Calls reserve their estimated usage before they start, so concurrent calls can't jointly overshoot.
+    """
+
+    def __init__(self, prices: Dict[str, Dict[str, float]], max_tokens: Optional[int] = None,
+                 max_cost: Optional[float] = None):
+        self.prices = prices
+        self.max_tokens = max_tokens
+        self.max_cost = max_cost
+        self.calls = 0
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self.cached_input_tokens = 0
+        self.cost = 0.0
+        self.storage_cost = 0.0  # Context cache storage; included in cost.
+        self.by_model: Dict[str, Dict] = {}
+        self.exhausted = False
+        self._reserved_tokens = 0
+        self._reserved_cost = 0.0
+
+    def add(self, model_id: str, input_tokens: int, output_tokens: int, cached_input_tokens: int = 0):
+        cost = compute_cost(self.prices, model_id, input_tokens, output_tokens, cached_input_tokens)
+        self.calls += 1
+        self.input_tokens += input_tokens
+        self.output_tokens += output_tokens
+        self.cached_input_tokens += cached_input_tokens
+        self.cost += cost
+        model = self.by_model.setdefault(model_id, {"calls": 0, "input_tokens": 0, "output_tokens": 0,
+                                                    "cached_input_tokens": 0, "cost": 0.0})
+        model["calls"] += 1
+        model["input_tokens"] += input_tokens
+        model["output_tokens"] += output_tokens
+        model["cached_input_tokens"] += cached_input_tokens
+        model["cost"] += cost
+
+    def restore(self, usage: Optional[Dict]):
+        """Carries on from an earlier summary() of the same run, so a resumed run keeps its budget."""
+        if not usage:
+            return
+        self.calls = usage["calls"]
+        self.input_tokens = usage["input_tokens"]
+        self.output_tokens = usage["output_tokens"]
+        self.cached_input_tokens = usage["cached_input_tokens"]
+        self.cost = usage["cost"]
+        self.storage_cost = usage.get("storage_cost", 0.0)
+        self.by_model = {model_id: dict(model) for model_id, model in usage["by_model"].items()}
+
+    def add_storage(self, model_id: str, token_hours: float):
+        """Charges `token_hours` of context cache storage (tokens stored x hours kept) for `model_id`."""
+        price = self.prices.get(model_id, {}).get("cache_storage_per_million_hour") or 0.0
+        cost = token_hours * price / 1_000_000
+        self.storage_cost += cost
+        self.cost += cost
+        model = self.by_model.setdefault(model_id, {"calls": 0, "input_tokens": 0, "output_tokens": 0,
+                                                    "cached_input_tokens": 0, "cost": 0.0})
+        model["cost"] += cost
+
+    @contextmanager
+    def reservation(self, model_id: str, input_tokens: int, output_tokens: int):
+        """
+        Holds the estimated usage of one call against the budget while it runs.
+        Raises BudgetExceededError if the call would exceed it.
+        """
+        tokens = input_tokens + output_tokens
+        cost = compute_cost(self.prices, model_id, input_tokens, output_tokens)
+        over_tokens = self.max_tokens is not None and \
+            self.input_tokens + self.output_tokens + self._reserved_tokens + tokens > self.max_tokens
+        over_cost = self.max_cost is not None and self.cost + self._reserved_cost + cost > self.max_cost
+        if over_tokens or over_cost:
+            if not self.exhausted:
+                logger.info(f"Run budget reached ({self.input_tokens + self.output_tokens} tokens, ${self.cost:.4f}); "
+                            f"no further jobs will be sent.")
+            self.exhausted = True
+            raise BudgetExceededError("The run's token/cost budget would be exceeded.")
+        self._reserved_tokens += tokens
+        self._reserved_cost += cost
+        try:
+            yield
+        finally:
+            self._reserved_tokens -= tokens
+            self._reserved_cost -= cost
+
+    def summary(self) -> Dict:
+        return {
+            "calls": self.calls,
+            "input_tokens": self.input_tokens,
+            "output_tokens": self.output_tokens,
+            "cached_input_tokens": self.cached_input_tokens,
+            "cost": round(self.cost, 6),
+            "storage_cost": round(self.storage_cost, 6),
+            "by_model": {model_id: {**usage, "cost": round(usage["cost"], 6)} for model_id, usage in self.by_model.items()},
+            "budget": {
+                "max_tokens": self.max_tokens,
+                "max_cost": self.max_cost,
+                "exhausted": self.exhausted,
+            },
+        }
+
+
+def bind(ledger: Optional[UsageLedger]):
+    """Attributes provider calls made from the current task (and tasks it spawns) to `ledger`."""
+    _current_ledger.set(ledger)
+
+
+def current_ledger() -> Optional[UsageLedger]:
+    return _current_ledger.get()
+
+
+def _get_connection() -> sqlite3.Connection:
+    global _connection
+    if _connection is None:
+        _connection = sqlite3.connect(USAGE_PATH)
+        _connection.execute(
+            "CREATE TABLE IF NOT EXISTS daily_usage ("
+            "day TEXT NOT NULL, provider TEXT NOT NULL, model_id TEXT NOT NULL, calls INTEGER NOT NULL, "
+            "input_tokens INTEGER NOT NULL, output_tokens INTEGER NOT NULL, cached_input_tokens INTEGER NOT NULL DEFAULT 0, "
+            "PRIMARY KEY (day, provider, model_id))"
+        )
+        columns = {row[1] for row in _connection.execute("PRAGMA table_info(daily_usage)")}
+        if "cached_input_tokens" not in columns:
+            # Databases created before context caching was tracked.
+            _connection.execute("ALTER TABLE daily_usage ADD COLUMN cached_input_tokens INTEGER NOT NULL DEFAULT 0")
+        _connection.commit()
+    return _connection
+
+
+def record(provider: str, model_id: str, input_tokens: Optional[int], output_tokens: Optional[int],
+           cached_input_tokens: Optional[int] = 0):
+    """
+    Records the token usage a provider reported for one call, in the daily totals and in the
+    ledger of the run making the call (if any). `input_tokens` includes `cached_input_tokens`.
+    """
+    input_tokens, output_tokens = int(input_tokens or 0), int(output_tokens or 0)
+    cached_input_tokens = int(cached_input_tokens or 0)
+    ledger = _current_ledger.get()
+    if ledger is not None:
+        ledger.add(model_id, input_tokens, output_tokens, cached_input_tokens)
+    try:
+        conn = _get_connection()
+        conn.execute(
+            "INSERT INTO daily_usage (day, provider, model_id, calls, input_tokens, output_tokens, cached_input_tokens) "
+            "VALUES (?, ?, ?, 1, ?, ?, ?) "
+            "ON CONFLICT (day, provider, model_id) DO UPDATE SET calls = calls + 1, "
+            "input_tokens = input_tokens + excluded.input_tokens, output_tokens = output_tokens + excluded.output_tokens, "
+            "cached_input_tokens = cached_input_tokens + excluded.cached_input_tokens",
+            (datetime.date.today().isoformat(), provider, model_id, input_tokens, output_tokens, cached_input_tokens),
+        )
+        conn.commit()
+    except sqlite3.Error as e:
+        logger.error(f"Could not record token usage: {e}", exc_info=True)
+
+
+def get_daily_usage(api_config: Optional[Dict] = None, days: int = 30) -> List[Dict]:
+    """
+    Per-day token totals for the last `days` days, priced with the current price table.
+    """
+    prices = resolve_price_table(api_config)
+    since = (datetime.date.today() - datetime.timedelta(days=days - 1)).isoformat()
+    rows = _get_connection().execute(
+        "SELECT day, provider, model_id, calls, input_tokens, output_tokens, cached_input_tokens FROM daily_usage "
+        "WHERE day >= ? ORDER BY day DESC, provider, model_id",
+        (since,),
+    ).fetchall()
+    usage: Dict[str, Dict] = {}
+    for day, provider, model_id, calls, input_tokens, output_tokens, cached_input_tokens in rows:
+        cost = compute_cost(prices, model_id, input_tokens, output_tokens, cached_input_tokens)
+        entry = usage.setdefault(day, {"day": day, "calls": 0, "input_tokens": 0, "output_tokens": 0,
+                                       "cached_input_tokens": 0, "cost": 0.0, "by_model": {}})
+        entry["calls"] += calls
+        entry["input_tokens"] += input_tokens
+        entry["output_tokens"] += output_tokens
+        entry["cached_input_tokens"] += cached_input_tokens
+        entry["cost"] = round(entry["cost"] + cost, 6)
+        entry["by_model"][model_id] = {
+            "provider": provider, "calls": calls, "input_tokens": input_tokens, "output_tokens": output_tokens,
+            "cached_input_tokens": cached_input_tokens, "cost": round(cost, 6),
+        }
+    return list(usage.values())
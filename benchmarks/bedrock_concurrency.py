@@ -0,0 +1,114 @@
+# benchmarks/bedrock_concurrency.py
+"""
+Measures how many Bedrock analyses actually run at once, against a local stub of the
+bedrock-runtime Converse endpoint (no AWS account or network needed).
+
+    python -m benchmarks.bedrock_concurrency --requests 20 --latency 0.25
+
+"blocking" calls boto3's converse directly from the coroutines, the way bedrock_api did before
+it moved calls onto its thread pool; "thread pool" goes through bedrock_api itself.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from backend import bedrock_api, client_pool, usage_tracker  # noqa: E402
+
+ANALYSIS = {"suitability_score": 72, "analysis_summary": "Stub analysis.", "strengths": [], "weaknesses": []}
+
+
+def start_stub_server(latency: float) -> ThreadingHTTPServer:
+    """Serves POST /model/{model_id}/converse with a fixed analysis after `latency` seconds."""
+
+    class ConverseHandler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get('Content-Length', 0)))
+            time.sleep(latency)
+            body = json.dumps({
+                "output": {"message": {"role": "assistant", "content": [{"text": json.dumps(ANALYSIS)}]}},
+                "stopReason": "end_turn",
+                "usage": {"inputTokens": 900, "outputTokens": 300, "totalTokens": 1200},
+                "metrics": {"latencyMs": int(latency * 1000)},
+            }).encode('utf-8')
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), ConverseHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def make_jobs(count: int):
+    return [{"id": f"bench-{i}", "title": f"Benchmark job {i}", "snippet": "Build a FastAPI backend.", "client": {}}
+            for i in range(count)]
+
+
+async def run_blocking(api_config: dict, jobs: list) -> float:
+    client = client_pool.get_bedrock_client(api_config)
+
+    async def analyze(job):
+        messages = [{"role": "user", "content": [{"text": json.dumps(job)}]}]
+        return client.converse(modelId=bedrock_api.MODEL_ID, messages=messages)
+
+    started_at = time.perf_counter()
+    await asyncio.gather(*[analyze(job) for job in jobs])
+    return time.perf_counter() - started_at
+
+
+async def run_thread_pool(api_config: dict, jobs: list) -> float:
+    started_at = time.perf_counter()
+    # _request_job_analysis skips the analysis cache, so every job makes a request.
+    await asyncio.gather(*[bedrock_api._request_job_analysis(job, {}, api_config) for job in jobs])
+    return time.perf_counter() - started_at
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=20, help="concurrent analyses per run")
+    parser.add_argument("--latency", type=float, default=0.25, help="stub response time in seconds")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    usage_tracker.USAGE_PATH = os.path.join(tempfile.mkdtemp(), "usage.sqlite3")
+
+    server = start_stub_server(args.latency)
+    api_config = {
+        "provider": "aws",
+        "aws_region": "us-east-1",
+        "aws_access_key_id": "benchmark",
+        "aws_secret_access_key": "benchmark",
+        "bedrock_endpoint_url": f"http://127.0.0.1:{server.server_address[1]}",
+        "max_concurrency": args.requests,
+    }
+    jobs = make_jobs(args.requests)
+
+    # Warm up the pooled client so neither run pays for client creation.
+    await run_thread_pool(api_config, jobs[:1])
+
+    blocking = await run_blocking(api_config, jobs)
+    pooled = await run_thread_pool(api_config, jobs)
+    server.shutdown()
+
+    print(f"{args.requests} requests, {args.latency:.2f}s stub latency")
+    print(f"  blocking:    {blocking:6.2f}s  ({args.requests / blocking:6.1f} req/s)")
+    print(f"  thread pool: {pooled:6.2f}s  ({args.requests / pooled:6.1f} req/s)")
+    print(f"  speed-up:    {blocking / pooled:6.1f}x")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
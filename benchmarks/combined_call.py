@@ -0,0 +1,143 @@
+# benchmarks/combined_call.py
+"""
+Compares the two-call proposal flow (POST /jobs/analyze, then POST /proposals/generate with the
+returned analysis) with the single-call POST /jobs/analyze-and-propose, per job: end-to-end
+latency, provider calls and the input/output tokens the provider reported.
+
+    python -m benchmarks.combined_call
+    python -m benchmarks.combined_call --jobs 50 --concurrency 5 --latency 1.0 --json
+    python -m benchmarks.combined_call --provider google --jobs 5 --concurrency 1
+
+The offline fake provider (backend/fake_api.py) is the default; its token counts are estimated
+from the rendered prompts. --provider google / aws sends real requests with the API config saved
+in the local profile, which spends quota.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import time
+from typing import Dict, List
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from benchmarks.pipeline_throughput import make_jobs, percentile, prepare_environment, reset_provider_state  # noqa: E402
+from benchmarks.prompt_tokens import SAMPLE_PROFILE  # noqa: E402
+
+FLOWS = ("two-call", "combined")
+
+
+async def run_job(client, flow: str, job: Dict) -> Dict:
+    """Runs one job through a flow; returns its latency, calls and usage, or its error."""
+    from backend import usage_tracker
+    ledger = usage_tracker.UsageLedger({})
+    usage_tracker.bind(ledger)  # This task's copy of the context; the ASGI app runs within it.
+    started_at = time.perf_counter()
+    if flow == "combined":
+        response = await client.post("/jobs/analyze-and-propose", json={"job": job, "profile": SAMPLE_PROFILE})
+    else:
+        response = await client.post("/jobs/analyze", json={"job": job, "profile": SAMPLE_PROFILE})
+        if response.status_code == 200:
+            response = await client.post("/proposals/generate",
+                                         json={"job": job, "profile": SAMPLE_PROFILE, "analysis": response.json()})
+    if response.status_code != 200:
+        logging.warning(f"{flow} failed with {response.status_code}: {response.text[:200]}")
+        return {"error": response.status_code}
+    return {
+        "latency": time.perf_counter() - started_at,
+        "calls": ledger.calls,
+        "input_tokens": ledger.input_tokens,
+        "output_tokens": ledger.output_tokens,
+    }
+
+
+async def run_flow(flow: str, jobs: List[Dict], concurrency: int) -> Dict:
+    import httpx
+    from backend import main
+    reset_provider_state()
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://benchmark", timeout=None) as client:
+        async def bounded(job: Dict) -> Dict:
+            async with semaphore:
+                return await run_job(client, flow, job)
+
+        started_at = time.perf_counter()
+        results = await asyncio.gather(*[bounded(job) for job in jobs])
+        elapsed = time.perf_counter() - started_at
+
+    completed = [result for result in results if "error" not in result]
+    latencies = [result["latency"] for result in completed]
+
+    def per_job(field: str) -> float:
+        return round(sum(result[field] for result in completed) / len(completed), 1) if completed else 0.0
+
+    return {
+        "flow": flow,
+        "jobs": len(jobs),
+        "concurrency": concurrency,
+        "completed": len(completed),
+        "elapsed_seconds": round(elapsed, 3),
+        "p50_seconds": round(percentile(latencies, 0.50), 3),
+        "p95_seconds": round(percentile(latencies, 0.95), 3),
+        "calls_per_job": per_job("calls"),
+        "input_tokens_per_job": per_job("input_tokens"),
+        "output_tokens_per_job": per_job("output_tokens"),
+    }
+
+
+def reduction(before: float, after: float) -> str:
+    return f"{100 * (before - after) / before:.1f}%" if before else "n/a"
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--provider", default="fake", choices=("fake", "google", "aws"))
+    parser.add_argument("--jobs", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=5, help="jobs in flight at once")
+    parser.add_argument("--latency", type=float, default=1.0, help="fake provider: mean simulated call latency in seconds")
+    parser.add_argument("--distribution", default="lognormal", choices=("fixed", "uniform", "exponential", "lognormal"))
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--json", action="store_true", help="print one JSON object per flow instead of a table")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    if args.provider == "fake":
+        prepare_environment()
+        api_config = {
+            "provider": "fake",
+            "fake_provider": {"latency_distribution": args.distribution, "latency_mean_seconds": args.latency, "seed": args.seed},
+        }
+    else:
+        # The saved keys are decrypted with the real ENCRYPTION_KEY, so read them before
+        # prepare_environment, which would set a throwaway one.
+        from backend import local_profile_storage
+        api_config = {**local_profile_storage.read_local_profile().get("api_config", {}), "provider": args.provider}
+        prepare_environment()
+    from backend import local_profile_storage
+    local_profile_storage.read_local_profile = lambda: {"api_config": api_config}
+
+    results = []
+    for flow in FLOWS:
+        jobs = make_jobs(args.jobs, f"{flow}-{time.time_ns()}")
+        results.append(await run_flow(flow, jobs, args.concurrency))
+
+    if args.json:
+        for result in results:
+            print(json.dumps(result))
+        return
+    print(f"{args.provider} provider, {args.jobs} jobs, {args.concurrency} in flight")
+    print(f"{'flow':<10}{'done':>6}{'p50 s':>8}{'p95 s':>8}{'calls':>7}{'in tok':>9}{'out tok':>9}")
+    for result in results:
+        print(f"{result['flow']:<10}{result['completed']:>6}{result['p50_seconds']:>8}{result['p95_seconds']:>8}"
+              f"{result['calls_per_job']:>7}{result['input_tokens_per_job']:>9}{result['output_tokens_per_job']:>9}")
+    two_call, combined = results
+    print(f"combined vs two-call: p50 latency -{reduction(two_call['p50_seconds'], combined['p50_seconds'])}, "
+          f"input tokens -{reduction(two_call['input_tokens_per_job'], combined['input_tokens_per_job'])}, "
+          f"output tokens -{reduction(two_call['output_tokens_per_job'], combined['output_tokens_per_job'])}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
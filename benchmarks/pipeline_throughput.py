@@ -0,0 +1,197 @@
+# benchmarks/pipeline_throughput.py
+"""
+Throughput benchmark of the analysis pipeline against the offline fake provider (backend/fake_api.py),
+so it needs no API keys and spends no quota.
+
+    python -m benchmarks.pipeline_throughput
+    python -m benchmarks.pipeline_throughput --jobs 100,500 --concurrency 5,20 --latency 0.5 --error-rate 0.02
+    python -m benchmarks.pipeline_throughput --scenarios bulk --pack-size 10 --json
+
+Scenarios:
+  bulk      bulk_analyzer.stream_multiple_jobs (what analyze_multiple_jobs collects) over N jobs;
+            latency is each job's time to its result.
+  analyze   N concurrent POST /jobs/analyze requests; latency is per request.
+  proposal  N concurrent POST /proposals/generate requests; latency is per request.
+
+Each scenario runs at every job count x concurrency setting (max_concurrency for the rate limiter,
+in-flight requests for the endpoints) and reports jobs/sec, p50/p95/p99 latency and the peak
+Python heap traced by tracemalloc (which itself slows the run down a little).
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Dict, List
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from benchmarks.prompt_tokens import SAMPLE_PROFILE, synthetic_jobs  # noqa: E402
+
+SCENARIOS = ("bulk", "analyze", "proposal")
+
+
+def percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def make_jobs(count: int, run: str) -> List[Dict]:
+    """Synthetic jobs with IDs unique to the run, so no scenario is served from the analysis cache."""
+    jobs = synthetic_jobs(count)
+    for index, job in enumerate(jobs):
+        job["id"] = job["ciphertext"] = f"{run}-{index}"
+        job["title"] = f"{job['title']} ({run})"
+        for key in ("fingerprint", "cluster_id", "duplicates"):
+            job.pop(key, None)
+    return jobs
+
+
+def reset_provider_state():
+    """Fresh rate limiter window and circuit breaker for every scenario."""
+    from backend import rate_limiter, resilience
+    rate_limiter._limiters.pop("fake", None)
+    resilience._breakers.pop("fake", None)
+
+
+async def run_bulk(jobs: List[Dict], api_config: Dict, concurrency: int) -> List[float]:
+    from backend import bulk_analyzer
+    started_at = time.perf_counter()
+    latencies = []
+    async for event in bulk_analyzer.stream_multiple_jobs(jobs, SAMPLE_PROFILE, api_config, prefilter={"enabled": False}):
+        if event["event"] in ("result", "error"):
+            latencies.append(time.perf_counter() - started_at)
+    return latencies
+
+
+async def run_endpoint(path: str, payloads: List[Dict], concurrency: int) -> List[float]:
+    import httpx
+    from backend import main
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://benchmark", timeout=None) as client:
+        async def send(payload: Dict):
+            async with semaphore:
+                started_at = time.perf_counter()
+                response = await client.post(path, json=payload)
+                latencies.append(time.perf_counter() - started_at)
+                if response.status_code != 200:
+                    logging.warning(f"{path} returned {response.status_code}: {response.text[:200]}")
+
+        await asyncio.gather(*[send(payload) for payload in payloads])
+    return latencies
+
+
+async def run_scenario(scenario: str, jobs: List[Dict], api_config: Dict, concurrency: int) -> Dict:
+    reset_provider_state()
+    api_config = {**api_config, "max_concurrency": concurrency}
+    from backend import fake_api, local_profile_storage
+    local_profile_storage.read_local_profile = lambda: {"api_config": api_config}
+
+    tracemalloc.start()
+    started_at = time.perf_counter()
+    if scenario == "bulk":
+        latencies = await run_bulk(jobs, api_config, concurrency)
+    elif scenario == "analyze":
+        latencies = await run_endpoint("/jobs/analyze", [{"job": job, "profile": SAMPLE_PROFILE} for job in jobs], concurrency)
+    else:
+        payloads = [{"job": job, "profile": SAMPLE_PROFILE, "analysis": fake_api.fake_analysis(job, SAMPLE_PROFILE)}
+                    for job in jobs]
+        latencies = await run_endpoint("/proposals/generate", payloads, concurrency)
+    elapsed = time.perf_counter() - started_at
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "scenario": scenario,
+        "jobs": len(jobs),
+        "concurrency": concurrency,
+        "completed": len(latencies),
+        "elapsed_seconds": round(elapsed, 3),
+        "jobs_per_second": round(len(latencies) / elapsed, 2) if elapsed > 0 else 0.0,
+        "p50_seconds": round(percentile(latencies, 0.50), 3),
+        "p95_seconds": round(percentile(latencies, 0.95), 3),
+        "p99_seconds": round(percentile(latencies, 0.99), 3),
+        "peak_memory_mb": round(peak / 1024 / 1024, 2),
+    }
+
+
+def prepare_environment():
+    """Keeps the benchmark's cache and usage files out of backend/, and satisfies main's startup checks."""
+    workdir = tempfile.mkdtemp(prefix="pipeline-benchmark-")
+    for name in ("UPWORK_CLIENT_ID", "UPWORK_CLIENT_SECRET", "UPWORK_REDIRECT_URI"):
+        os.environ.setdefault(name, "benchmark")
+    if not os.environ.get("ENCRYPTION_KEY"):
+        from cryptography.fernet import Fernet
+        os.environ["ENCRYPTION_KEY"] = Fernet.generate_key().decode()
+
+    from backend import analysis_cache, usage_tracker
+    analysis_cache.CACHE_PATH = os.path.join(workdir, "analysis_cache.sqlite3")
+    usage_tracker.USAGE_PATH = os.path.join(workdir, "usage.sqlite3")
+
+
+def parse_list(value: str) -> List[int]:
+    return [int(item) for item in value.split(",") if item.strip()]
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="comma-separated subset of bulk,analyze,proposal")
+    parser.add_argument("--jobs", default="50,200", help="comma-separated job counts")
+    parser.add_argument("--concurrency", default="5,20", help="comma-separated concurrency settings")
+    parser.add_argument("--latency", type=float, default=0.2, help="mean simulated call latency in seconds")
+    parser.add_argument("--distribution", default="lognormal", choices=("fixed", "uniform", "exponential", "lognormal"))
+    parser.add_argument("--spread", type=float, default=0.5, help="lognormal sigma / uniform +- fraction")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of calls failing with a 503")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="share of calls rejected with a 429")
+    parser.add_argument("--malformed-rate", type=float, default=0.0, help="share of answers needing JSON repair")
+    parser.add_argument("--pack-size", type=int, default=1, help="bulk pack size (1 = one request per job)")
+    parser.add_argument("--rpm", type=int, default=None, help="rate limit for the fake provider (default: unlimited)")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--json", action="store_true", help="print one JSON object per result instead of a table")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    prepare_environment()
+
+    api_config = {
+        "provider": "fake",
+        "pack_size": args.pack_size,
+        "rate_limit_rpm": args.rpm,
+        "fake_provider": {
+            "latency_distribution": args.distribution,
+            "latency_mean_seconds": args.latency,
+            "latency_spread": args.spread,
+            "error_rate": args.error_rate,
+            "throttle_rate": args.throttle_rate,
+            "malformed_rate": args.malformed_rate,
+            "seed": args.seed,
+        },
+    }
+
+    if not args.json:
+        print(f"fake provider: {args.distribution} latency, mean {args.latency}s, "
+              f"{args.error_rate:.0%} errors, {args.throttle_rate:.0%} throttled")
+        print(f"{'scenario':<10}{'jobs':>6}{'conc':>6}{'jobs/s':>9}{'p50 s':>8}{'p95 s':>8}{'p99 s':>8}{'peak MB':>9}")
+    for scenario in [name for name in args.scenarios.split(",") if name in SCENARIOS]:
+        for count in parse_list(args.jobs):
+            for concurrency in parse_list(args.concurrency):
+                jobs = make_jobs(count, f"{scenario}-{count}-{concurrency}-{time.time_ns()}")
+                result = await run_scenario(scenario, jobs, api_config, concurrency)
+                if args.json:
+                    print(json.dumps(result))
+                else:
+                    print(f"{scenario:<10}{count:>6}{concurrency:>6}{result['jobs_per_second']:>9}"
+                          f"{result['p50_seconds']:>8}{result['p95_seconds']:>8}{result['p99_seconds']:>8}"
+                          f"{result['peak_memory_mb']:>9}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,112 @@
+# benchmarks/prompt_tokens.py
+"""
+Compares the estimated prompt size of job analyses rendered the old way (indented json.dumps of
+the raw job and profile) with the compact prompt serialization in backend/prompts.py.
+
+    python -m benchmarks.prompt_tokens
+    python -m benchmarks.prompt_tokens --jobs fetched_jobs.json --profile profile.json --pack-size 10
+
+--jobs takes a saved /jobs/fetch response (or a plain list of jobs), --profile the profile object
+the frontend sends ({"upwork_profile": ..., "local_additions": ...}). Without them, synthetic
+search results and a sample profile are used.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from backend import prompts  # noqa: E402
+
+SAMPLE_PROFILE = {
+    "upwork_profile": {
+        "fullName": "Sample Freelancer",
+        "personalData": {
+            "title": "Senior Python & FastAPI Developer",
+            "description": "Backend engineer with eight years of experience building APIs, data pipelines and "
+                           "integrations with payment providers. " * 3,
+        },
+        "employmentRecords": [
+            {"companyName": "Acme Corp", "description": "Built the billing platform.", "role": "Backend Lead",
+             "startDate": "2019-01-01", "endDate": None},
+            {"companyName": "Globex", "description": None, "role": "Python Developer",
+             "startDate": "2016-03-01", "endDate": "2018-12-31"},
+        ],
+        "skills": {"edges": [{"node": {"id": skill}} for skill in ("python", "fastapi", "postgresql", "aws", "docker")]},
+        "certificates": [],
+        "educationRecords": [{"degree": "BSc", "areaOfStudy": "Computer Science"}],
+    },
+    "local_additions": {
+        "location": "Lisbon, Portugal",
+        "additional_details": "",
+        "local_skills": ["Stripe", "Celery"],
+        "local_certificates": [],
+        "local_education": [],
+        "api_config": {"provider": "google", "google_api_key": "not-sent-to-the-model"},
+    },
+}
+
+_WORDS = ("build", "api", "python", "integration", "dashboard", "client", "data", "deploy", "tests", "stripe",
+          "react", "backend", "database", "scraper", "automation", "report", "cloud", "mobile", "design", "support")
+
+
+def synthetic_jobs(count: int, seed: int = 7):
+    """Jobs shaped like search_upwork_jobs_gql results, with descriptions of varying length."""
+    rng = random.Random(seed)
+    jobs = []
+    for i in range(count):
+        description = " ".join(rng.choice(_WORDS) for _ in range(rng.choice((60, 150, 400, 1500))))
+        jobs.append({
+            "title": f"Python developer needed for project {i}",
+            "id": f"~01{i:016x}",
+            "ciphertext": f"~01{i:016x}",
+            "url": f"https://www.upwork.com/jobs/~01{i:016x}",
+            "snippet": description,
+            "skills": rng.sample(_WORDS, 5),
+            "date_created": "2026-10-01T12:00:00Z",
+            "category2": "Web, Mobile & Software Dev",
+            "subcategory2": "Web Development",
+            "job_type": rng.choice(("HOURLY", "FIXED")),
+            "rate_display": "$40.00 - $80.00 /hr",
+            "workload": None,
+            "duration": None,
+            "client": {"country": "United States", "total_feedback": 4.9, "total_posted_jobs": 12,
+                       "total_hires": 8, "verification_status": "VERIFIED", "total_reviews": 7},
+            "fingerprint": "0" * 256,
+            "cluster_id": f"~01{i:016x}",
+            "duplicates": [],
+        })
+    return jobs
+
+
+def load_json(path: str):
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--jobs", help="saved /jobs/fetch response or JSON list of jobs")
+    parser.add_argument("--profile", help="profile JSON as sent by the frontend")
+    parser.add_argument("--count", type=int, default=50, help="number of synthetic jobs when --jobs is not given")
+    parser.add_argument("--pack-size", type=int, default=10)
+    parser.add_argument("--max-description-tokens", type=int, default=prompts.DEFAULT_MAX_DESCRIPTION_TOKENS,
+                        help="0 disables truncation")
+    args = parser.parse_args()
+
+    jobs = load_json(args.jobs) if args.jobs else synthetic_jobs(args.count)
+    if isinstance(jobs, dict):
+        jobs = jobs.get("jobs", [])
+    profile = load_json(args.profile) if args.profile else SAMPLE_PROFILE
+
+    report = prompts.size_report(jobs, profile, args.pack_size, args.max_description_tokens or None)
+    print(f"{len(jobs)} jobs, pack size {args.pack_size}, description budget {args.max_description_tokens or 'none'}")
+    print(f"{'mode':<8}{'requests':>10}{'old tokens':>12}{'new tokens':>12}{'saved':>10}")
+    for mode, entry in report.items():
+        print(f"{mode:<8}{entry['requests']:>10}{entry['old_tokens']:>12}{entry['new_tokens']:>12}{entry['saved_percent']:>9}%")
+
+
+if __name__ == "__main__":
+    main()
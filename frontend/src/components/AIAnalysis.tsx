@@ -3,7 +3,7 @@ import { Card, CardContent, CardHeader, CardTitle } from "@/components/ui/card";
 import { Progress } from "@/components/ui/progress";
 import { Brain, CheckCircle, AlertCircle, Star, Download, FileText, Loader2 } from "lucide-react";
 import { Button } from "./ui/button";
-import { Job, UserProfile as UserProfileType, generateProposal } from "../lib/api";
+import { Job, ProposalGenerationPayload, UserProfile as UserProfileType, streamProposal } from "../lib/api";
 import { useEffect, useState } from "react";
 import { useToast } from "@/hooks/use-toast";
 import { useMutation } from "@tanstack/react-query";
@@ -58,11 +58,18 @@ const LoadingAnimation = () => {
 export const AIAnalysis = ({ job, analysisData, isLoading, isError, error, onClose, userProfile }: AIAnalysisProps) => {
   const { toast } = useToast();
   const [generatedProposal, setGeneratedProposal] = useState<string | null>(null);
+  const [firstTokenSeconds, setFirstTokenSeconds] = useState<number | null>(null);
 
+  // The proposal dialog opens with the first streamed words and fills in as the rest arrives.
   const proposalMutation = useMutation({
-    mutationFn: generateProposal,
+    mutationFn: (payload: ProposalGenerationPayload) =>
+      streamProposal(payload, (text, meta) => {
+        setGeneratedProposal(text);
+        setFirstTokenSeconds(meta?.time_to_first_token_seconds ?? null);
+      }),
     onSuccess: (data) => {
       setGeneratedProposal(data.proposal_text);
+      setFirstTokenSeconds(data.time_to_first_token_seconds);
     },
     onError: (error) => {
       toast({
@@ -76,6 +83,8 @@ export const AIAnalysis = ({ job, analysisData, isLoading, isError, error, onClo
   const handleGenerateProposal = () => {
     if (!job || !userProfile || !analysisData) return;
 
+    setGeneratedProposal(null);
+    setFirstTokenSeconds(null);
     proposalMutation.mutate({
         job,
         profile: userProfile,
@@ -262,12 +271,17 @@ ${analysisData.analysis_summary}\n\n`;
           <DialogContent className="max-w-3xl">
               <DialogHeader>
                   <DialogTitle>Generated Proposal</DialogTitle>
+                  {firstTokenSeconds !== null && (
+                      <DialogDescription>
+                          {proposalMutation.isPending ? "Writing..." : "Done."} First words after {firstTokenSeconds.toFixed(1)}s.
+                      </DialogDescription>
+                  )}
               </DialogHeader>
               <div className="prose dark:prose-invert max-h-[60vh] overflow-y-auto p-1">
                   <p>{generatedProposal}</p>
               </div>
               <DialogFooter>
-                  <Button onClick={() => {
+                  <Button disabled={proposalMutation.isPending} onClick={() => {
                       navigator.clipboard.writeText(generatedProposal || "");
                       toast({ title: "Copied to clipboard!" });
                   }}>Copy</Button>
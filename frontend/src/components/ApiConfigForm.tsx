@@ -64,6 +64,7 @@ export const ApiConfigForm = () => {
             <SelectContent>
               <SelectItem value="google">Google Gemini</SelectItem>
               <SelectItem value="aws">AWS Bedrock</SelectItem>
+              <SelectItem value="fake">Fake (offline, for benchmarks)</SelectItem>
             </SelectContent>
           </Select>
         </div>
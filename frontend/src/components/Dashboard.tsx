@@ -11,7 +11,7 @@ import UserProfile from "./UserProfile";
 import { AIAnalysis } from "./AIAnalysis";
 import { AnalyzedJobs } from "./AnalyzedJobs";
 import { useQuery, useMutation, useQueryClient } from "@tanstack/react-query";
-import { fetchJobs, fetchUserProfile, fetchLocalProfile, analyzeJob, analyzeAllJobs, Job, UserProfile as UserProfileType } from "@/lib/api";
+import { fetchJobs, fetchUserProfile, fetchLocalProfile, analyzeJob, streamAnalyzeAllJobs, BulkAnalysisEvent, BulkAnalysisPayload, Job, UserProfile as UserProfileType } from "@/lib/api";
 import { Skeleton } from "@/components/ui/skeleton";
 import { Tabs, TabsContent, TabsList, TabsTrigger } from "@/components/ui/tabs";
 
@@ -107,15 +107,25 @@ export const Dashboard = () => {
     },
   });
 
+  // Show each analysis as soon as the backend streams it instead of waiting for the whole run.
+  const handleBulkEvent = (event: BulkAnalysisEvent) => {
+    if (event.event !== 'result') return;
+    setAnalyzedJobs(prev => [...prev, event.analysis].sort((a, b) => (b.suitability_score ?? 0) - (a.suitability_score ?? 0)));
+    if (event.progress?.succeeded === 1) setActiveTab("analyzedJobs");
+  };
+
   const bulkAnalysisMutation = useMutation({
-    mutationFn: analyzeAllJobs,
+    mutationFn: (payload: BulkAnalysisPayload) => {
+      setAnalyzedJobs([]);
+      return streamAnalyzeAllJobs(payload, handleBulkEvent);
+    },
     onSuccess: (data) => {
       toast({
         title: "Bulk Analysis Complete",
-        description: `Found ${data.length} suitable opportunities.`, 
+        description: `Found ${data.results.length} suitable opportunities (${data.stats.jobs_per_minute} jobs/min).`,
       });
-      sessionStorage.setItem('analysisResults', JSON.stringify(data));
-      setAnalyzedJobs(data);
+      sessionStorage.setItem('analysisResults', JSON.stringify(data.results));
+      setAnalyzedJobs(data.results);
       setActiveTab("analyzedJobs");
     },
     onError: (error) => {
@@ -229,7 +239,8 @@ export const Dashboard = () => {
       title: "Starting Bulk Analysis",
       description: `Analyzing ${jobs.length} jobs... This may take a moment.`, 
     });
-    bulkAnalysisMutation.mutate({ jobs, profile: userProfile });
+    // Scores only; the full analysis of a job is fetched when it is opened (AnalysisDetail).
+    bulkAnalysisMutation.mutate({ jobs, profile: userProfile, mode: 'score' });
   };
 
   const analysisDataForModal = selectedJob ? queryClient.getQueryData(['jobAnalysis', selectedJob.id]) : null;
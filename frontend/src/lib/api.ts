@@ -9,11 +9,85 @@ const apiClient = axios.create({
 // --- TypeScript Interfaces ---
 
 export interface ApiConfig {
-  provider: 'google' | 'aws';
+  provider: 'google' | 'aws' | 'fake';
+  models?: Partial<Record<'google' | 'aws' | 'fake', string>> | null;
   google_api_key?: string;
   aws_access_key_id?: string;
   aws_secret_access_key?: string;
   aws_region?: string;
+  bedrock_endpoint_url?: string | null;
+  fake_provider?: FakeProviderConfig | null;
+  rate_limit_rpm?: number | null;
+  rate_limit_tpm?: number | null;
+  max_concurrency?: number | null;
+  pack_size?: number | null;
+  pack_token_budget?: number | null;
+  max_description_tokens?: number | null;
+  context_caching?: boolean | null;
+  cascade?: CascadeConfig | null;
+  proposal_prefetch?: ProposalPrefetchConfig | null;
+  analysis_reuse?: AnalysisReuseConfig | null;
+  failover_policy?: Partial<Record<'analysis' | 'proposal' | 'bulk', FailoverPolicy>> | null;
+  price_table?: Record<string, { input_per_million?: number; output_per_million?: number; cached_input_per_million?: number; cache_storage_per_million_hour?: number }> | null;
+}
+
+// Simulated behaviour of the offline "fake" provider; unset fields use the backend defaults.
+export interface FakeProviderConfig {
+  latency_distribution?: 'fixed' | 'uniform' | 'exponential' | 'lognormal';
+  latency_mean_seconds?: number;
+  latency_spread?: number;
+  packed_job_seconds?: number;
+  error_rate?: number;
+  throttle_rate?: number;
+  malformed_rate?: number;
+  tokens_per_second?: number;
+  seed?: number | null;
+}
+
+// Bulk triage cascade: a cheap model scores every job, the full analysis only runs inside the band.
+export interface CascadeConfig {
+  enabled?: boolean;
+  triage_provider?: 'google' | 'aws' | 'fake';
+  triage_model?: string;
+  full_provider?: 'google' | 'aws' | 'fake';
+  full_model?: string;
+  band_min?: number;
+  band_max?: number;
+}
+
+// After a bulk run, proposals for its top results are generated in the background on idle provider capacity.
+export interface ProposalPrefetchConfig {
+  enabled?: boolean;
+  top_n?: number;
+  min_score?: number;
+}
+
+// Jobs near-identical to one already analyzed against the profile reuse its analysis (client red flags recomputed).
+export interface AnalysisReuseConfig {
+  enabled?: boolean;
+  threshold?: number;  // TF-IDF cosine similarity, 0-1.
+}
+
+export interface CascadeStageLatency {
+  calls: number;
+  mean_seconds: number | null;
+  p95_seconds: number | null;
+}
+
+export interface FailoverPolicy {
+  mode?: 'off' | 'failover' | 'hedge';
+  secondary?: 'google' | 'aws';
+  latency_threshold_seconds?: number;
+}
+
+// Which provider answered a request, attached to analyses and proposals as `provider_meta`.
+export interface ProviderMeta {
+  provider: string;
+  primary_provider: string;
+  policy: 'off' | 'failover' | 'hedge';
+  failover_reason: 'error' | 'latency' | 'hedge' | null;
+  latency_seconds: number;
+  latency_saved_seconds: number;
 }
 
 export interface JobSearchPayload {
@@ -48,6 +122,9 @@ export interface Job {
   workload: string | null;
   duration: string | null;
   client: Client;
+  fingerprint?: string;
+  cluster_id?: string;
+  duplicates?: { id: string; title: string; url: string | null; date_created: string | null }[];
 }
 
 export interface UserProfile {
@@ -55,14 +132,30 @@ export interface UserProfile {
   local_additions: any; // Consider defining a more specific type
 }
 
+// 'score' returns only suitability_score and a one-line analysis_summary; the full analysis is fetched on demand.
+export type AnalysisMode = 'full' | 'score';
+
 export interface AnalysisPayload {
   job: Job;
   profile: UserProfile;
+  mode?: AnalysisMode;
 }
 
 export interface BulkAnalysisPayload {
   jobs: Job[];
   profile: UserProfile;
+  prerank?: { top_k?: number; min_score?: number };
+  budget?: { max_tokens?: number; max_cost?: number };
+  mode?: AnalysisMode;
+}
+
+export interface SearchAnalysisPayload {
+  search: JobSearchPayload;
+  max_jobs: number;
+  profile: UserProfile;
+  prerank?: { top_k?: number; min_score?: number };
+  budget?: { max_tokens?: number; max_cost?: number };
+  mode?: AnalysisMode;
 }
 
 export interface ProposalGenerationPayload {
@@ -71,12 +164,147 @@ export interface ProposalGenerationPayload {
   analysis: any; 
 }
 
+export interface ProposalProviderMeta {
+  provider: string;
+  primary_provider: string;
+  policy: 'off' | 'failover' | 'hedge';
+  failover_reason: string | null;
+  time_to_first_token_seconds: number;
+  prepared?: boolean;  // Served from a proposal pre-generated after the bulk run.
+}
+
+export interface ProposalStreamResult {
+  proposal_text: string;
+  provider_meta: ProposalProviderMeta;
+  time_to_first_token_seconds: number;
+  total_seconds: number;
+}
+
+export interface BulkAnalysisStats {
+  provider: string;
+  mode?: 'single' | 'packed' | 'cascade' | 'score';
+  jobs_requested: number;
+  jobs_analyzed: number;
+  jobs_failed: number;
+  jobs_rejected: number;
+  jobs_skipped?: number;
+  jobs_over_budget?: number;
+  jobs_deduplicated?: number;
+  elapsed_seconds: number;
+  jobs_per_minute: number;
+  estimated_tokens: number;
+  pages_fetched?: number;
+  jobs_fetched?: number;
+  duplicates_collapsed?: number;
+  search_total?: number | null;
+  requests?: number;
+  throttled?: number;
+  final_concurrency?: number;
+  retries?: number;
+  retries_exhausted?: number;
+  short_circuited?: number;
+  answered_by?: Record<string, number>;
+  failovers?: number;
+  latency_saved_seconds?: number;
+  reuse_lookups?: number;
+  reused?: number;
+  usage?: {
+    calls: number;
+    input_tokens: number;
+    output_tokens: number;
+    cached_input_tokens: number;
+    cost: number;
+    budget: { max_tokens: number | null; max_cost: number | null; exhausted: boolean };
+  };
+  context_cache?: {
+    enabled: boolean;
+    requests: number;
+    hits: number;
+    hit_rate: number;
+    cache_read_tokens: number;
+    cost_saved: number;
+    prefixes: {
+      provider: string;
+      model: string;
+      prefix: 'analysis' | 'packed' | 'score' | 'custom';
+      status: 'pending' | 'active' | 'too_small' | 'failed' | 'disabled';
+      prefix_tokens: number;
+      requests: number;
+      hits: number;
+      hit_rate: number;
+      cache_read_tokens: number;
+      cache_write_tokens: number;
+      cost_saved: number;
+      error: string | null;
+    }[];
+  };
+  cascade?: {
+    triage_provider: string;
+    triage_model: string;
+    full_provider: string;
+    full_model: string;
+    band: [number, number];
+    triaged: number;
+    triage_failed: number;
+    below_band: number;
+    above_band: number;
+    escalated: number;
+    escalation_rate: number;
+    triage_latency: CascadeStageLatency;
+    full_latency: CascadeStageLatency;
+  };
+  proposal_prefetch?: { queued: number; enabled: boolean; top_n: number; min_score: number };
+  analysis_reuse?: { threshold: number; reuse_rate: number };
+  circuit_breaker?: { provider: string; state: 'closed' | 'open' | 'half_open'; retry_in_seconds: number | null };
+}
+
+export interface RejectedJob {
+  job_data: Job;
+  reasons: { rule: string; detail: string }[];
+}
+
+export interface SkippedJob {
+  job_data: Job;
+  local_score: number | null;
+  reason: 'prerank' | 'budget';
+}
+
+export interface BulkAnalysisResponse {
+  results: any[];
+  errors?: { job_data: Job; error: string; retryable: boolean }[];
+  rejected?: RejectedJob[];
+  skipped?: SkippedJob[];
+  stats: BulkAnalysisStats;
+}
+
+export interface BulkAnalysisEvent {
+  event: 'result' | 'error' | 'rejected' | 'skipped' | 'page' | 'search_error' | 'done' | 'fatal';
+  analysis?: any;
+  job_id?: string;
+  title?: string;
+  error?: string;
+  retryable?: boolean;
+  reasons?: { rule: string; detail: string }[];
+  local_score?: number | null;
+  reason?: 'prerank' | 'budget';
+  job_data?: Job;
+  page?: number;
+  jobs?: number;
+  jobs_fetched?: number;
+  search_total?: number | null;
+  next_cursor?: string | null;
+  progress?: { total: number; completed: number; succeeded: number; failed: number; rejected: number; skipped: number };
+  top?: { job_id: string; title: string; suitability_score: number }[];
+  stats?: BulkAnalysisStats;
+}
+
 export interface JobAPIResponse {
   jobs: Job[];
   paging: {
     total: number;
     next_cursor: string | null;
     has_next_page: boolean;
+    duplicates_collapsed?: number;
   };
 }
 
@@ -117,16 +345,131 @@ export const analyzeJob = async (payload: AnalysisPayload) => {
   return response.data;
 };
 
-export const analyzeAllJobs = async (payload: BulkAnalysisPayload) => {
-  const response = await apiClient.post('/jobs/analyze-all', payload);
+// Analysis plus cover letter ("proposal_text") from one provider call instead of analyzeJob + generateProposal.
+export const analyzeAndPropose = async (payload: Omit<AnalysisPayload, 'mode'>) => {
+  const response = await apiClient.post('/jobs/analyze-and-propose', payload);
+  return response.data;
+};
+
+export const analyzeAllJobs = async (payload: BulkAnalysisPayload): Promise<BulkAnalysisResponse> => {
+  const response = await apiClient.post('/jobs/analyze-all', payload, { params: { details: true } });
   return response.data;
 };
 
+// Streams NDJSON events from the backend and resolves with the ranked results once the run is done.
+const streamBulkEvents = async (
+  path: string,
+  payload: BulkAnalysisPayload | SearchAnalysisPayload,
+  onEvent: (event: BulkAnalysisEvent) => void,
+): Promise<BulkAnalysisResponse> => {
+  const response = await fetch(`${apiClient.defaults.baseURL}${path}?format=ndjson`, {
+    method: 'POST',
+    credentials: 'include',
+    headers: { 'Content-Type': 'application/json' },
+    body: JSON.stringify(payload),
+  });
+  if (!response.ok || !response.body) {
+    throw new Error(`Bulk analysis failed with status ${response.status}`);
+  }
+
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  const results: any[] = [];
+  const rejected: RejectedJob[] = [];
+  const skipped: SkippedJob[] = [];
+  let stats: BulkAnalysisStats | undefined;
+  let buffer = '';
+
+  const handleLine = (line: string) => {
+    if (!line.trim()) return;
+    const event: BulkAnalysisEvent = JSON.parse(line);
+    if (event.event === 'fatal') throw new Error(event.error);
+    if (event.event === 'result') results.push(event.analysis);
+    if (event.event === 'rejected') rejected.push({ job_data: event.job_data as Job, reasons: event.reasons ?? [] });
+    if (event.event === 'skipped') {
+      skipped.push({ job_data: event.job_data as Job, local_score: event.local_score ?? null, reason: event.reason ?? 'prerank' });
+    }
+    if (event.event === 'done') stats = event.stats;
+    onEvent(event);
+  };
+
+  while (true) {
+    const { done, value } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+    const lines = buffer.split('\n');
+    buffer = lines.pop() ?? '';
+    lines.forEach(handleLine);
+  }
+  handleLine(buffer);
+
+  results.sort((a, b) => (b.suitability_score ?? 0) - (a.suitability_score ?? 0));
+  return { results, rejected, skipped, stats: stats as BulkAnalysisStats };
+};
+
+export const streamAnalyzeAllJobs = (payload: BulkAnalysisPayload, onEvent: (event: BulkAnalysisEvent) => void) =>
+  streamBulkEvents('/jobs/analyze-all/stream', payload, onEvent);
+
+// Searches and analyzes in one request; later result pages are fetched while earlier jobs are analyzed.
+export const streamSearchAndAnalyze = (payload: SearchAnalysisPayload, onEvent: (event: BulkAnalysisEvent) => void) =>
+  streamBulkEvents('/jobs/search-and-analyze/stream', payload, onEvent);
+
 export const generateProposal = async (payload: ProposalGenerationPayload) => {
   const response = await apiClient.post('/proposals/generate', payload);
   return response.data;
 };
 
+// Streams the cover letter as Server-Sent Events; onText receives the text generated so far.
+export const streamProposal = async (
+  payload: ProposalGenerationPayload,
+  onText: (text: string, meta: ProposalProviderMeta | null) => void,
+): Promise<ProposalStreamResult> => {
+  const response = await fetch(`${apiClient.defaults.baseURL}/proposals/generate/stream`, {
+    method: 'POST',
+    credentials: 'include',
+    headers: { 'Content-Type': 'application/json' },
+    body: JSON.stringify(payload),
+  });
+  if (!response.ok || !response.body) {
+    const detail = await response.json().then((body) => body.detail, () => undefined);
+    throw new Error(detail || `Proposal generation failed with status ${response.status}`);
+  }
+
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let meta: ProposalProviderMeta | null = null;
+  let text = '';
+  let result: ProposalStreamResult | undefined;
+  let buffer = '';
+
+  const handleEvent = (block: string) => {
+    const event = block.match(/^event: (.*)$/m)?.[1];
+    const data = block.match(/^data: (.*)$/m)?.[1];
+    if (!event || !data) return;
+    const payload = JSON.parse(data);
+    if (event === 'meta') meta = payload.provider_meta;
+    if (event === 'token') {
+      text += payload.text;
+      onText(text, meta);
+    }
+    if (event === 'error') throw new Error(payload.error);
+    if (event === 'done') result = payload;
+  };
+
+  while (true) {
+    const { done, value } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+    const blocks = buffer.split('\n\n');
+    buffer = blocks.pop() ?? '';
+    blocks.forEach(handleEvent);
+  }
+  handleEvent(buffer);
+
+  if (!result) throw new Error('The proposal stream ended before the proposal was complete.');
+  return result as ProposalStreamResult;
+};
+
 export const getApiConfig = async (): Promise<ApiConfig> => {
   const response = await apiClient.get('/api/config');
   return response.data;
@@ -1,10 +1,13 @@
 import { useState, useEffect } from 'react';
 import { useLocation, Link, useParams } from 'react-router-dom';
+import { useQuery } from '@tanstack/react-query';
 import { Card, CardContent, CardHeader, CardTitle } from '@/components/ui/card';
 import { Progress } from '@/components/ui/progress';
 import { Brain, CheckCircle, AlertCircle, Star, Download, FileText, ArrowLeft } from 'lucide-react';
 import { Button } from '@/components/ui/button';
 import { useToast } from '@/hooks/use-toast';
+import { Skeleton } from '@/components/ui/skeleton';
+import { analyzeJob, fetchLocalProfile, fetchUserProfile } from '@/lib/api';
 
 const AnalysisDetail = () => {
   const location = useLocation();
@@ -29,6 +32,47 @@ const AnalysisDetail = () => {
     }
   }, [analysisResult, jobId]);
 
+  // Bulk runs only score jobs; fetch the full analysis the first time a scored job is opened.
+  const isScoreOnly = analysisResult?.mode === 'score';
+  const { data: upworkProfile } = useQuery({ queryKey: ['upworkProfile'], queryFn: fetchUserProfile, enabled: isScoreOnly });
+  const { data: localProfile } = useQuery({ queryKey: ['localProfile'], queryFn: fetchLocalProfile, enabled: isScoreOnly });
+  const { data: fullAnalysis, isError: isFullAnalysisError } = useQuery({
+    queryKey: ['jobAnalysis', analysisResult?.job_data?.id],
+    queryFn: () => analyzeJob({
+      job: analysisResult.job_data,
+      profile: { upwork_profile: upworkProfile, local_additions: localProfile },
+    }),
+    enabled: isScoreOnly && !!upworkProfile && !!localProfile,
+    staleTime: Infinity,
+  });
+
+  useEffect(() => {
+    if (!fullAnalysis || !isScoreOnly) return;
+    const { mode: _mode, ...rest } = analysisResult;
+    const merged = { ...rest, ...fullAnalysis, job_data: analysisResult.job_data };
+    setAnalysisResult(merged);
+    const storedResults = sessionStorage.getItem('analysisResults');
+    if (storedResults) {
+      try {
+        const results = JSON.parse(storedResults);
+        sessionStorage.setItem('analysisResults', JSON.stringify(
+          results.map((r: any) => r.job_data.id === merged.job_data.id ? merged : r)
+        ));
+      } catch (e) {
+        console.error("Failed to update the stored analysis result", e);
+      }
+    }
+  }, [fullAnalysis, isScoreOnly, analysisResult]);
+
+  const renderItems = (items: string[] | undefined) => {
+    if (isScoreOnly) {
+      return isFullAnalysisError
+        ? <li className="text-sm text-muted-foreground">The full analysis could not be loaded.</li>
+        : <><Skeleton className="h-4 w-full" /><Skeleton className="h-4 w-3/4" /></>;
+    }
+    return (items ?? []).map((item: string, index: number) => <li key={index} className="text-sm">{item}</li>);
+  };
+
   const handleSaveInsights = () => {
     if (!analysisResult) return;
 
@@ -46,15 +90,15 @@ const AnalysisDetail = () => {
     content += `--- ANALYSIS SUMMARY ---\n${analysisResult.analysis_summary}\n\n`;
 
     content += `--- STRENGTHS ---\n`;
-    analysisResult.strengths.forEach((s: string) => content += `- ${s}\n`);
+    (analysisResult.strengths ?? []).forEach((s: string) => content += `- ${s}\n`);
     content += `\n`;
 
     content += `--- WEAKNESSES / GAPS ---\n`;
-    analysisResult.weaknesses.forEach((w: string) => content += `- ${w}\n`);
+    (analysisResult.weaknesses ?? []).forEach((w: string) => content += `- ${w}\n`);
     content += `\n`;
 
     content += `--- PROPOSAL SUGGESTIONS ---\n`;
-    analysisResult.proposal_suggestions.forEach((p: string) => content += `- ${p}\n`);
+    (analysisResult.proposal_suggestions ?? []).forEach((p: string) => content += `- ${p}\n`);
     content += `\n`;
 
     const blob = new Blob([content], { type: 'text/plain;charset=utf-8' });
@@ -135,9 +179,7 @@ const AnalysisDetail = () => {
                 </CardHeader>
                 <CardContent>
                 <ul className="space-y-3 list-disc pl-5">
-                    {analysisResult.strengths.map((strength: string, index: number) => (
-                    <li key={index} className="text-sm">{strength}</li>
-                    ))}
+                    {renderItems(analysisResult.strengths)}
                 </ul>
                 </CardContent>
             </Card>
@@ -151,9 +193,7 @@ const AnalysisDetail = () => {
                 </CardHeader>
                 <CardContent>
                 <ul className="space-y-3 list-disc pl-5">
-                    {analysisResult.weaknesses.map((weakness: string, index: number) => (
-                    <li key={index} className="text-sm">{weakness}</li>
-                    ))}
+                    {renderItems(analysisResult.weaknesses)}
                 </ul>
                 </CardContent>
             </Card>
@@ -168,9 +208,7 @@ const AnalysisDetail = () => {
             </CardHeader>
             <CardContent>
                 <ul className="space-y-3 list-disc pl-5">
-                {analysisResult.proposal_suggestions.map((rec: string, index: number) => (
-                    <li key={index} className="text-sm">{rec}</li>
-                ))}
+                {renderItems(analysisResult.proposal_suggestions)}
                 </ul>
             </CardContent>
             </Card>
@@ -0,0 +1,41 @@
+# tests/conftest.py
+import os
+
+import pytest
+from cryptography.fernet import Fernet
+
+# main checks these at import; local_profile_storage needs an encryption key.
+for _name in ("UPWORK_CLIENT_ID", "UPWORK_CLIENT_SECRET", "UPWORK_REDIRECT_URI"):
+    os.environ.setdefault(_name, "test")
+os.environ.setdefault("ENCRYPTION_KEY", Fernet.generate_key().decode())
+
+# Offline provider answering instantly; see backend/fake_api.py.
+FAKE_CONFIG = {"provider": "fake", "fake_provider": {"latency_distribution": "fixed", "latency_mean_seconds": 0.0}}
+
+
+@pytest.fixture(autouse=True)
+def isolated_state(tmp_path, monkeypatch):
+    """Per-test SQLite files, and no rate limiter or circuit breaker state carried over between tests."""
+    from backend import analysis_cache, analysis_reuse, rate_limiter, resilience, run_storage, usage_tracker
+    monkeypatch.setattr(analysis_cache, "CACHE_PATH", str(tmp_path / "analysis_cache.sqlite3"))
+    monkeypatch.setattr(analysis_cache, "_connection", None)
+    monkeypatch.setattr(usage_tracker, "USAGE_PATH", str(tmp_path / "usage.sqlite3"))
+    monkeypatch.setattr(usage_tracker, "_connection", None)
+    monkeypatch.setattr(run_storage, "RUNS_DIR", str(tmp_path / "runs"))
+    monkeypatch.setattr(rate_limiter, "_limiters", {})
+    monkeypatch.setattr(resilience, "_breakers", {})
+    monkeypatch.setattr(analysis_reuse, "_indexes", analysis_reuse.OrderedDict())
+
+
+def make_job(index: int, **fields) -> dict:
+    """A search result shaped like upwork_api's, from a client with no red flags."""
+    job = {
+        "id": f"job-{index}",
+        "title": f"Job {index}",
+        "snippet": "A detailed description of the work to be done. " * 6,
+        "skills": [],
+        "rate_display": "$50.00 - $90.00/hr",
+        "client": {"verification_status": "VERIFIED", "total_hires": 5, "total_feedback": 4.8},
+    }
+    job.update(fields)
+    return job
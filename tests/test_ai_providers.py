@@ -0,0 +1,154 @@
+# tests/test_ai_providers.py
+import asyncio
+
+import pytest
+
+from backend import ai_providers, fake_api, resilience
+
+from conftest import make_job
+
+PROFILE = {"name": "Dev"}
+JOB = make_job(1)
+
+
+def _config(mode="failover", threshold=20.0):
+    return {"provider": "google",
+            "failover_policy": {"analysis": {"mode": mode, "secondary": "aws", "latency_threshold_seconds": threshold}}}
+
+
+def _transient(provider):
+    return resilience.ProviderError(f"{provider}: 503 Service Unavailable", retryable=True, status_code=503)
+
+
+def _call(failures=None, delays=None, calls=None, cancelled=None):
+    """A provider call answering like the fake provider, with per-provider injected failures and delays."""
+    async def call(provider):
+        if calls is not None:
+            calls.append(provider)
+        try:
+            await asyncio.sleep((delays or {}).get(provider, 0.0))
+        except asyncio.CancelledError:
+            if cancelled is not None:
+                cancelled.append(provider)
+            raise
+        if provider in (failures or {}):
+            raise failures[provider]
+        return {**fake_api.fake_analysis(JOB, PROFILE), "answered_by": provider}
+    return call
+
+
+def test_off_policy_uses_the_primary_only():
+    calls = []
+    with pytest.raises(resilience.ProviderError):
+        asyncio.run(ai_providers.run_with_policy("analysis", _config("off"), _call({"google": _transient("google")}, calls=calls)))
+    assert calls == ["google"]
+
+
+def test_retryable_error_fails_over_to_the_secondary():
+    result, meta = asyncio.run(ai_providers.run_with_policy(
+        "analysis", _config(), _call({"google": _transient("google")}), lambda value: isinstance(value, dict)
+    ))
+    assert result["answered_by"] == "aws"
+    assert meta["provider"] == "aws"
+    assert meta["primary_provider"] == "google"
+    assert meta["failover_reason"] == "error"
+
+
+def test_open_circuit_and_invalid_answers_fail_over():
+    open_circuit = resilience.CircuitOpenError("google is unavailable")
+    result, _ = asyncio.run(ai_providers.run_with_policy("analysis", _config(), _call({"google": open_circuit})))
+    assert result["answered_by"] == "aws"
+    result, _ = asyncio.run(ai_providers.run_with_policy(
+        "analysis", _config(), _call(), lambda value: value["answered_by"] == "aws"
+    ))
+    assert result["answered_by"] == "aws"
+
+
+def test_permanent_error_does_not_fail_over():
+    calls = []
+    rejected = resilience.ProviderError("400 Bad Request", retryable=False, status_code=400)
+    with pytest.raises(resilience.ProviderError, match="400"):
+        asyncio.run(ai_providers.run_with_policy("analysis", _config(), _call({"google": rejected}, calls=calls)))
+    assert calls == ["google"]
+
+
+def test_both_failing_raises_the_primary_error():
+    failures = {"google": _transient("google"), "aws": _transient("aws")}
+    with pytest.raises(resilience.ProviderError, match="google"):
+        asyncio.run(ai_providers.run_with_policy("analysis", _config(), _call(failures)))
+
+
+def test_slow_primary_is_raced_after_the_latency_threshold():
+    cancelled = []
+    result, meta = asyncio.run(ai_providers.run_with_policy(
+        "analysis", _config(threshold=0.05), _call(delays={"google": 5.0}, cancelled=cancelled)
+    ))
+    assert result["answered_by"] == "aws"
+    assert meta["failover_reason"] == "latency"
+    assert cancelled == ["google"]
+
+
+def test_hedge_sends_to_both_and_cancels_the_loser():
+    calls, cancelled = [], []
+    result, meta = asyncio.run(ai_providers.run_with_policy(
+        "analysis", _config("hedge"), _call(delays={"google": 5.0}, calls=calls, cancelled=cancelled)
+    ))
+    assert sorted(calls) == ["aws", "google"]
+    assert result["answered_by"] == "aws"
+    assert meta["failover_reason"] == "hedge"
+    assert cancelled == ["google"]
+
+
+def _stream(chunks, error=None, opened=None, closed=None):
+    def open_stream(provider):
+        async def generate():
+            if opened is not None:
+                opened.append(provider)
+            try:
+                for chunk in chunks.get(provider, []):
+                    yield chunk
+                if provider in (error or {}):
+                    raise error[provider]
+            finally:
+                if closed is not None:
+                    closed.append(provider)
+        return generate()
+    return open_stream
+
+
+async def _read(stream):
+    return [chunk async for chunk in stream]
+
+
+def _config_proposal(mode="failover"):
+    return {"provider": "google", "failover_policy": {"proposal": {"mode": mode, "secondary": "aws"}}}
+
+
+def test_stream_fails_over_before_its_first_chunk():
+    async def run():
+        stream, meta = await ai_providers.open_stream_with_policy(
+            "proposal", _config_proposal(), _stream({"aws": ["Dear ", "client"]}, {"google": _transient("google")})
+        )
+        return await _read(stream), meta
+
+    chunks, meta = asyncio.run(run())
+    assert chunks == ["Dear ", "client"]
+    assert meta["provider"] == "aws"
+    assert meta["failover_reason"] == "error"
+
+
+def test_stream_does_not_fail_over_after_its_first_chunk():
+    opened, closed = [], []
+
+    async def run():
+        stream, meta = await ai_providers.open_stream_with_policy(
+            "proposal", _config_proposal(),
+            _stream({"google": ["Dear "], "aws": ["Hello"]}, {"google": _transient("google")}, opened, closed)
+        )
+        assert meta["provider"] == "google"
+        return await _read(stream)
+
+    with pytest.raises(resilience.ProviderError):
+        asyncio.run(run())
+    assert opened == ["google"]
+    assert closed == ["google"]
@@ -0,0 +1,75 @@
+# tests/test_analysis_cache.py
+import asyncio
+import time
+
+from conftest import FAKE_CONFIG, make_job
+
+from backend import analysis_cache, fake_api, prompts
+
+PROFILE = {"name": "Dev", "overview": "Python developer."}
+
+
+def test_key_depends_on_the_description_budget():
+    job = make_job(1)
+
+    def key(api_config):
+        return fake_api.analysis_cache_key(job, PROFILE, prompts.JOB_ANALYSIS_PROMPT, {**FAKE_CONFIG, **api_config})
+
+    assert key({}) == key({"max_description_tokens": prompts.DEFAULT_MAX_DESCRIPTION_TOKENS})
+    assert key({}) != key({"max_description_tokens": 100})
+    assert key({"max_description_tokens": 0}) != key({"max_description_tokens": 100})
+
+
+def test_entries_expire_after_the_ttl(monkeypatch):
+    analysis_cache.store("key", {"suitability_score": 70})
+    assert analysis_cache.lookup("key") == {"suitability_score": 70}
+    now = time.time()
+    monkeypatch.setattr(analysis_cache.time, "time", lambda: now + analysis_cache.DEFAULT_TTL_SECONDS + 1)
+    assert analysis_cache.lookup("key") is None
+    assert analysis_cache.get_stats()["expired"] == 1
+    assert analysis_cache.get_stats()["entries"] == 0
+
+
+def test_least_recently_used_entries_are_evicted(monkeypatch):
+    monkeypatch.setattr(analysis_cache, "DEFAULT_MAX_ENTRIES", 2)
+    clock = iter(range(1_000_000, 1_000_010))
+    monkeypatch.setattr(analysis_cache.time, "time", lambda: next(clock))
+    analysis_cache.store("a", {"suitability_score": 1})
+    analysis_cache.store("b", {"suitability_score": 2})
+    analysis_cache.lookup("a")
+    analysis_cache.store("c", {"suitability_score": 3})
+    assert analysis_cache.lookup("b") is None
+    assert analysis_cache.lookup("a") is not None
+
+
+def test_concurrent_misses_share_one_computation():
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return {"suitability_score": 80}
+
+    async def run():
+        return await asyncio.gather(*[analysis_cache.get_or_compute("key", compute) for _ in range(5)])
+
+    results = asyncio.run(run())
+    assert len(calls) == 1
+    assert all(result == {"suitability_score": 80} for result in results)
+    # Each caller gets its own copy.
+    assert len({id(result) for result in results}) == 5
+    assert analysis_cache.get_stats()["coalesced"] == 4
+
+
+def test_a_failed_computation_fails_every_waiter_and_is_not_cached():
+    async def compute():
+        await asyncio.sleep(0.01)
+        raise ConnectionError("provider down")
+
+    async def run():
+        return await asyncio.gather(*[analysis_cache.get_or_compute("key", compute) for _ in range(3)],
+                                    return_exceptions=True)
+
+    results = asyncio.run(run())
+    assert all(isinstance(result, ConnectionError) for result in results)
+    assert analysis_cache.lookup("key") is None
@@ -0,0 +1,77 @@
+# tests/test_analysis_reuse.py
+import asyncio
+
+from conftest import FAKE_CONFIG, make_job
+
+from backend import analysis_reuse, bulk_analyzer, prompts
+
+PROFILE = {"name": "Dev", "overview": "Shopify and Python developer."}
+SNIPPET = ("Build a Shopify storefront for our organic skincare brand with custom product pages, "
+           "subscription checkout, Klaviyo email flows, inventory sync from our warehouse spreadsheet "
+           "and a loyalty program landing page.")
+ANALYSIS = {"suitability_score": 82, "analysis_summary": "Good fit.", "strengths": ["Shopify"], "weaknesses": []}
+TEMPLATE = prompts.JOB_ANALYSIS_PROMPT
+REUSE = {"enabled": True, "threshold": 0.9}
+
+
+def _job(index, **fields):
+    return make_job(index, **{"title": "Shopify storefront build", "snippet": SNIPPET, **fields})
+
+
+def _remember(job, template=TEMPLATE):
+    analysis_reuse.remember(job, PROFILE, dict(ANALYSIS), "fake", FAKE_CONFIG, template)
+
+
+def _find(job, threshold=0.9, template=TEMPLATE):
+    return analysis_reuse.find(job, PROFILE, FAKE_CONFIG, {**REUSE, "threshold": threshold}, template)
+
+
+def test_near_duplicate_is_reused():
+    _remember(_job(1))
+    reused = _find(_job(2, snippet=SNIPPET + " Urgent."))
+    assert reused["suitability_score"] == 82
+    assert reused["reuse"]["source_job_id"] == "job-1"
+    assert reused["reuse"]["similarity"] >= 0.9
+
+
+def test_threshold_rejects_a_different_job():
+    _remember(_job(1))
+    other = _job(2, title="Backend migration", snippet="Migrate a Django monolith to FastAPI microservices on Kubernetes with "
+                                "PostgreSQL replication, Celery workers, Redis caching, Terraform modules "
+                                "and a Grafana dashboard for the Shopify order export job.")
+    assert _find(other) is None
+    assert _find(other, threshold=0.0) is not None
+
+
+def test_a_job_never_reuses_its_own_analysis():
+    job = _job(1)
+    _remember(job)
+    assert _find(job) is None
+
+
+def test_indexes_are_scoped_by_prompt():
+    _remember(_job(1), prompts.BULK_JOB_ANALYSIS_PROMPT)
+    assert _find(_job(2)) is None
+    assert _find(_job(2), template=prompts.BULK_JOB_ANALYSIS_PROMPT) is not None
+
+
+def test_new_client_red_flag_caps_the_score():
+    _remember(_job(1))
+    reused = _find(_job(2, client={"verification_status": "UNVERIFIED", "total_hires": 5}))
+    assert reused["suitability_score"] == analysis_reuse.RED_FLAG_MAX_SCORE
+    assert reused["weaknesses"]
+
+
+def test_source_red_flag_missing_on_new_client_is_not_reused():
+    _remember(_job(1, client={"verification_status": "UNVERIFIED", "total_hires": 5}))
+    assert _find(_job(2)) is None
+
+
+def test_bulk_run_returns_the_cached_analysis_not_a_reused_one():
+    config = {**FAKE_CONFIG, "analysis_reuse": REUSE}
+    jobs = [_job(1)]
+
+    first = asyncio.run(bulk_analyzer.analyze_multiple_jobs(jobs, PROFILE, config))
+    second = asyncio.run(bulk_analyzer.analyze_multiple_jobs(jobs, PROFILE, config))
+    assert "reuse" not in second["results"][0]
+    assert second["results"][0]["suitability_score"] == first["results"][0]["suitability_score"]
@@ -0,0 +1,202 @@
+# tests/test_bulk_analyzer.py
+import asyncio
+
+from backend import bulk_analyzer, fake_api
+
+from conftest import FAKE_CONFIG, make_job
+
+PROFILE = {"title": "Shopify developer", "skills": ["Shopify", "Liquid"]}
+
+
+def _run(jobs, **kwargs):
+    return asyncio.run(bulk_analyzer.analyze_multiple_jobs(jobs, PROFILE, dict(FAKE_CONFIG), **kwargs))
+
+
+def test_prefilter_is_off_unless_enabled():
+    run = _run([make_job(1, rate_display="$10.00/hr")])
+    assert len(run["results"]) == 1
+    assert run["rejected"] == []
+
+
+def test_dropped_jobs_are_rejected_with_reasons():
+    run = _run([make_job(1, rate_display="$10.00/hr"), make_job(2)], prefilter={"enabled": True})
+    assert [analysis["job_data"]["id"] for analysis in run["results"]] == ["job-2"]
+    assert run["rejected"][0]["reasons"][0]["rule"] == "min_hourly_rate"
+
+
+def test_downranked_jobs_never_displace_passing_jobs_from_top_k():
+    # The failing job is the most relevant to the profile, so a plain BM25 sort would pick it first.
+    failing = make_job(1, title="Shopify Liquid store", skills=["Shopify", "Liquid"], rate_display="$10.00/hr")
+    passing = [make_job(2, title="Shopify app"), make_job(3, title="Logo design")]
+    run = _run([failing] + passing, prefilter={"enabled": True, "action": "downrank"}, prerank={"top_k": 2})
+    assert sorted(analysis["job_data"]["id"] for analysis in run["results"]) == ["job-2", "job-3"]
+    assert [skipped["job_data"]["id"] for skipped in run["skipped"]] == ["job-1"]
+
+
+def test_downranked_jobs_are_penalized():
+    failing = make_job(1, rate_display="$10.00/hr")
+    run = _run([failing], prefilter={"enabled": True, "action": "downrank", "downrank_penalty": 100})
+    assert run["results"][0]["suitability_score"] == 0
+    assert run["results"][0]["rejection_reasons"][0]["rule"] == "min_hourly_rate"
+
+
+def _distinct_job(index):
+    # Unrelated descriptions of equal length, so near-duplicate clustering keeps every job and each costs the same.
+    return make_job(index, snippet=" ".join(f"task{index}step{part}" for part in range(40)))
+
+
+def _tokens(usage):
+    return usage["input_tokens"] + usage["output_tokens"]
+
+
+def _sequential_config():
+    return {**FAKE_CONFIG, "max_concurrency": 1}
+
+
+def test_budget_stops_sending_jobs_once_the_next_would_exceed_it():
+    jobs = [_distinct_job(index) for index in range(10, 18)]
+    per_job = _tokens(_run([_distinct_job(99)])["stats"]["usage"])
+    estimate = bulk_analyzer._estimate_analysis_tokens(jobs[0], PROFILE, _sequential_config())
+    # Three jobs reported, and exactly room for the fourth's estimate.
+    budget = {"max_tokens": 3 * per_job + estimate}
+
+    run = asyncio.run(bulk_analyzer.analyze_multiple_jobs(jobs, PROFILE, _sequential_config(), budget=budget))
+    # Jobs are sent in order, so the first four get analyzed.
+    assert sorted(analysis["job_data"]["id"] for analysis in run["results"]) == [job["id"] for job in jobs[:4]]
+    assert sorted(skipped["job_data"]["id"] for skipped in run["skipped"]) == [job["id"] for job in jobs[4:]]
+    assert {skipped["reason"] for skipped in run["skipped"]} == {"budget"}
+    usage = run["stats"]["usage"]
+    assert usage["calls"] == 4
+    assert _tokens(usage) <= budget["max_tokens"]
+    assert usage["budget"]["exhausted"] is True
+    assert run["stats"]["jobs_over_budget"] == 4
+
+
+def test_budget_skip_events_carry_the_reason_and_local_score():
+    async def collect():
+        jobs = [_distinct_job(index) for index in range(10, 13)]
+        return [event async for event in bulk_analyzer.stream_multiple_jobs(
+            jobs, PROFILE, _sequential_config(), prerank={"top_k": 3}, budget={"max_tokens": 1}
+        )]
+
+    skipped = [event for event in asyncio.run(collect()) if event["event"] == "skipped"]
+    assert len(skipped) == 3
+    for event in skipped:
+        assert event["reason"] == "budget"
+        assert event["job_id"] == event["job_data"]["id"]
+        assert event["local_score"] is not None
+
+
+def test_cached_analyses_are_not_charged_to_the_budget():
+    cached = [_distinct_job(index) for index in range(10, 12)]
+    _run(cached)
+    fresh = [_distinct_job(index) for index in range(20, 23)]
+    estimate = bulk_analyzer._estimate_analysis_tokens(fresh[0], PROFILE, _sequential_config())
+
+    run = asyncio.run(bulk_analyzer.analyze_multiple_jobs(
+        cached + fresh, PROFILE, _sequential_config(), budget={"max_tokens": estimate}
+    ))
+    assert sorted(analysis["job_data"]["id"] for analysis in run["results"]) == ["job-10", "job-11", "job-20"]
+    assert sorted(skipped["job_data"]["id"] for skipped in run["skipped"]) == ["job-21", "job-22"]
+    assert run["stats"]["usage"]["calls"] == 1
+
+
+def _run_packed(jobs, monkeypatch, respond):
+    """Runs `jobs` in packs of three, with `respond(jobs_data, analyses)` shaping each packed response."""
+    packed_analysis = fake_api.get_bulk_job_analysis
+
+    async def patched(jobs_data, profile_data, api_config=None):
+        return respond(jobs_data, await packed_analysis(jobs_data, profile_data, api_config))
+
+    monkeypatch.setattr(fake_api, "get_bulk_job_analysis", patched)
+    return asyncio.run(bulk_analyzer.analyze_multiple_jobs(jobs, PROFILE, {**FAKE_CONFIG, "pack_size": 3}))
+
+
+def test_jobs_missing_from_a_packed_response_are_analyzed_individually(monkeypatch):
+    jobs = [_distinct_job(index) for index in range(10, 13)]
+    # The second job is left out, and the third comes back without a score.
+    run = _run_packed(jobs, monkeypatch, lambda jobs_data, analyses: [
+        analyses[0], {**analyses[2], "suitability_score": None}
+    ])
+    assert sorted(analysis["job_data"]["id"] for analysis in run["results"]) == ["job-10", "job-11", "job-12"]
+    stats = run["stats"]
+    assert stats["mode"] == "packed"
+    assert (stats["packed_requests"], stats["packed_jobs"], stats["fallback_jobs"]) == (1, 1, 2)
+    assert stats["usage"]["calls"] == 3
+
+
+def test_malformed_packed_response_falls_back_for_the_whole_pack(monkeypatch):
+    def malformed(jobs_data, analyses):
+        raise ValueError("Failed to parse the packed analysis from the AI response: unterminated string")
+
+    jobs = [_distinct_job(index) for index in range(10, 13)]
+    run = _run_packed(jobs, monkeypatch, malformed)
+    assert sorted(analysis["job_data"]["id"] for analysis in run["results"]) == ["job-10", "job-11", "job-12"]
+    stats = run["stats"]
+    assert (stats["packed_requests"], stats["packed_jobs"], stats["fallback_jobs"]) == (0, 0, 3)
+    assert stats["jobs_failed"] == 0
+
+
+def test_score_mode_returns_scores_from_the_score_prompt():
+    jobs = [_distinct_job(index) for index in range(10, 13)]
+    run = _run(jobs, mode="score")
+    assert run["stats"]["mode"] == "score"
+    for analysis in run["results"]:
+        assert analysis["mode"] == "score"
+        assert analysis["suitability_score"] == fake_api.fake_score(analysis["job_data"], PROFILE)
+    # Score-only answers are far shorter than full analyses.
+    assert run["stats"]["usage"]["output_tokens"] == 3 * fake_api.SCORE_OUTPUT_TOKENS
+
+
+def _search_pages(monkeypatch, pages, fail_on_page=None):
+    """Serves `pages` (lists of jobs) from a fake GraphQL search, following its cursors. Returns the requests made."""
+    requests = []
+
+    async def search(query=None, category_ids=None, location=None, first=None, after=None):
+        requests.append({"first": first, "after": after})
+        index = int(after or 0)
+        if index == fail_on_page:
+            raise ConnectionError("Upwork search timed out.")
+        has_next_page = index + 1 < len(pages)
+        return {"jobs": pages[index][:first], "paging": {
+            "total": sum(len(page) for page in pages), "has_next_page": has_next_page,
+            "next_cursor": str(index + 1) if has_next_page else None, "duplicates_collapsed": 1,
+        }}
+
+    monkeypatch.setattr(bulk_analyzer.upwork_api, "search_upwork_jobs_gql", search)
+    return requests
+
+
+def _search_and_analyze(max_jobs):
+    async def collect():
+        return [event async for event in bulk_analyzer.stream_search_and_analyze(
+            {"query": "shopify", "first": 4}, max_jobs, PROFILE, dict(FAKE_CONFIG)
+        )]
+    return asyncio.run(collect())
+
+
+def test_search_pages_are_followed_until_max_jobs(monkeypatch):
+    pages = [[_distinct_job(10 * page + index) for index in range(4)] for page in range(1, 4)]
+    requests = _search_pages(monkeypatch, pages)
+    events = _search_and_analyze(10)
+
+    assert requests == [{"first": 4, "after": None}, {"first": 4, "after": "1"}, {"first": 2, "after": "2"}]
+    assert [event["jobs_fetched"] for event in events if event["event"] == "page"] == [4, 8, 10]
+    analyzed = {event["analysis"]["job_data"]["id"] for event in events if event["event"] == "result"}
+    assert analyzed == {job["id"] for job in pages[0] + pages[1] + pages[2][:2]}
+    stats = events[-1]["stats"]
+    assert events[-1]["event"] == "done"
+    assert (stats["pages_fetched"], stats["jobs_fetched"], stats["search_total"], stats["duplicates_collapsed"]) == (3, 10, 12, 3)
+
+
+def test_search_error_ends_the_run_with_the_jobs_already_fetched(monkeypatch):
+    pages = [[_distinct_job(10 * page + index) for index in range(4)] for page in range(1, 4)]
+    _search_pages(monkeypatch, pages, fail_on_page=1)
+    events = _search_and_analyze(12)
+
+    (search_error,) = [event for event in events if event["event"] == "search_error"]
+    assert search_error["pages_fetched"] == 1
+    assert "timed out" in search_error["error"]
+    analyzed = {event["analysis"]["job_data"]["id"] for event in events if event["event"] == "result"}
+    assert analyzed == {job["id"] for job in pages[0]}
+    assert events[-1]["event"] == "done"
@@ -0,0 +1,57 @@
+# tests/test_client_pool.py
+import asyncio
+
+import google.generativeai as genai
+from google.ai import generativelanguage as glm
+
+from backend import client_pool
+
+
+def test_gemini_clients_are_pooled_per_event_loop():
+    async def get_twice():
+        return client_pool.get_gemini_client("key-1"), client_pool.get_gemini_client("key-1")
+
+    first, again = asyncio.run(get_twice())
+    other_loop, _ = asyncio.run(get_twice())
+    assert first is again
+    assert other_loop is not first
+
+
+def test_gemini_clients_are_pooled_per_key():
+    async def get_both():
+        return client_pool.get_gemini_client("key-1"), client_pool.get_gemini_client("key-2")
+
+    first, second = asyncio.run(get_both())
+    assert first is not second
+
+
+class _StubClient:
+    def __init__(self):
+        self.requests = []
+
+    async def generate_content(self, request, **options):
+        self.requests.append((request, options))
+        return glm.GenerateContentResponse(candidates=[glm.Candidate(
+            content=glm.Content(role="model", parts=[glm.Part(text='{"suitability_score": 80}')]),
+            finish_reason=glm.Candidate.FinishReason.STOP,
+        )], usage_metadata={"prompt_token_count": 12, "candidates_token_count": 5})
+
+
+def test_model_sends_through_the_pooled_client(monkeypatch):
+    stub = _StubClient()
+    monkeypatch.setattr(client_pool, "get_gemini_client", lambda api_key: stub)
+    model = client_pool.bind_gemini_model("key-1", "gemini-test", cached_content="cachedContents/abc")
+
+    response = asyncio.run(model.generate_content_async(
+        "Analyze this job", generation_config=genai.types.GenerationConfig(response_mime_type="application/json"),
+        request_options={"timeout": 30},
+    ))
+
+    assert response.text == '{"suitability_score": 80}'
+    assert response.usage_metadata.prompt_token_count == 12
+    request, options = stub.requests[0]
+    assert request.model == "models/gemini-test"
+    assert request.cached_content == "cachedContents/abc"
+    assert request.generation_config.response_mime_type == "application/json"
+    assert request.contents[0].parts[0].text == "Analyze this job"
+    assert options == {"timeout": 30}
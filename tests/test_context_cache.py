@@ -0,0 +1,87 @@
+# tests/test_context_cache.py
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from backend import client_pool, context_cache, prompts, usage_tracker
+
+MODEL_ID = "gemini-2.5-flash"
+# Long enough to clear GEMINI_MIN_CACHE_TOKENS.
+PROFILE = {"name": "Dev", "overview": "Python backend developer with a decade of API work. " * 120}
+
+
+class StubCacheClient:
+    def __init__(self):
+        self.created = []
+
+    async def create_cached_content(self, cached_content):
+        self.created.append(cached_content)
+        return SimpleNamespace(name=f"cachedContents/{len(self.created)}",
+                               usage_metadata=SimpleNamespace(total_token_count=2000))
+
+    async def delete_cached_content(self, name):
+        pass
+
+
+@pytest.fixture
+def cache_client(monkeypatch):
+    client = StubCacheClient()
+    monkeypatch.setattr(client_pool, "get_gemini_cache_client", lambda api_key: client)
+    monkeypatch.setattr(client_pool, "bind_gemini_model", lambda api_key, model_id, name: object())
+    return client
+
+
+def _prefix(cache, ledger=None):
+    async def run():
+        usage_tracker.bind(ledger)
+        return await cache.gemini_prefix(prompts.JOB_ANALYSIS_PREFIX, "key", MODEL_ID)
+    return asyncio.run(run())
+
+
+def test_small_run_is_not_cached_by_default(cache_client):
+    cache = context_cache.RunContextCache(PROFILE, {})
+    cache.plan(context_cache.MIN_CACHED_RUN_CALLS - 1)
+    assert _prefix(cache) is None
+    assert cache_client.created == []
+
+
+def test_large_run_is_cached_by_default(cache_client):
+    cache = context_cache.RunContextCache(PROFILE, {})
+    cache.plan(context_cache.MIN_CACHED_RUN_CALLS)
+    assert _prefix(cache) is not None
+    assert len(cache_client.created) == 1
+
+
+def test_explicit_setting_overrides_the_job_count(cache_client):
+    forced = context_cache.RunContextCache(PROFILE, {"context_caching": True})
+    assert _prefix(forced) is not None
+    disabled = context_cache.RunContextCache(PROFILE, {"context_caching": False})
+    disabled.plan(100)
+    assert _prefix(disabled) is None
+    assert len(cache_client.created) == 1
+
+
+def test_creation_and_storage_are_charged_to_the_run(cache_client, monkeypatch):
+    ledger = usage_tracker.UsageLedger(usage_tracker.resolve_price_table({}))
+    cache = context_cache.RunContextCache(PROFILE, {"context_caching": True})
+    prefix = _prefix(cache, ledger)
+    assert ledger.input_tokens == 2000
+
+    created = prefix.storage_billed_until
+    monkeypatch.setattr(context_cache.time, "monotonic", lambda: created + 1800)
+    cost = ledger.cost
+    cache.bill_storage(ledger)
+    # 2000 tokens kept for half an hour at $1.00 per million token-hours.
+    assert ledger.storage_cost == pytest.approx(0.001)
+    assert ledger.cost == pytest.approx(cost + 0.001)
+    cache.bill_storage(ledger)
+    assert ledger.storage_cost == pytest.approx(0.001)
+
+
+def test_creation_over_budget_falls_back_to_full_prompts(cache_client):
+    ledger = usage_tracker.UsageLedger(usage_tracker.resolve_price_table({}), max_tokens=100)
+    cache = context_cache.RunContextCache(PROFILE, {"context_caching": True})
+    assert _prefix(cache, ledger) is None
+    assert cache_client.created == []
+    assert ledger.input_tokens == 0
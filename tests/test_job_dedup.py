@@ -0,0 +1,65 @@
+# tests/test_job_dedup.py
+import asyncio
+
+import pytest
+
+from backend import bulk_analyzer, job_dedup
+
+from conftest import FAKE_CONFIG, make_job
+
+TEXT = ("Build a Shopify storefront for our organic skincare brand with custom product pages, "
+        "subscription checkout, Klaviyo email flows and inventory sync from our warehouse spreadsheet.")
+OTHER_TEXT = ("Migrate a Django monolith to FastAPI microservices on Kubernetes with PostgreSQL replication, "
+              "Celery workers, Redis caching and Terraform modules.")
+
+
+@pytest.fixture(autouse=True)
+def fresh_search_index(monkeypatch):
+    monkeypatch.setattr(job_dedup, "_search_index", job_dedup.MinHashIndex())
+
+
+def _job(index, snippet=TEXT, title="Shopify storefront"):
+    return make_job(index, title=title, snippet=snippet)
+
+
+def test_near_duplicates_are_above_the_threshold_and_others_below():
+    original = job_dedup.fingerprint(_job(1))
+    repost = job_dedup.fingerprint(_job(2, snippet=TEXT + " Start ASAP."))
+    other = job_dedup.fingerprint(_job(3, snippet=OTHER_TEXT, title="Backend migration"))
+    assert job_dedup.similarity(original, repost) >= job_dedup.SIMILARITY_THRESHOLD
+    assert job_dedup.similarity(original, other) < job_dedup.SIMILARITY_THRESHOLD
+
+
+def test_search_results_keep_the_first_posting_with_its_duplicates():
+    jobs = [_job(1), _job(2, snippet=TEXT + " Start ASAP."), _job(3, snippet=OTHER_TEXT, title="Backend migration")]
+    representatives, collapsed = job_dedup.dedupe_search_results(jobs)
+    assert collapsed == 1
+    assert [job["id"] for job in representatives] == ["job-1", "job-3"]
+    assert [member["id"] for member in representatives[0]["duplicates"]] == ["job-2"]
+    assert representatives[1]["duplicates"] == []
+
+
+def test_reposts_are_recognized_across_searches():
+    job_dedup.dedupe_search_results([_job(1)])
+    representatives, collapsed = job_dedup.dedupe_search_results([_job(2)])
+    assert collapsed == 0
+    assert representatives[0]["cluster_id"] == "job-1"
+    assert [member["id"] for member in representatives[0]["duplicates"]] == ["job-1"]
+
+
+def test_jobs_without_text_are_never_clustered():
+    empty = [make_job(i, title="", snippet="  ") for i in range(3)]
+    assert job_dedup.fingerprint(empty[0]) is None
+    representatives, collapsed = job_dedup.dedupe_search_results(empty)
+    assert collapsed == 0
+    assert [job["id"] for job in representatives] == ["job-0", "job-1", "job-2"]
+
+
+def test_bulk_run_analyzes_each_cluster_once():
+    jobs = [_job(1), _job(2, snippet=TEXT + " Start ASAP."), make_job(3, title="", snippet=""),
+            make_job(4, title="", snippet="")]
+    run = asyncio.run(bulk_analyzer.analyze_multiple_jobs(jobs, {}, dict(FAKE_CONFIG)))
+    assert run["stats"]["jobs_deduplicated"] == 1
+    assert sorted(analysis["job_data"]["id"] for analysis in run["results"]) == ["job-1", "job-2", "job-3", "job-4"]
+    by_id = {analysis["job_data"]["id"]: analysis for analysis in run["results"]}
+    assert by_id["job-2"]["suitability_score"] == by_id["job-1"]["suitability_score"]
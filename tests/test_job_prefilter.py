@@ -0,0 +1,37 @@
+# tests/test_job_prefilter.py
+from backend import job_prefilter
+
+from conftest import make_job
+
+
+def test_rules_are_off_by_default():
+    rules = job_prefilter.resolve_rules()
+    passed, failed = job_prefilter.apply_rules([make_job(1, rate_display="$10.00/hr")], rules)
+    assert len(passed) == 1 and failed == []
+
+
+def test_none_overrides_are_ignored():
+    rules = job_prefilter.resolve_rules({"enabled": True, "min_hourly_rate": None, "action": "downrank"})
+    assert rules["min_hourly_rate"] == job_prefilter.DEFAULT_RULES["min_hourly_rate"]
+    assert rules["action"] == "downrank"
+
+
+def test_red_flags_are_reported_per_rule():
+    job = make_job(1, rate_display="$15.00 - $30.00/hr", snippet="Short.",
+                   client={"verification_status": "UNVERIFIED", "total_hires": 0})
+    rules = job_prefilter.resolve_rules({"enabled": True})
+    assert [reason["rule"] for reason in job_prefilter.evaluate_job(job, rules)] == [
+        "min_hourly_rate", "require_verified_payment", "require_client_history", "min_description_length",
+    ]
+
+
+def test_missing_client_data_is_not_a_failure():
+    job = make_job(1, rate_display=None, client={})
+    assert job_prefilter.evaluate_job(job, job_prefilter.resolve_rules({"enabled": True})) == []
+
+
+def test_hourly_ranges_are_parsed():
+    assert job_prefilter.parse_hourly_range("$15.00 - $30.00/hr") == (15.0, 30.0)
+    assert job_prefilter.parse_hourly_range("From $20.00/hr") == (20.0, None)
+    assert job_prefilter.parse_hourly_range("Up to $1,035.00/hr") == (None, 1035.0)
+    assert job_prefilter.parse_hourly_range("$500") == (None, None)
@@ -0,0 +1,40 @@
+# tests/test_job_ranker.py
+from backend import job_ranker
+
+from conftest import make_job
+
+PROFILE = {"title": "Shopify developer", "skills": ["Shopify", "Liquid", "ecommerce"]}
+
+
+def _titles(pairs):
+    return [job["title"] for job, _ in pairs]
+
+
+def test_jobs_are_ranked_by_relevance_to_the_profile():
+    jobs = [make_job(1, title="Logo design"), make_job(2, title="Shopify store with Liquid theme", skills=["Shopify"]),
+            make_job(3, title="Shopify app")]
+    selected, skipped = job_ranker.prerank(jobs, PROFILE)
+    assert _titles(selected) == ["Shopify store with Liquid theme", "Shopify app", "Logo design"]
+    assert selected[0][1] == 100
+    assert skipped == []
+
+
+def test_top_k_and_min_score_skip_the_rest():
+    jobs = [make_job(1, title="Logo design"), make_job(2, title="Shopify Liquid store"), make_job(3, title="Shopify app")]
+    selected, skipped = job_ranker.prerank(jobs, PROFILE, top_k=1)
+    assert _titles(selected) == ["Shopify Liquid store"]
+    assert len(skipped) == 2
+    selected, _ = job_ranker.prerank(jobs, PROFILE, min_score=50)
+    assert "Logo design" not in _titles(selected)
+
+
+def test_demoted_jobs_rank_after_the_others_and_fill_top_k_last():
+    jobs = [make_job(1, title="Logo design"), make_job(2, title="Shopify app")]
+    demoted = [make_job(3, title="Shopify Liquid ecommerce store", skills=["Shopify", "Liquid"])]
+    selected, _ = job_ranker.prerank(jobs, PROFILE, demoted=demoted)
+    # The demoted job is the most relevant, so it sets the 0-100 scale, but it still comes last.
+    assert _titles(selected) == ["Shopify app", "Logo design", "Shopify Liquid ecommerce store"]
+    assert selected[-1][1] == 100
+    selected, skipped = job_ranker.prerank(jobs, PROFILE, top_k=2, demoted=demoted)
+    assert _titles(selected) == ["Shopify app", "Logo design"]
+    assert _titles(skipped) == ["Shopify Liquid ecommerce store"]
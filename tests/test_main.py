@@ -0,0 +1,85 @@
+# tests/test_main.py
+import time
+from collections import OrderedDict
+
+import pytest
+from fastapi.testclient import TestClient
+
+from backend import analysis_cache, fake_api, local_profile_storage, main, proposal_prefetch
+
+from conftest import FAKE_CONFIG
+
+PROFILE = {"name": "Dev", "overview": "Shopify developer."}
+JOB = {
+    "id": "job-1",
+    "title": "Shopify storefront build",
+    "snippet": "Build a Shopify storefront for our organic skincare brand with custom product pages, "
+               "subscription checkout, Klaviyo email flows, inventory sync from our warehouse spreadsheet "
+               "and a loyalty program landing page.",
+    "rate_display": "$50.00 - $90.00/hr",
+    "client": {"verification_status": "VERIFIED", "total_hires": 5},
+}
+
+
+@pytest.fixture
+def client(monkeypatch):
+    api_config = {**FAKE_CONFIG, "analysis_reuse": {"enabled": True}}
+    monkeypatch.setattr(local_profile_storage, "read_local_profile", lambda: {"api_config": api_config})
+    with TestClient(main.app) as client:  # One event loop thread for every request, like the server.
+        yield client
+
+
+def _analyze(client, job, mode="full"):
+    response = client.post("/jobs/analyze", json={"job": job, "profile": PROFILE, "mode": mode})
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_exact_cache_hit_is_returned_with_a_single_lookup(client):
+    first = _analyze(client, JOB)
+    hits = analysis_cache.get_stats()["hits"]
+    second = _analyze(client, JOB)
+    assert analysis_cache.get_stats()["hits"] == hits + 1
+    assert "reuse" not in second
+    assert second["suitability_score"] == first["suitability_score"]
+
+
+def test_score_request_does_not_reuse_a_full_analysis(client):
+    _analyze(client, JOB)
+    score = _analyze(client, {**JOB, "id": "job-2"}, mode="score")
+    assert "reuse" not in score
+    assert score["mode"] == "score"
+    # Score results are indexed under the score prompt, so a near-duplicate reuses the score.
+    reused = _analyze(client, {**JOB, "id": "job-3"}, mode="score")
+    assert reused["reuse"]["source_job_id"] == "job-2"
+    assert reused["mode"] == "score"
+
+
+def test_analyze_and_propose_answers_with_one_provider_call(client):
+    response = client.post("/jobs/analyze-and-propose", json={"job": JOB, "profile": PROFILE})
+    assert response.status_code == 200
+    result = response.json()
+    assert result["suitability_score"] == fake_api.fake_analysis(JOB, PROFILE)["suitability_score"]
+    assert JOB["title"] in result["proposal_text"]
+    assert result["provider_meta"]["provider"] == "fake"
+    assert client.get("/metrics/scheduler").json()["fake"]["total_requests"] == 1
+
+
+def test_prepared_proposal_is_served_once(client, monkeypatch):
+    api_config = {
+        **FAKE_CONFIG,
+        "fake_provider": {**FAKE_CONFIG["fake_provider"], "tokens_per_second": 100_000},
+        "proposal_prefetch": {"enabled": True, "top_n": 1, "min_score": 0},
+    }
+    monkeypatch.setattr(local_profile_storage, "read_local_profile", lambda: {"api_config": api_config})
+    monkeypatch.setattr(proposal_prefetch, "_prepared", OrderedDict())
+    (analysis,) = client.post("/jobs/analyze-all", json={"jobs": [JOB], "profile": PROFILE}).json()
+    while client.get("/metrics/proposals").json()["running"]:
+        time.sleep(0.01)
+
+    request = {"job": analysis["job_data"], "profile": PROFILE, "analysis": analysis}
+    prepared = client.post("/proposals/generate", json=request).json()
+    assert prepared["prepared"] is True
+    fresh = client.post("/proposals/generate", json=request).json()
+    assert "prepared" not in fresh
+    assert fresh["proposal_text"] == prepared["proposal_text"]
@@ -0,0 +1,88 @@
+# tests/test_proposal_prefetch.py
+import asyncio
+from collections import OrderedDict
+
+import pytest
+
+from backend import ai_providers, bulk_analyzer, prompts, proposal_prefetch
+
+from conftest import FAKE_CONFIG, make_job
+
+PROFILE = {"title": "Shopify developer", "skills": ["Shopify", "Liquid"]}
+PREFETCH_CONFIG = {
+    **FAKE_CONFIG,
+    "fake_provider": {**FAKE_CONFIG["fake_provider"], "tokens_per_second": 100_000},  # Letters written instantly.
+    "proposal_prefetch": {"enabled": True, "top_n": 2, "min_score": 0},
+}
+
+
+@pytest.fixture(autouse=True)
+def fresh_prefetch(monkeypatch):
+    monkeypatch.setattr(proposal_prefetch, "_prepared", OrderedDict())
+    monkeypatch.setattr(proposal_prefetch, "_current", None)
+    monkeypatch.setattr(proposal_prefetch, "_stats", dict.fromkeys(proposal_prefetch._stats, 0))
+
+
+def _jobs():
+    # Unrelated descriptions, so near-duplicate clustering keeps every job.
+    return [make_job(index, snippet=" ".join(f"task{index}step{part}" for part in range(40))) for index in range(10, 14)]
+
+
+def _take(analysis, api_config=PREFETCH_CONFIG):
+    return proposal_prefetch.take(analysis["job_data"], PROFILE, prompts.project_analysis(analysis), api_config)
+
+
+def _run_and_prefetch(jobs, api_config=PREFETCH_CONFIG, mode="full"):
+    async def run():
+        result = await bulk_analyzer.analyze_multiple_jobs(jobs, PROFILE, api_config, mode=mode)
+        await proposal_prefetch._current
+        return result
+    return asyncio.run(run())
+
+
+def test_top_results_are_prepared_and_each_is_served_once():
+    run = _run_and_prefetch(_jobs())
+    ranked = sorted(run["results"], key=lambda analysis: -analysis["suitability_score"])
+    assert run["stats"]["proposal_prefetch"]["queued"] == 2
+
+    for analysis in ranked[:2]:
+        prepared = _take(analysis)
+        assert prepared["proposal_text"]
+        assert prepared["provider_meta"]["provider"] == "fake"
+        assert _take(analysis) is None
+    assert _take(ranked[2]) is None
+    # A different analysis of the same job asks for a different letter.
+    assert _take({**ranked[0], "analysis_summary": "Edited by hand."}) is None
+    stats = proposal_prefetch.get_stats()
+    assert (stats["prepared"], stats["served"], stats["misses"]) == (2, 2, 4)
+
+
+def test_score_results_get_a_full_analysis_before_their_proposal():
+    run = _run_and_prefetch(_jobs(), mode="score")
+    assert proposal_prefetch.get_stats()["analyses_fetched"] == 2
+    best = max(run["results"], key=lambda analysis: analysis["suitability_score"])
+    # The score-only result isn't what the proposal was written from.
+    assert _take(best) is None
+
+
+def test_prepared_proposal_is_keyed_on_the_provider_that_wrote_it(monkeypatch):
+    run_with_policy = ai_providers.run_with_policy
+
+    async def failed_over(operation, api_config, call, validate=None):
+        # Stands in for a failover: the fake provider writes the letter, reported as the secondary's.
+        result, meta = await run_with_policy(operation, api_config, call, validate)
+        return result, {**meta, "provider": "aws"}
+
+    run = _run_and_prefetch(_jobs()[:1])
+    monkeypatch.setattr(ai_providers, "run_with_policy", failed_over)
+    analysis = run["results"][0]
+
+    async def prefetch():
+        proposal_prefetch.start([analysis], PROFILE, PREFETCH_CONFIG)
+        await proposal_prefetch._current
+
+    _take(analysis)
+    asyncio.run(prefetch())
+    assert _take(analysis) is None
+    prepared = _take(analysis, {**PREFETCH_CONFIG, "provider": "aws"})
+    assert prepared["provider_meta"]["provider"] == "aws"
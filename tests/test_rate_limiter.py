@@ -0,0 +1,78 @@
+# tests/test_rate_limiter.py
+import asyncio
+
+from backend import rate_limiter
+
+
+def _limiter(max_concurrency=8):
+    return rate_limiter.AdaptiveRateLimiter("fake", 100_000, 1_000_000_000, max_concurrency)
+
+
+def test_window_grows_additively_and_halves_once_per_burst():
+    async def run():
+        limiter = _limiter()
+        assert limiter.concurrency == rate_limiter.INITIAL_CONCURRENCY
+        for _ in range(20):
+            await limiter.acquire(1)
+            limiter.release()
+        grown = limiter.concurrency
+        assert rate_limiter.INITIAL_CONCURRENCY < grown <= 8
+
+        for _ in range(3):
+            await limiter.acquire(1)
+        # Calls that were in flight together fail together: one decrease for the burst.
+        for _ in range(3):
+            limiter.release(throttled=True)
+        return grown, limiter
+
+    grown, limiter = asyncio.run(run())
+    assert limiter.concurrency == max(1, grown // 2)
+    assert limiter.total_throttled == 3
+
+
+def test_window_never_exceeds_max_concurrency():
+    async def run():
+        limiter = _limiter(max_concurrency=3)
+        for _ in range(100):
+            await limiter.acquire(1)
+            limiter.release()
+        return limiter
+
+    assert asyncio.run(run()).concurrency == 3
+
+
+def test_weighted_round_robin_between_priority_classes():
+    async def run():
+        limiter = _limiter(max_concurrency=1)
+        await limiter.acquire(1, "speculative")  # Hold the only slot while the queues fill up.
+        order = []
+
+        async def call(priority):
+            await limiter.acquire(1, priority)
+            order.append(priority)
+            limiter.release()
+
+        tasks = [asyncio.create_task(call(p)) for p in ["speculative"] + ["bulk"] * 4 + ["interactive"] * 4]
+        await asyncio.sleep(0)
+        limiter.release()
+        await asyncio.gather(*tasks)
+        return order
+
+    order = asyncio.run(run())
+    # Interactive gets three grants per round, bulk one; speculative only runs once both are idle.
+    assert order == ["interactive"] * 3 + ["bulk", "interactive"] + ["bulk"] * 3 + ["speculative"]
+
+
+def test_changed_limits_update_the_shared_limiter_in_place():
+    async def run():
+        limiter = rate_limiter.get_rate_limiter("fake", {"max_concurrency": 4})
+        await limiter.acquire(1)
+        updated = rate_limiter.get_rate_limiter("fake", {"max_concurrency": 2, "rate_limit_rpm": 30})
+        assert updated is limiter
+        assert updated.snapshot()["in_flight"] == 1
+        updated.release()
+        return updated
+
+    limiter = asyncio.run(run())
+    assert limiter.limits == (30, 1_000_000_000, 2)
+    assert limiter.max_concurrency == 2
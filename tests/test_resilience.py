@@ -0,0 +1,90 @@
+# tests/test_resilience.py
+import asyncio
+
+import pytest
+
+from backend import resilience
+
+
+def _transient():
+    return resilience.ProviderError("503 Service Unavailable", retryable=True, status_code=503)
+
+
+def _open(breaker):
+    for _ in range(resilience.BREAKER_FAILURE_THRESHOLD):
+        breaker.before_call()
+        breaker.record_failure(_transient())
+
+
+def test_consecutive_transient_failures_open_the_circuit():
+    breaker = resilience.CircuitBreaker("fake")
+    for _ in range(resilience.BREAKER_FAILURE_THRESHOLD - 1):
+        breaker.record_failure(_transient())
+    assert breaker.state == "closed"
+    breaker.record_failure(_transient())
+    assert breaker.state == "open"
+    with pytest.raises(resilience.CircuitOpenError):
+        breaker.before_call()
+    assert breaker.snapshot()["short_circuited"] == 1
+
+
+def test_success_resets_the_failure_count():
+    breaker = resilience.CircuitBreaker("fake")
+    for _ in range(resilience.BREAKER_FAILURE_THRESHOLD - 1):
+        breaker.record_failure(_transient())
+    breaker.record_success()
+    breaker.record_failure(_transient())
+    assert breaker.state == "closed"
+
+
+def test_permanent_and_throttling_errors_do_not_count():
+    breaker = resilience.CircuitBreaker("fake")
+    for _ in range(resilience.BREAKER_FAILURE_THRESHOLD):
+        breaker.record_failure(resilience.ProviderError("400 Bad Request", status_code=400))
+        breaker.record_failure(resilience.ProviderError("429", retryable=True, throttled=True, status_code=429))
+    assert breaker.state == "closed"
+
+
+def test_half_open_lets_one_probe_through(monkeypatch):
+    breaker = resilience.CircuitBreaker("fake")
+    _open(breaker)
+    monkeypatch.setattr(resilience, "BREAKER_RESET_SECONDS", 0.0)
+    breaker.before_call()
+    assert breaker.state == "half_open"
+    with pytest.raises(resilience.CircuitOpenError):
+        breaker.before_call()
+    breaker.record_success()
+    assert breaker.state == "closed"
+    breaker.before_call()
+
+
+def test_failed_probe_reopens_the_circuit(monkeypatch):
+    breaker = resilience.CircuitBreaker("fake")
+    _open(breaker)
+    monkeypatch.setattr(resilience, "BREAKER_RESET_SECONDS", 0.0)
+    breaker.before_call()
+    breaker.record_failure(_transient())
+    assert breaker.state == "open"
+    assert breaker.times_opened == 2
+
+
+def test_call_with_retry_opens_the_breaker_and_fails_fast(monkeypatch):
+    monkeypatch.setattr(resilience, "backoff_delay", lambda attempt, retry_after=None: 0.0)
+    calls = []
+
+    async def failing():
+        calls.append(1)
+        raise _transient()
+
+    async def run():
+        counters = {}
+        for _ in range(2):
+            with pytest.raises(resilience.ProviderError):
+                await resilience.call_with_retry("fake", failing, "test call", counters)
+        return counters
+
+    counters = asyncio.run(run())
+    # The fifth failure opens the circuit; the remaining attempts are short-circuited.
+    assert len(calls) == resilience.BREAKER_FAILURE_THRESHOLD
+    assert resilience.get_circuit_breaker("fake").state == "open"
+    assert counters["retries_exhausted"] == 1
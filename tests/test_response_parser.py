@@ -0,0 +1,102 @@
+# tests/test_response_parser.py
+import asyncio
+
+import pytest
+
+from backend import response_parser
+from backend.response_parser import ResponseFormatError, parse_analyses, parse_analysis, parse_score
+
+
+def test_clean_json_is_parsed_as_is():
+    analysis = parse_analysis('{"suitability_score": 85, "analysis_summary": "Good fit", "strengths": ["Python"]}')
+    assert analysis == {"suitability_score": 85, "analysis_summary": "Good fit", "strengths": ["Python"],
+                        "weaknesses": [], "proposal_suggestions": []}
+
+
+def test_json_is_extracted_from_prose_and_code_fences():
+    analysis = parse_analysis('Here you go:\n```json\n{"suitability_score": 70, "strengths": ["a",],}\n```\nThanks')
+    assert analysis["suitability_score"] == 70
+    assert analysis["strengths"] == ["a"]
+
+
+def test_smart_quotes_are_replaced():
+    assert parse_analysis('{“suitability_score”: 60}')["suitability_score"] == 60
+
+
+@pytest.mark.parametrize("value, expected", [("85", 85), ("85%", 85), ("8.5/10", 85), (120, 100), (-3, 0), (72.5, 72.5)])
+def test_scores_are_coerced(value, expected):
+    assert response_parser.coerce_score(value) == expected
+
+
+def test_missing_score_is_rejected():
+    with pytest.raises(ResponseFormatError):
+        parse_analysis('{"analysis_summary": "no score"}')
+
+
+def test_truncated_number_is_not_accepted():
+    # The cut may have dropped digits: 8 could have been 85.
+    with pytest.raises(ResponseFormatError):
+        parse_analysis('{"suitability_score": 8')
+
+
+def test_truncated_list_entry_is_dropped():
+    analysis = parse_analysis('{"suitability_score": 85, "strengths": ["one", "tw')
+    assert analysis["strengths"] == ["one"]
+
+
+def test_truncated_string_value_and_dangling_key_are_dropped():
+    assert parse_analysis('{"suitability_score": 85, "analysis_summary": "go')["analysis_summary"] == ""
+    assert parse_analysis('{"suitability_score": 85, "strengths": ["a"], "weak')["strengths"] == ["a"]
+    assert parse_analysis('{"suitability_score": 85, "weaknesses":')["weaknesses"] == []
+
+
+def test_complete_elements_before_the_cut_are_kept():
+    analysis = parse_analysis('{"suitability_score": 85, "strengths": ["a\\"b", "c"], "analysis_summary": "ok"')
+    assert analysis["strengths"] == ['a"b', "c"]
+    assert analysis["analysis_summary"] == "ok"
+
+
+def test_packed_truncated_trailing_item_is_dropped():
+    analyses = parse_analyses('[{"job_id": "1", "suitability_score": 90}, {"job_id": "2", "suitability_score": 8')
+    assert [analysis["job_id"] for analysis in analyses] == ["1"]
+
+
+def test_packed_item_cut_after_its_score_is_dropped_too():
+    analyses = parse_analyses('{"analyses": [{"job_id": "1", "suitability_score": 90}, '
+                              '{"job_id": "2", "suitability_score": 80, "strengths": ["a"')
+    assert [analysis["job_id"] for analysis in analyses] == ["1"]
+
+
+def test_packed_complete_items_are_kept_when_only_the_array_is_unclosed():
+    analyses = parse_analyses('[{"suitability_score": 80, "job_id": "a"}, {"suitability_score": 70, "job_id": "b"}')
+    assert [analysis["job_id"] for analysis in analyses] == ["a", "b"]
+    analyses = parse_analyses('[{"suitability_score": 80, "job_id": "a"}, {"suitability_score": 70, "job_id": "b"},')
+    assert [analysis["job_id"] for analysis in analyses] == ["a", "b"]
+
+
+def test_packed_invalid_items_are_dropped():
+    analyses = parse_analyses('[{"job_id": 1, "suitability_score": "90"}, {"job_id": "2"}]')
+    assert analyses == [{"job_id": "1", "suitability_score": 90, "analysis_summary": "", "strengths": [],
+                         "weaknesses": [], "proposal_suggestions": []}]
+
+
+def test_score_answer_keeps_only_score_and_summary():
+    assert parse_score('{"suitability_score": "75", "analysis_summary": "ok", "extra": 1}') == \
+        {"suitability_score": 75, "analysis_summary": "ok"}
+
+
+def test_proposal_answer_must_not_be_truncated():
+    with pytest.raises(ResponseFormatError):
+        response_parser.parse_analysis_with_proposal('{"suitability_score": 80, "proposal_text": "Dear cli')
+
+
+def test_reask_only_when_nothing_is_usable():
+    calls = []
+
+    async def request(reask: bool) -> str:
+        calls.append(reask)
+        return '{"suitability_score": 50}' if reask else "not json"
+
+    result = asyncio.run(response_parser.parse_or_reask(request, parse_analysis, "test"))
+    assert result["suitability_score"] == 50
+    assert calls == [False, True]
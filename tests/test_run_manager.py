@@ -0,0 +1,155 @@
+# tests/test_run_manager.py
+import asyncio
+import time
+
+import pytest
+
+from backend import analysis_cache, local_profile_storage, run_manager, run_storage
+
+from conftest import FAKE_CONFIG, make_job
+
+
+@pytest.fixture(autouse=True)
+def fresh_manager(monkeypatch):
+    monkeypatch.setattr(run_manager, "_runs", {})
+    monkeypatch.setattr(run_manager, "_running_tasks", {})
+    monkeypatch.setattr(run_manager, "_cancel_requested", set())
+    monkeypatch.setattr(local_profile_storage, "read_local_profile", lambda: {"api_config": dict(FAKE_CONFIG)})
+
+
+async def _wait_for(run_id: str, timeout: float = 10.0) -> dict:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        run = run_manager.get_run(run_id)
+        if run["status"] not in run_manager.ACTIVE_STATUSES:
+            return run
+        await asyncio.sleep(0.01)
+    raise AssertionError("run did not finish")
+
+
+async def _stop_worker():
+    run_manager._worker_task.cancel()
+    await asyncio.gather(run_manager._worker_task, return_exceptions=True)
+    await asyncio.get_running_loop().run_in_executor(run_manager._storage_executor, lambda: None)  # Drain writes.
+
+
+def test_run_completes_with_throttled_checkpoints(monkeypatch):
+    writes = []
+    write_run = run_storage.write_run
+    monkeypatch.setattr(run_storage, "write_run", lambda run_id, data: (writes.append(run_id), write_run(run_id, data)))
+
+    async def scenario():
+        await run_manager.start()
+        summary = run_manager.submit_run([make_job(i, title=f"Job {i} " * 3) for i in range(60)], {"title": "dev"})
+        run = await _wait_for(summary["run_id"])
+        await _stop_worker()
+        return run
+
+    run = asyncio.run(scenario())
+    assert run["status"] == "completed"
+    assert run["progress"]["succeeded"] == 60
+    # 61 events (60 results and done): queued, running, two throttled and the final checkpoint.
+    assert len(writes) <= 6
+    assert run_storage.load_run(run["run_id"])["status"] == "completed"
+
+
+def test_profile_read_failure_fails_the_run(monkeypatch):
+    def broken():
+        raise ValueError("profile unreadable")
+    monkeypatch.setattr(local_profile_storage, "read_local_profile", broken)
+
+    async def scenario():
+        await run_manager.start()
+        run = await _wait_for(run_manager.submit_run([make_job(1)], {})["run_id"])
+        await _stop_worker()
+        return run
+
+    run = asyncio.run(scenario())
+    assert run["status"] == "failed"
+    assert run["error"] == "profile unreadable"
+
+
+def test_finished_runs_past_retention_are_deleted(monkeypatch):
+    monkeypatch.setattr(run_manager, "MAX_FINISHED_RUNS", 1)
+    now = time.time()
+    for index, (status, age) in enumerate([("completed", 0), ("completed", 60), ("failed", 30 * 24 * 3600), ("queued", 90)]):
+        run_storage.save_run({"run_id": f"run-{index}", "status": status, "created_at": now - age, "updated_at": now - age,
+                              "jobs": [], "profile": {}, "results": {}, "errors": {}, "stats": None, "error": None})
+
+    async def scenario():
+        await run_manager.start()
+        await _stop_worker()
+
+    asyncio.run(scenario())
+    # run-0 is the newest finished run; run-3 was queued, so it is resumed rather than pruned.
+    assert sorted(run_manager._runs) == ["run-0", "run-3"]
+    assert sorted(run["run_id"] for run in run_storage.list_runs()) == ["run-0", "run-3"]
+
+
+def _interrupt(run_id: str, **fields):
+    """Rewrites a finished run's checkpoint as if the backend had stopped while it was running."""
+    run = run_storage.load_run(run_id)
+    run.update(status="running", stats=None, **fields)
+    run_storage.save_run(run)
+    run_manager._runs.clear()
+
+
+async def _resume(run_id: str) -> dict:
+    await run_manager.start()
+    run = await _wait_for(run_id)
+    await _stop_worker()
+    return run
+
+
+def test_resumed_run_keeps_outcomes_and_applies_top_k_to_the_whole_run():
+    jobs = [make_job(i, title=f"Shopify store {i}" if i < 3 else f"Logo design {i}") for i in range(8)]
+
+    async def scenario():
+        await run_manager.start()
+        run_id = run_manager.submit_run(jobs, {"title": "Shopify developer"}, prerank={"top_k": 2})["run_id"]
+        first = await _wait_for(run_id)
+        await _stop_worker()
+        analyzed = sorted(first["results"], key=lambda result: result["job_data"]["id"])
+        # Stopped after one analysis, before the skipped events were saved.
+        _interrupt(run_id, results={analyzed[0]["job_data"]["id"]: analyzed[0]}, skipped={})
+        return first, await _resume(run_id)
+
+    first, resumed = asyncio.run(scenario())
+    ids = lambda entries: sorted(entry["job_data"]["id"] for entry in entries)
+    assert ids(resumed["results"]) == ids(first["results"])
+    assert ids(resumed["skipped"]) == ids(first["skipped"])
+    assert resumed["progress"]["completed"] == resumed["progress"]["total"] == 8
+
+
+def test_resumed_run_does_not_analyze_skipped_jobs():
+    async def scenario():
+        await run_manager.start()
+        run_id = run_manager.submit_run([make_job(i) for i in range(4)], {}, prerank={"top_k": 2})["run_id"]
+        await _wait_for(run_id)
+        await _stop_worker()
+        _interrupt(run_id)
+        return await _resume(run_id)
+
+    resumed = asyncio.run(scenario())
+    assert resumed["progress"]["succeeded"] == 2
+    assert resumed["progress"]["skipped"] == 2
+    assert resumed["progress"]["completed"] == 4
+
+
+def test_resumed_run_continues_from_the_budget_already_spent():
+    async def scenario():
+        await run_manager.start()
+        run_id = run_manager.submit_run([make_job(i) for i in range(3)], {}, budget={"max_tokens": 1_000_000})["run_id"]
+        first = await _wait_for(run_id)
+        await _stop_worker()
+        usage = run_storage.load_run(run_id)["usage"]
+        assert usage["input_tokens"] == first["stats"]["usage"]["input_tokens"] > 0
+        # Interrupted before any analysis (and before it was cached), with nearly all of the budget spent.
+        analysis_cache._get_connection().execute("DELETE FROM analyses")
+        _interrupt(run_id, results={}, usage={**usage, "input_tokens": 1_000_000 - usage["output_tokens"] - 10})
+        return await _resume(run_id)
+
+    resumed = asyncio.run(scenario())
+    assert resumed["progress"]["succeeded"] == 0
+    assert [skipped["reason"] for skipped in resumed["skipped"]] == ["budget"] * 3
+    assert resumed["stats"]["usage"]["input_tokens"] + resumed["stats"]["usage"]["output_tokens"] == 1_000_000 - 10
@@ -0,0 +1,111 @@
+# tests/test_scheduler.py
+import asyncio
+
+import pytest
+
+from conftest import FAKE_CONFIG, make_job
+
+from backend import bulk_analyzer, prompts, rate_limiter, scheduler
+
+PROFILE = {"name": "Dev", "overview": "Python developer."}
+LONG_JOB = make_job(1, snippet="Detailed requirements for the integration work. " * 400)
+
+
+def test_estimate_follows_the_description_budget():
+    def estimate(api_config):
+        return scheduler.estimate_prompt_tokens(
+            prompts.JOB_ANALYSIS_PROMPT, 0, api_config, job_data=LONG_JOB, profile_data=PROFILE
+        )
+
+    truncated = estimate({"max_description_tokens": 100})
+    assert truncated < estimate({}) < estimate({"max_description_tokens": 0})
+
+
+def test_packs_follow_the_description_budget():
+    jobs = [make_job(i, snippet=LONG_JOB["snippet"]) for i in range(4)]
+    truncated = bulk_analyzer._build_packs(jobs, PROFILE, 10, 100_000, {"max_description_tokens": 100})
+    full = bulk_analyzer._build_packs(jobs, PROFILE, 10, 100_000, {"max_description_tokens": 0})
+    assert len(truncated) == len(full) == 1
+    assert truncated[0][1] < full[0][1]
+
+
+class ProviderStream:
+    """A provider stream that records whether it was closed."""
+
+    def __init__(self, chunks):
+        self.chunks = list(chunks)
+        self.closed = False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if not self.chunks:
+            raise StopAsyncIteration
+        await asyncio.sleep(0)
+        return self.chunks.pop(0)
+
+    async def aclose(self):
+        self.closed = True
+
+
+def _stream(provider_stream):
+    return scheduler.scheduled_stream("fake", FAKE_CONFIG, lambda: provider_stream, "proposal", scheduler.INTERACTIVE, 100)
+
+
+def _in_flight():
+    return rate_limiter.get_rate_limiter("fake", FAKE_CONFIG).snapshot()["in_flight"]
+
+
+def test_finished_stream_releases_its_slot_and_closes_the_provider_stream():
+    async def run():
+        provider_stream = ProviderStream(["Dear ", "client"])
+        chunks = [chunk async for chunk in _stream(provider_stream)]
+        return chunks, provider_stream
+
+    chunks, provider_stream = asyncio.run(run())
+    assert chunks == ["Dear ", "client"]
+    assert provider_stream.closed
+    assert _in_flight() == 0
+
+
+def test_abandoned_stream_releases_its_slot_and_closes_the_provider_stream():
+    async def run():
+        provider_stream = ProviderStream(["Dear ", "client", "..."])
+        stream = _stream(provider_stream)
+        assert await stream.__anext__() == "Dear "
+        assert _in_flight() == 1
+        await stream.aclose()  # The client disconnected.
+        return provider_stream
+
+    assert asyncio.run(run()).closed
+    assert _in_flight() == 0
+
+
+def test_cancelled_stream_releases_its_slot_and_closes_the_provider_stream():
+    async def run():
+        provider_stream = ProviderStream(["Dear "] * 1000)
+
+        async def consume():
+            async for _ in _stream(provider_stream):
+                await asyncio.sleep(0)
+
+        task = asyncio.create_task(consume())
+        await asyncio.sleep(0.01)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        return provider_stream
+
+    assert asyncio.run(run()).closed
+    assert _in_flight() == 0
+
+
+def test_empty_stream_releases_its_slot_and_closes_the_provider_stream():
+    async def run():
+        provider_stream = ProviderStream([])
+        with pytest.raises(ValueError, match="empty response"):
+            await _stream(provider_stream).__anext__()
+        return provider_stream
+
+    assert asyncio.run(run()).closed
+    assert _in_flight() == 0
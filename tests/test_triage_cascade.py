@@ -0,0 +1,60 @@
+# tests/test_triage_cascade.py
+import asyncio
+
+from backend import bulk_analyzer, fake_api, resilience
+
+from conftest import FAKE_CONFIG, make_job
+
+PROFILE = {"title": "Shopify developer", "skills": ["Shopify", "Liquid"]}
+BAND = {"band_min": 30, "band_max": 70}
+
+
+def _jobs():
+    # Unrelated descriptions, so near-duplicate clustering keeps every job.
+    return [make_job(index, snippet=" ".join(f"task{index}step{part}" for part in range(40))) for index in range(10, 30)]
+
+
+def _run(jobs, **cascade):
+    config = {**FAKE_CONFIG, "cascade": {"enabled": True, **cascade}}
+    return asyncio.run(bulk_analyzer.analyze_multiple_jobs(jobs, PROFILE, config))
+
+
+def test_jobs_in_the_band_escalate_and_the_others_keep_their_triage_score():
+    jobs = _jobs()
+    run = _run(jobs, **BAND)
+    triage_scores = {job["id"]: fake_api.fake_score(job, PROFILE) for job in jobs}
+    assert min(triage_scores.values()) < BAND["band_min"] and max(triage_scores.values()) > BAND["band_max"]
+
+    escalated = 0
+    for analysis in run["results"]:
+        job = analysis["job_data"]
+        triage_score = triage_scores[job["id"]]
+        assert analysis["cascade"]["triage_score"] == triage_score
+        if BAND["band_min"] <= triage_score <= BAND["band_max"]:
+            escalated += 1
+            assert analysis["cascade"]["stage"] == "full"
+            assert analysis["suitability_score"] == fake_api.fake_analysis(job, PROFILE)["suitability_score"]
+        else:
+            assert analysis["cascade"]["stage"] == "triage"
+            assert analysis["suitability_score"] == triage_score
+
+    cascade = run["stats"]["cascade"]
+    assert cascade["triaged"] == len(jobs)
+    assert cascade["escalated"] == escalated
+    assert cascade["below_band"] == sum(score < BAND["band_min"] for score in triage_scores.values())
+    assert cascade["above_band"] == sum(score > BAND["band_max"] for score in triage_scores.values())
+    by_model = run["stats"]["usage"]["by_model"]
+    assert by_model[fake_api.TRIAGE_MODEL_ID]["calls"] == len(jobs)
+    assert by_model[fake_api.MODEL_ID]["calls"] == escalated
+
+
+def test_failed_triage_escalates_to_the_full_analysis(monkeypatch):
+    async def failing_score(job_data, profile_data, api_config=None):
+        raise resilience.ProviderError("400 Bad Request", status_code=400)
+
+    monkeypatch.setattr(fake_api, "get_job_score", failing_score)
+    jobs = _jobs()[:3]
+    run = _run(jobs, **BAND)
+    assert [analysis["cascade"] for analysis in run["results"]] == [{"stage": "full", "triage_score": None}] * 3
+    cascade = run["stats"]["cascade"]
+    assert (cascade["triage_failed"], cascade["escalated"]) == (3, 3)